@@ -3,30 +3,30 @@ import sys
 import time
 import logging
 import traceback
-import keyboard
-from PyQt5.QtWidgets import QApplication, QMenu, QSystemTrayIcon
-from PyQt5.QtCore import QObject, Qt, pyqtSignal
-from PyQt5.QtGui import QIcon, QPixmap
-from PyQt5.QtNetwork import QLocalServer, QLocalSocket
-
-# 导入核心组件
-from core.container import AppContainer
-from core.signals import app_signals
-from core.keyboard_helper import HotkeyManager, HotkeySettingsWindow
-from core.time_paste_helper import TimePasteWindow
-from core.password_generator import PasswordGeneratorWindow
-from ui.quick_window import QuickWindow
-from ui.main_window import MainWindow
-from ui.toolbox_window import ToolboxWindow
-from ui.ball import FloatingBall
-from core.settings import load_setting
-from ui.utils import create_svg_icon
+from core.startup_trace import trace
+from core.ui_latency import ui_latency
+
+with trace.phase('imports'):
+    from PyQt5.QtWidgets import QApplication, QMenu, QSystemTrayIcon
+    from PyQt5.QtCore import QObject, Qt, QTimer, pyqtSignal
+    from PyQt5.QtGui import QIcon, QPixmap
+
+    # 导入核心组件 (首屏只需要悬浮球和快速笔记窗口；主界面、工具箱、keyboard 等在空闲时或首次使用时再导入)
+    from core.container import AppContainer
+    from core.signals import app_signals
+    from ui.quick_window import QuickWindow
+    from ui.ball import FloatingBall
+    from core.settings import load_setting
+    from ui.utils import create_svg_icon
 
 SERVER_NAME = "K_KUAIJIBIJI_SINGLE_INSTANCE_SERVER"
+# 快速笔记窗口可用后，空闲多久预建主界面 (毫秒)
+MAIN_WINDOW_PREBUILD_DELAY = 3000
 
 # --- Setup Logging ---
-log_format = '%(asctime)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s'
-logging.basicConfig(filename='app_log.txt', level=logging.DEBUG, format=log_format, filemode='w')
+# 日志经队列由后台线程写入轮转文件，见 core/logger.py
+from core.logger import setup_logging
+setup_logging()
 def excepthook(exc_type, exc_value, exc_tb):
     logging.error("Unhandled exception:", exc_info=(exc_type, exc_value, exc_tb))
     traceback.print_exception(exc_type, exc_value, exc_tb)
@@ -43,7 +43,8 @@ class AppManager(QObject):
         super().__init__()
         self.app = app
         
-        self.container = AppContainer()
+        with trace.phase('container'):
+            self.container = AppContainer()
         self.service = self.container.service
         
         self.main_window = None
@@ -55,6 +56,8 @@ class AppManager(QObject):
         self.hotkey_settings_window = None
         self.time_paste_window = None
         self.password_generator_window = None
+        self.extract_dialog = None
+        self.maintenance = None
         
         self.hotkey_signal = HotkeySignal()
         self.hotkey_signal.activated.connect(self.toggle_quick_window)
@@ -92,11 +95,12 @@ class AppManager(QObject):
             'backtick_backspace': "` (反引号) → 退格"
         }
 
+        hotkey_manager = self._ensure_hotkey_manager()
         for key, text in features.items():
             action = menu.addAction(text)
             action.setCheckable(True)
-            action.setChecked(self.hotkey_manager.feature_enabled.get(key, False))
-            action.toggled.connect(lambda checked, k=key: self.hotkey_manager.toggle_feature(k, checked))
+            action.setChecked(hotkey_manager.feature_enabled.get(key, False))
+            action.toggled.connect(lambda checked, k=key: hotkey_manager.toggle_feature(k, checked))
 
         menu.addSeparator()
         settings_action = menu.addAction("打开详细设置...")
@@ -120,55 +124,65 @@ class AppManager(QObject):
             logging.error(f"Error while favoriting last idea: {e}", exc_info=True)
 
     def start(self):
-        # 注入 Service
-        self.main_window = MainWindow(self.service) 
-        self.main_window.closing.connect(self.on_main_window_closing)
-
-        self.ball = FloatingBall(self.main_window)
-        self._setup_ball_menu()
-        self._restore_ball_position()
-        self.ball.show()
-
-        self.quick_window = QuickWindow(self.service) 
+        # 阶段一: 只构建悬浮球和快速笔记窗口，尽快进入可用状态
+        with trace.phase('window.ball'):
+            self.ball = FloatingBall(self._on_ball_text_dropped)
+            self._setup_ball_menu()
+            self._restore_ball_position()
+            self.ball.show()
+
+        with trace.phase('window.quick'):
+            self.quick_window = QuickWindow(self.service)
+        trace.mark_first_paint(self.quick_window, 'quick.first_paint')
         self.quick_window.toggle_main_window_requested.connect(self.toggle_main_window)
-        
-        self.toolbox_window = ToolboxWindow()
-        
-        # Connect toolbox signals
-        self.main_window.header.toolbox_requested.connect(self.toggle_toolbox_window)
-        self.main_window.header.toolbox_context_menu_requested.connect(self._show_toolbox_context_menu)
         self.quick_window.toolbar.toolbox_requested.connect(self.toggle_toolbox_window)
         self.quick_window.toolbar.toolbox_context_menu_requested.connect(self._show_toolbox_context_menu)
-        self.toolbox_window.show_hotkey_settings_requested.connect(self.show_hotkey_settings_window)
-        self.toolbox_window.show_time_paste_requested.connect(self.toggle_time_paste_window)
-        self.toolbox_window.show_password_generator_requested.connect(self.toggle_password_generator_window)
-
         self.quick_window.cm.data_captured.connect(self._on_clipboard_data_captured)
-        
-        self._init_tray_icon()
-
-        # Keyboard Helper
-        self.hotkey_manager = HotkeyManager()
-        self.hotkey_manager.start()
-        self.hotkey_settings_window = HotkeySettingsWindow(self.hotkey_manager)
-        
-        # Time Paste Helper
-        self.time_paste_window = TimePasteWindow()
-
-        # Password Generator
-        self.password_generator_window = PasswordGeneratorWindow()
 
         # --- [核心修复] 信号同步网络 ---
-        # 1. 监听全局信号 -> 刷新所有窗口
-        app_signals.data_changed.connect(self.main_window._refresh_all)
+        # 1. 监听全局信号 -> 刷新所有窗口 (主界面在构建时接入)
         app_signals.data_changed.connect(self.quick_window._update_list)
         app_signals.data_changed.connect(self.quick_window.refresh_sidebar)
-        
         # 2. 监听侧边栏局部信号 -> 触发全局信号
         # 这样，当你在 MainWindow 修改分类时，QuickWindow 也会收到通知
-        self.main_window.sidebar.data_changed.connect(app_signals.data_changed.emit)
         self.quick_window.sidebar.data_changed.connect(app_signals.data_changed.emit)
 
+        with trace.phase('window.quick.show'):
+            self.show_quick_window()
+        # 快速笔记窗口的列表在首个事件循环中加载，之后再进入阶段二
+        QTimer.singleShot(0, self._start_deferred)
+
+    def _start_deferred(self):
+        # 阶段二: 托盘、全局热键和后台任务
+        trace.mark('quick.usable')
+        with trace.phase('imports.deferred'):
+            import keyboard
+            from services.maintenance_service import MaintenanceScheduler
+
+        with trace.phase('tray'):
+            self._init_tray_icon()
+
+        # Keyboard Helper
+        with trace.phase('hotkeys'):
+            self._ensure_hotkey_manager()
+            self._register_global_hotkeys(keyboard)
+
+        # 备份、剪贴板清理、哈希补算等维护工作只在空闲时进行，启动时不做
+        with trace.phase('maintenance'):
+            self.maintenance = MaintenanceScheduler(self.service)
+            self.maintenance.start()
+
+        with trace.phase('ui_watchdog'):
+            ui_latency.start_watchdog()
+
+        # 阶段三: 空闲时预建主界面 (只建界面，数据在首次显示时加载)，之后写出启动报告
+        QTimer.singleShot(MAIN_WINDOW_PREBUILD_DELAY, self._prebuild_main_window)
+
+    def _prebuild_main_window(self):
+        self._ensure_main_window()
+        trace.finish()
+
+    def _register_global_hotkeys(self, keyboard):
         # 注册全局热键 Alt+Space
         try:
             keyboard.add_hotkey('alt+space', self._on_hotkey_triggered, suppress=False)
@@ -182,7 +196,78 @@ class AppManager(QObject):
         except Exception as e:
             logging.error(f"Failed to register hotkey Ctrl+Shift+E: {e}", exc_info=True)
 
-        self.show_quick_window()
+    def _on_ball_text_dropped(self, text):
+        """拖到悬浮球上的文本直接存为新笔记，不需要构建主窗口"""
+        from data import large_text
+        self.service.add_idea(large_text.make_title(text) or '未命名', text, None, [])
+
+    # --- 按需构建的窗口 ---
+    def _ensure_main_window(self):
+        if self.main_window is None:
+            with trace.phase('window.main'):
+                from ui.main_window import MainWindow
+                self.main_window = MainWindow(self.service)
+            self.main_window.closing.connect(self.on_main_window_closing)
+            self.main_window.header.toolbox_requested.connect(self.toggle_toolbox_window)
+            self.main_window.header.toolbox_context_menu_requested.connect(self._show_toolbox_context_menu)
+            app_signals.data_changed.connect(self.main_window._refresh_all)
+            app_signals.trash_purge_progress.connect(self.main_window._on_trash_purge_progress)
+            self.main_window.sidebar.data_changed.connect(app_signals.data_changed.emit)
+            self.main_window.refresh_logo()
+        return self.main_window
+
+    def _ensure_toolbox_window(self):
+        if self.toolbox_window is None:
+            with trace.phase('window.toolbox'):
+                from ui.toolbox_window import ToolboxWindow
+                self.toolbox_window = ToolboxWindow()
+            self.toolbox_window.show_hotkey_settings_requested.connect(self.show_hotkey_settings_window)
+            self.toolbox_window.show_time_paste_requested.connect(self.toggle_time_paste_window)
+            self.toolbox_window.show_password_generator_requested.connect(self.toggle_password_generator_window)
+            self.toolbox_window.show_export_requested.connect(self.show_extract_dialog)
+            self._watch_caches()
+        return self.toolbox_window
+
+    def _watch_caches(self):
+        """登记内存快照中要统计的缓存结构"""
+        from core.diagnostics import memory_tracker
+        import core.shared
+        import ui.utils
+        memory_tracker.watch('ui.utils._icon_cache', lambda: ui.utils._icon_cache)
+        memory_tracker.watch('core.shared._ICON_CACHE', lambda: core.shared._ICON_CACHE)
+        memory_tracker.watch('main.cards_cache', lambda: self.main_window.cards_cache if self.main_window else None)
+        memory_tracker.watch('main.cached_metadata', lambda: self.main_window.cached_metadata if self.main_window else None)
+        memory_tracker.watch('quick._icon_html_cache', lambda: self.quick_window._icon_html_cache)
+        memory_tracker.watch('quick.list_items', lambda: [
+            self.quick_window.list_widget.item(i).data(Qt.UserRole) for i in range(self.quick_window.list_widget.count())])
+
+    def _ensure_hotkey_manager(self):
+        if self.hotkey_manager is None:
+            from core.keyboard_helper import HotkeyManager
+            self.hotkey_manager = HotkeyManager()
+            self.hotkey_manager.start()
+        return self.hotkey_manager
+
+    def _ensure_hotkey_settings_window(self):
+        if self.hotkey_settings_window is None:
+            with trace.phase('window.hotkey_settings'):
+                from core.keyboard_helper import HotkeySettingsWindow
+                self.hotkey_settings_window = HotkeySettingsWindow(self._ensure_hotkey_manager())
+        return self.hotkey_settings_window
+
+    def _ensure_time_paste_window(self):
+        if self.time_paste_window is None:
+            with trace.phase('window.time_paste'):
+                from core.time_paste_helper import TimePasteWindow
+                self.time_paste_window = TimePasteWindow()
+        return self.time_paste_window
+
+    def _ensure_password_generator_window(self):
+        if self.password_generator_window is None:
+            with trace.phase('window.password_generator'):
+                from core.password_generator import PasswordGeneratorWindow
+                self.password_generator_window = PasswordGeneratorWindow()
+        return self.password_generator_window
 
     def _setup_ball_menu(self):
         original_context_menu = self.ball.contextMenuEvent
@@ -220,7 +305,7 @@ class AppManager(QObject):
             m.addSeparator()
             m.addAction(create_svg_icon('zap.svg'), '打开快速笔记', self.ball.request_show_quick_window.emit)
             m.addAction(create_svg_icon('monitor.svg'), '打开主界面', self.ball.request_show_main_window.emit)
-            m.addAction(create_svg_icon('action_add.svg'), '新建灵感', self.main_window.new_idea)
+            m.addAction(create_svg_icon('action_add.svg'), '新建灵感', lambda: self._ensure_main_window().new_idea())
             m.addSeparator()
             m.addAction(create_svg_icon('power.svg'), '退出', self.ball.request_quit_app.emit)
             m.exec_(e.globalPos())
@@ -240,10 +325,12 @@ class AppManager(QObject):
             self.ball.move(g.width()-80, g.height()//2)
 
     def _on_hotkey_triggered(self):
+        # 在 keyboard 的线程中调用，从这里开始计到快速笔记窗口绘制
+        ui_latency.start('hotkey.quick_window')
         self.hotkey_signal.activated.emit()
 
     def _init_tray_icon(self):
-        temp_ball = FloatingBall(None)
+        temp_ball = FloatingBall()
         temp_ball.timer.stop()
         temp_ball.is_writing = False
         temp_ball.pen_angle = -45
@@ -284,63 +371,91 @@ class AppManager(QObject):
 
     def show_quick_window(self): self._force_activate(self.quick_window)
     def toggle_quick_window(self):
-        if self.quick_window and self.quick_window.isVisible(): self.quick_window.hide()
-        else: self.show_quick_window()
-    def show_main_window(self): self._force_activate(self.main_window)
+        if self.quick_window and self.quick_window.isVisible():
+            ui_latency.cancel('hotkey.quick_window')
+            self.quick_window.hide()
+        else:
+            self.show_quick_window()
+            ui_latency.finish_on_paint('hotkey.quick_window', self.quick_window)
+    def show_main_window(self): self._force_activate(self._ensure_main_window())
     def toggle_main_window(self):
-        if self.main_window.isVisible() and not self.main_window.isMinimized(): self.main_window.hide()
+        if self.main_window and self.main_window.isVisible() and not self.main_window.isMinimized(): self.main_window.hide()
         else: self.show_main_window()
 
     def toggle_toolbox_window(self):
-        if self.toolbox_window.isVisible():
-            self.toolbox_window.hide()
+        toolbox_window = self._ensure_toolbox_window()
+        if toolbox_window.isVisible():
+            toolbox_window.hide()
         else:
-            self._force_activate(self.toolbox_window)
+            self._force_activate(toolbox_window)
             # Position it near the quick window for context
             if self.quick_window.isVisible():
                 quick_pos = self.quick_window.pos()
-                self.toolbox_window.move(quick_pos.x() - self.toolbox_window.width() - 10, quick_pos.y())
+                toolbox_window.move(quick_pos.x() - toolbox_window.width() - 10, quick_pos.y())
 
     def show_hotkey_settings_window(self):
-        self._force_activate(self.hotkey_settings_window)
+        self._force_activate(self._ensure_hotkey_settings_window())
 
     def toggle_time_paste_window(self):
-        if self.time_paste_window.isVisible():
-            self.time_paste_window.hide()
+        time_paste_window = self._ensure_time_paste_window()
+        if time_paste_window.isVisible():
+            time_paste_window.hide()
         else:
-            self._force_activate(self.time_paste_window)
+            self._force_activate(time_paste_window)
 
     def toggle_password_generator_window(self):
-        if self.password_generator_window.isVisible():
-            self.password_generator_window.hide()
+        password_generator_window = self._ensure_password_generator_window()
+        if password_generator_window.isVisible():
+            password_generator_window.hide()
         else:
-            self._force_activate(self.password_generator_window)
+            self._force_activate(password_generator_window)
+
+    def show_extract_dialog(self):
+        """导出窗口每次打开时重新统计条数，关闭后释放"""
+        if self.extract_dialog is None:
+            from ui.dialogs import ExtractDialog
+            self.extract_dialog = ExtractDialog()
+            self.extract_dialog.finished.connect(lambda _: setattr(self, 'extract_dialog', None))
+        self._force_activate(self.extract_dialog)
 
     def on_main_window_closing(self):
         if self.main_window: self.main_window.hide()
     def quit_application(self):
         logging.info("Application quit requested")
+        if self.maintenance:
+            self.maintenance.stop()
+        ui_latency.stop()
         if self.hotkey_manager:
             self.hotkey_manager.stop()
-        try: keyboard.unhook_all()
-        except: pass
+        # 阶段二之前退出时 keyboard 尚未导入，也没有注册任何钩子
+        if 'keyboard' in sys.modules:
+            try: sys.modules['keyboard'].unhook_all()
+            except: pass
         
         if self.quick_window:
             try: self.quick_window.save_state()
             except: pass
+            try: self.quick_window.cm.flush_touches()
+            except: pass
         if self.main_window:
             try: self.main_window.save_state()
             except: pass
+        if self.service.idea_repo.db.traced:
+            from data.sql_trace import sql_stats
+            sql_stats.log_summary()
         self.app.quit()
 
 def main():
-    app = QApplication(sys.argv)
-    socket = QLocalSocket(); socket.connectToServer(SERVER_NAME)
-    if socket.waitForConnected(500):
-        socket.write(b'EXIT'); socket.flush(); socket.waitForBytesWritten(1000)
-        socket.disconnectFromServer(); time.sleep(0.5)
-    QLocalServer.removeServer(SERVER_NAME)
-    server = QLocalServer(); server.listen(SERVER_NAME)
+    from PyQt5.QtNetwork import QLocalServer, QLocalSocket
+    with trace.phase('qapplication'):
+        app = QApplication(sys.argv)
+    with trace.phase('single_instance'):
+        socket = QLocalSocket(); socket.connectToServer(SERVER_NAME)
+        if socket.waitForConnected(500):
+            socket.write(b'EXIT'); socket.flush(); socket.waitForBytesWritten(1000)
+            socket.disconnectFromServer(); time.sleep(0.5)
+        QLocalServer.removeServer(SERVER_NAME)
+        server = QLocalServer(); server.listen(SERVER_NAME)
     manager = AppManager(app)
     def handle_new_connection():
         conn = server.nextPendingConnection()
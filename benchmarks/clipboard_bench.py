@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+# benchmarks/clipboard_bench.py
+"""
+剪贴板采集吞吐基准 (无界面环境，QT_QPA_PLATFORM=offscreen)
+
+用合成的 QMimeData 序列连续调用 ClipboardManager.process_clipboard (绕过防抖，模拟复制风暴)，
+每次调用后处理一次事件循环，图片在后台编码完成后回到界面线程经 add_clipboard_item 入库。
+每个序列在同一个基础库 (BASE_IDEAS 条) 的副本上运行，统计:
+    captures_per_s / ms_per_capture   从第一次采集到全部入库的吞吐
+    p50_ms / p99_ms / max_ms          界面线程上每段同步工作 (采集调用、图片入库回调、时间戳批量写入) 的耗时
+    db_bytes_per_capture              数据库页数增长折算的字节数
+    commits / statements              连接上执行的 COMMIT 与语句数 (set_trace_callback)
+
+序列:
+    text_burst    各不相同的中英文文本，含网址与少量超大文本
+    duplicates    少量文本和图片反复复制，重复率高
+    large_images  1080p / 4K 截图类图片
+    file_lists    每次复制数千个真实文件路径
+
+命令行:
+    python -m benchmarks.clipboard_bench run [报告]
+    python -m benchmarks.clipboard_bench compare [报告]     与基线比较，有回退时返回 1
+    python -m benchmarks.clipboard_bench baseline [报告]    把报告设为基线
+"""
+import os
+import sys
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import time
+import shutil
+import random
+import platform
+import tempfile
+from datetime import datetime
+from PyQt5.QtCore import QMimeData, QUrl, QRect, QSettings
+from PyQt5.QtGui import QImage, QPainter, QColor
+from PyQt5.QtWidgets import QApplication
+from benchmarks.synthetic_library import generate, open_service, random_text
+from benchmarks.report import load_report, save_report, find_regressions, percentile
+
+BENCH_REPORT = 'bench_clipboard.json'
+BENCH_BASELINE = 'bench_clipboard_baseline.json'
+BASE_IDEAS = 2000
+FILE_POOL = 5000
+DRAIN_TIMEOUT = 120
+REGRESSION_RATIO = 1.3
+REGRESSION_MIN_MS = 1
+
+
+def _text_mime(text):
+    mime = QMimeData()
+    mime.setText(text)
+    return mime
+
+
+def _image_mime(image):
+    mime = QMimeData()
+    mime.setImageData(image)
+    return mime
+
+
+def _screenshot(rng, width, height):
+    """纯色背景上的色块与横线，接近截图的内容与压缩率"""
+    image = QImage(width, height, QImage.Format_RGB32)
+    image.fill(QColor(rng.choice((30, 245)), rng.choice((30, 245)), rng.choice((30, 245))))
+    painter = QPainter(image)
+    for _ in range(60):
+        color = QColor(rng.randrange(256), rng.randrange(256), rng.randrange(256))
+        painter.fillRect(QRect(rng.randrange(width), rng.randrange(height),
+                               rng.randrange(20, width // 3), rng.randrange(10, height // 4)), color)
+    for y in range(0, height, 24):
+        painter.fillRect(QRect(rng.randrange(40), y, rng.randrange(width // 4, width), 2), QColor(120, 120, 120))
+    painter.end()
+    return image
+
+
+def _text_burst(rng, files):
+    items = []
+    for i in range(400):
+        if i % 10 == 0:
+            text = f"https://example.com/{random_text(rng, False).split()[0]}/{i}"
+        elif i % 100 == 50:
+            text = random_text(rng, rng.random() < 0.5) * 2000
+        else:
+            text = random_text(rng, rng.random() < 0.5)
+        items.append(_text_mime(text))
+    return items
+
+
+def _duplicates(rng, files):
+    texts = [random_text(rng, rng.random() < 0.5) for _ in range(25)]
+    images = [_screenshot(rng, 800, 600) for _ in range(5)]
+    items = []
+    for _ in range(600):
+        if rng.random() < 0.15:
+            items.append(_image_mime(rng.choice(images)))
+        else:
+            items.append(_text_mime(rng.choice(texts)))
+        if rng.random() < 0.2:
+            items.append(items[-1])
+    return items
+
+
+def _large_images(rng, files):
+    return [_image_mime(_screenshot(rng, *(rng.choice(((1920, 1080), (2560, 1440), (3840, 2160))))))
+            for _ in range(24)]
+
+
+def _file_lists(rng, files):
+    items = []
+    for _ in range(20):
+        mime = QMimeData()
+        mime.setUrls([QUrl.fromLocalFile(p) for p in rng.sample(files, rng.randint(1000, len(files)))])
+        items.append(mime)
+    return items
+
+
+STREAMS = {
+    'text_burst': _text_burst,
+    'duplicates': _duplicates,
+    'large_images': _large_images,
+    'file_lists': _file_lists,
+}
+
+
+def _make_manager(service, slices):
+    """界面线程上的图片入库回调也计入阻塞时间"""
+    from services.clipboard import ClipboardManager
+
+    class TimedClipboardManager(ClipboardManager):
+        def _on_image_encoded(self, job, future):
+            started = time.perf_counter()
+            try:
+                super()._on_image_encoded(job, future)
+            finally:
+                slices.append((time.perf_counter() - started) * 1000)
+
+    return TimedClipboardManager(service)
+
+
+def _db_bytes(conn):
+    return conn.execute('PRAGMA page_count').fetchone()[0] * conn.execute('PRAGMA page_size').fetchone()[0]
+
+
+def _run_stream(app, service, items):
+    conn = service.idea_repo.db.conn
+    counters = {'commits': 0, 'statements': 0}
+
+    def on_statement(sql):
+        counters['statements'] += 1
+        if sql.startswith('COMMIT'):
+            counters['commits'] += 1
+
+    slices = []
+    cm = _make_manager(service, slices)
+    rows_before = conn.execute('SELECT COUNT(*) FROM ideas').fetchone()[0]
+    bytes_before = _db_bytes(conn)
+    conn.set_trace_callback(on_statement)
+    started = time.perf_counter()
+    try:
+        for mime in items:
+            t = time.perf_counter()
+            cm.process_clipboard(mime)
+            slices.append((time.perf_counter() - t) * 1000)
+            app.processEvents()
+        # 等待后台编码的图片全部入库
+        deadline = time.monotonic() + DRAIN_TIMEOUT
+        while cm._encoding and time.monotonic() < deadline:
+            app.processEvents()
+            time.sleep(0.001)
+        t = time.perf_counter()
+        cm.flush_touches()
+        slices.append((time.perf_counter() - t) * 1000)
+        elapsed = time.perf_counter() - started
+    finally:
+        conn.set_trace_callback(None)
+    n = len(items)
+    return {
+        'captures': n,
+        'seconds': round(elapsed, 3),
+        'captures_per_s': round(n / elapsed, 1),
+        'ms_per_capture': round(elapsed * 1000 / n, 3),
+        'p50_ms': round(percentile(slices, 50), 3),
+        'p99_ms': round(percentile(slices, 99), 3),
+        'max_ms': round(max(slices), 3),
+        'rows_added': conn.execute('SELECT COUNT(*) FROM ideas').fetchone()[0] - rows_before,
+        'db_bytes_per_capture': round((_db_bytes(conn) - bytes_before) / n),
+        'commits': counters['commits'],
+        'statements': counters['statements'],
+    }
+
+
+def run(seed=1, streams=None, log=print):
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    report = {
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(), 'platform': app.platformName(),
+        'seed': seed, 'base_ideas': BASE_IDEAS, 'results': {},
+    }
+    with tempfile.TemporaryDirectory(prefix='bench_clipboard_') as tmp:
+        for fmt in (QSettings.NativeFormat, QSettings.IniFormat):
+            QSettings.setPath(fmt, QSettings.UserScope, tmp)
+        base = os.path.join(tmp, 'base.db')
+        generate(base, ideas=BASE_IDEAS, seed=seed)
+        pool = os.path.join(tmp, 'files')
+        os.makedirs(pool)
+        files = []
+        for i in range(FILE_POOL):
+            path = os.path.join(pool, f'file_{i}.{("txt", "pdf", "png")[i % 3]}')
+            open(path, 'wb').close()
+            files.append(path)
+
+        for name, make in STREAMS.items():
+            if streams and name not in streams:
+                continue
+            items = make(random.Random(f'{seed}:{name}'), files)
+            path = os.path.join(tmp, f'{name}.db')
+            shutil.copyfile(base, path)
+            service = open_service(path)
+            try:
+                result = report['results'][name] = _run_stream(app, service, items)
+            finally:
+                service.idea_repo.db.close()
+            log(f"{name:<14} {result['captures']:>5} 次  {result['captures_per_s']:>8.1f}/s  "
+                f"p50 {result['p50_ms']:>7.2f} ms  p99 {result['p99_ms']:>8.2f} ms  "
+                f"+{result['rows_added']} 行  {result['db_bytes_per_capture']} B/次  {result['commits']} commits")
+    return report
+
+
+def compare(report, baseline):
+    base = baseline.get('results', {})
+    return (find_regressions(report['results'], base, REGRESSION_RATIO, REGRESSION_MIN_MS, key='ms_per_capture')
+            + find_regressions(report['results'], base, REGRESSION_RATIO, REGRESSION_MIN_MS, key='p99_ms'))
+
+
+def main(argv):
+    cmd = argv[0] if argv else 'run'
+    if cmd == 'run':
+        path = argv[1] if len(argv) > 1 else BENCH_REPORT
+        report = run()
+        baseline = load_report(BENCH_BASELINE)
+        if baseline:
+            report['regressions'] = compare(report, baseline)
+        save_report(report, path)
+        print(f'已写入 {path}')
+        return 1 if report.get('regressions') else 0
+    if cmd not in ('compare', 'baseline'):
+        print(__doc__)
+        return 2
+    path = argv[1] if len(argv) > 1 else BENCH_REPORT
+    report = load_report(path)
+    if report is None:
+        print(f'找不到报告: {path}')
+        return 1
+    if cmd == 'baseline':
+        save_report(report, BENCH_BASELINE)
+        print(f'已设为基线: {path}')
+        return 0
+    baseline = load_report(BENCH_BASELINE)
+    if baseline is None:
+        print(f'找不到基线: {BENCH_BASELINE}')
+        return 1
+    base = baseline.get('results', {})
+    for name, r in report['results'].items():
+        b = base.get(name, {})
+        print(f"  {name:<14} {r['ms_per_capture']:>9.3f} {b.get('ms_per_capture', float('nan')):>9.3f} ms/次  "
+              f"p99 {r['p99_ms']:>8.2f} {b.get('p99_ms', float('nan')):>8.2f} ms")
+    regressions = compare(report, baseline)
+    for r in regressions:
+        print(f"回退: {r['case']} {r['ms']} ms (基线 {r['baseline_ms']} ms)")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
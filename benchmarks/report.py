@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+# benchmarks/report.py
+"""基准测试报告的读写与基线比较"""
+import os
+import json
+import math
+import statistics
+import time
+
+
+def load_report(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def save_report(data, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def measure(fn, repeat, warmup=1):
+    """执行 warmup 次预热后计时 repeat 次，返回 ({'min_ms', 'median_ms'}, 最后一次的返回值)"""
+    for _ in range(warmup):
+        fn()
+    samples, result = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return {'min_ms': round(min(samples), 3), 'median_ms': round(statistics.median(samples), 3)}, result
+
+
+def find_regressions(results, baseline, ratio, min_ms, key='median_ms'):
+    """results / baseline 为 {用例: {key: 毫秒}}；返回 [{'case', 'ms', 'baseline_ms'}]，只比较两边都有的用例"""
+    regressions = []
+    for case, r in results.items():
+        base = baseline.get(case)
+        if not base or key not in r or key not in base:
+            continue
+        if r[key] > base[key] * ratio and r[key] - base[key] > min_ms:
+            regressions.append({'case': case, 'ms': r[key], 'baseline_ms': base[key]})
+    return regressions
+
+
+def percentile(samples, p):
+    """最近秩法百分位数，samples 为空时返回 0"""
+    if not samples:
+        return 0
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+# benchmarks/repository_bench.py
+"""
+仓储层基准测试
+
+在临时目录按各规模生成合成库 (benchmarks.synthetic_library)，对 IdeaRepository 的核心查询
+各执行 REPEAT 次 (另有一次预热)，记录最小值与中位数。结果写入 JSON，可与基线比较：
+中位数比基线慢 REGRESSION_RATIO 倍且多出 REGRESSION_MIN_MS 以上记为回退。
+
+命令行:
+    python -m benchmarks.repository_bench run [规模,...] [报告]   默认 1000,10000
+    python -m benchmarks.repository_bench compare [报告]          与基线比较，有回退时返回 1
+    python -m benchmarks.repository_bench baseline [报告]         把报告设为基线
+"""
+import os
+import sys
+import time
+import sqlite3
+import platform
+import tempfile
+from datetime import datetime
+from data.db_context import DBContext
+from data.repositories.idea_repository import IdeaRepository
+from benchmarks.synthetic_library import generate
+from benchmarks.report import load_report, save_report, measure, find_regressions
+
+BENCH_REPORT = 'bench_repository.json'
+BENCH_BASELINE = 'bench_repository_baseline.json'
+DEFAULT_SCALES = (1000, 10000)
+REPEAT = 5
+PAGE_SIZE = 100
+REGRESSION_RATIO = 1.3
+REGRESSION_MIN_MS = 2
+
+
+def _cases(repo):
+    """返回 [(名称, 无参调用)]；依赖库内容的参数 (分类、标签、深页页码) 在此取一次"""
+    conn = repo.db.conn
+    live = conn.execute('SELECT COUNT(*) FROM ideas WHERE is_deleted=0').fetchone()[0]
+    cat = conn.execute('SELECT category_id FROM ideas WHERE category_id IS NOT NULL '
+                       'GROUP BY category_id ORDER BY COUNT(*) DESC LIMIT 1').fetchone()
+    tag = conn.execute('SELECT t.name FROM tags t JOIN idea_tags it ON it.tag_id=t.id '
+                       'GROUP BY t.id ORDER BY COUNT(*) DESC LIMIT 1').fetchone()
+    cat, tag = (cat[0] if cat else None), (tag[0] if tag else None)
+    deep_page = max(1, (live * 9 // 10) // PAGE_SIZE)
+    page_ids = [m['id'] for m in repo.get_metadata_by_filter('', 'all', None)[:PAGE_SIZE]]
+    criteria = {'stars': [4, 5], 'types': ['text', 'image']}
+    return [
+        ('get_counts', repo.get_counts),
+        ('count_all', lambda: repo.get_count_by_filter('', 'all', None)),
+        ('list_first_page', lambda: repo.get_list_by_filter('', 'all', None, 1, PAGE_SIZE)),
+        ('list_deep_page', lambda: repo.get_list_by_filter('', 'all', None, deep_page, PAGE_SIZE)),
+        ('list_frecency', lambda: repo.get_list_by_filter('', 'all', None, 1, PAGE_SIZE, order='frecency')),
+        ('list_category', lambda: repo.get_list_by_filter('', 'category', cat, 1, PAGE_SIZE)),
+        ('list_tag', lambda: repo.get_list_by_filter('', 'all', None, 1, PAGE_SIZE, tag_filter=tag)),
+        ('list_criteria', lambda: repo.get_list_by_filter('', 'all', None, 1, PAGE_SIZE, criteria=criteria)),
+        ('list_trash', lambda: repo.get_list_by_filter('', 'trash', None, 1, PAGE_SIZE)),
+        ('metadata_all', lambda: repo.get_metadata_by_filter('', 'all', None)),
+        ('metadata_category', lambda: repo.get_metadata_by_filter('', 'category', cat)),
+        ('details_page', lambda: repo.get_details_by_ids(page_ids)),
+        ('filter_stats', lambda: repo.get_filter_stats('', 'all', None)),
+        ('search_en', lambda: repo.get_list_by_filter('project', 'all', None, 1, PAGE_SIZE)),
+        ('search_zh', lambda: repo.get_list_by_filter('项目', 'all', None, 1, PAGE_SIZE)),
+        ('search_miss', lambda: repo.get_list_by_filter('zzxq', 'all', None, 1, PAGE_SIZE)),
+        ('search_count', lambda: repo.get_count_by_filter('会议', 'all', None)),
+        ('search_metadata', lambda: repo.get_metadata_by_filter('project', 'all', None)),
+        ('search_filter_stats', lambda: repo.get_filter_stats('project', 'all', None)),
+    ]
+
+
+def run(scales=DEFAULT_SCALES, repeat=REPEAT, seed=1, log=print):
+    """依次生成各规模的库并计时，返回报告"""
+    report = {
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version,
+        'repeat': repeat, 'seed': seed, 'scales': {},
+    }
+    with tempfile.TemporaryDirectory(prefix='bench_') as tmp:
+        for n in scales:
+            path = os.path.join(tmp, f'library_{n}.db')
+            started = time.perf_counter()
+            info = generate(path, ideas=n, seed=seed)
+            log(f"[{n}] 生成 {info['bytes'] / 1024 / 1024:.1f} MB，用时 {time.perf_counter() - started:.1f} s")
+            db = DBContext(path)
+            try:
+                repo = IdeaRepository(db)
+                results = {}
+                for name, fn in _cases(repo):
+                    timing, result = measure(fn, repeat)
+                    results[name] = {**timing, 'rows': result if isinstance(result, int) else len(result)}
+                    log(f"[{n}] {name:<20} {results[name]['median_ms']:>10.2f} ms  ({results[name]['rows']} rows)")
+            finally:
+                db.close()
+            report['scales'][str(n)] = {'counts': info['counts'], 'bytes': info['bytes'], 'results': results}
+    return report
+
+
+def compare(report, baseline):
+    """返回 [{'scale', 'case', 'ms', 'baseline_ms'}]，只比较两边都有的规模与用例"""
+    regressions = []
+    for scale, data in report['scales'].items():
+        base = baseline.get('scales', {}).get(scale, {}).get('results', {})
+        for r in find_regressions(data['results'], base, REGRESSION_RATIO, REGRESSION_MIN_MS):
+            regressions.append({'scale': scale, **r})
+    return regressions
+
+
+def main(argv):
+    cmd = argv[0] if argv else 'run'
+    if cmd == 'run':
+        scales = [int(s) for s in argv[1].split(',')] if len(argv) > 1 else DEFAULT_SCALES
+        path = argv[2] if len(argv) > 2 else BENCH_REPORT
+        report = run(scales)
+        baseline = load_report(BENCH_BASELINE)
+        if baseline:
+            report['regressions'] = compare(report, baseline)
+        save_report(report, path)
+        print(f'已写入 {path}')
+        return 1 if report.get('regressions') else 0
+    if cmd not in ('compare', 'baseline'):
+        print(__doc__)
+        return 2
+    path = argv[1] if len(argv) > 1 else BENCH_REPORT
+    report = load_report(path)
+    if report is None:
+        print(f'找不到报告: {path}')
+        return 1
+    if cmd == 'baseline':
+        save_report(report, BENCH_BASELINE)
+        print(f'已设为基线: {path}')
+        return 0
+    baseline = load_report(BENCH_BASELINE)
+    if baseline is None:
+        print(f'找不到基线: {BENCH_BASELINE}')
+        return 1
+    for scale, data in report['scales'].items():
+        base = baseline.get('scales', {}).get(scale, {}).get('results', {})
+        for case, r in data['results'].items():
+            base_ms = base.get(case, {}).get('median_ms', float('nan'))
+            print(f"  [{scale}] {case:<20} {r['median_ms']:>10.2f} {base_ms:>10.2f}")
+    regressions = compare(report, baseline)
+    for r in regressions:
+        print(f"回退: [{r['scale']}] {r['case']} {r['ms']} ms (基线 {r['baseline_ms']} ms)")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+# benchmarks/synthetic_library.py
+"""
+合成笔记库生成器
+
+按给定规模生成结构与真实数据库一致的库 (DBContext 建表并执行全部迁移)，
+内容为中英文混合文本、图片 (可解码的 PNG) 与文件路径，标签数量与使用次数呈长尾分布，
+分类含两级嵌套，另有一定比例的回收站、书签、置顶、评分和手动颜色。相同 seed 生成相同的库。
+
+命令行:
+    python -m benchmarks.synthetic_library <路径> [条数] [seed]
+"""
+import os
+import sys
+import zlib
+import struct
+import random
+import hashlib
+from datetime import datetime, timedelta
+from data.db_context import DBContext
+
+DEFAULT_LIBRARY = {
+    'ideas': 10000,
+    'seed': 1,
+    'image_ratio': 0.1,         # 图片占比
+    'file_ratio': 0.05,         # 文件/文件夹占比
+    'zh_ratio': 0.5,            # 中文文本占比
+    'trash_ratio': 0.05,
+    'favorite_ratio': 0.05,
+    'pinned_ratio': 0.005,
+    'color_ratio': 0.03,        # 手动指定颜色的比例
+    'uncategorized_ratio': 0.3,
+    'tags': 200,
+    'max_tags_per_idea': 4,
+    'categories': 30,
+    'blob_kb': 64,              # 图片 blob 的平均大小
+    'days': 730,                # 创建时间分布在最近多少天内
+}
+
+EN_WORDS = ('project meeting notes todo review deploy server client python query index cache design '
+            'release bug fix feature draft idea budget invoice address phone email link password '
+            'report summary weekly plan schedule travel recipe book article quote code snippet config').split()
+ZH_WORDS = ('项目 会议 记录 待办 审核 部署 服务器 客户端 查询 索引 缓存 设计 发布 问题 修复 功能 草稿 '
+            '想法 预算 发票 地址 电话 邮箱 链接 密码 报告 总结 周报 计划 日程 旅行 菜谱 读书 文章 摘录 代码 配置').split()
+FILE_EXTS = ('pdf', 'docx', 'xlsx', 'png', 'zip', 'txt', 'py', 'mp4')
+COLORS = ('#e74c3c', '#3498db', '#2ecc71', '#f1c40f', '#9b59b6')
+
+
+def random_text(rng, zh):
+    """长度呈对数正态分布：多数几十到几百字，少数数千字"""
+    words = ZH_WORDS if zh else EN_WORDS
+    n = max(2, min(int(rng.lognormvariate(3.2, 1.1)), 3000))
+    sep = '' if zh else ' '
+    lines = []
+    for i in range(0, n, 12):
+        lines.append(sep.join(rng.choice(words) for _ in range(min(12, n - i))))
+    return '\n'.join(lines)
+
+
+def _file_paths(rng):
+    paths = []
+    for _ in range(1 if rng.random() < 0.8 else rng.randint(2, 5)):
+        name = f"{rng.choice(EN_WORDS)}_{rng.randint(1, 9999)}.{rng.choice(FILE_EXTS)}"
+        paths.append(f"C:/Users/bench/{rng.choice(('Desktop', 'Documents', 'Downloads'))}/{name}")
+    return ';'.join(paths)
+
+
+def _png(rng, size):
+    """生成约 size 字节的 RGB PNG：上半部分为随机像素 (几乎不可压缩)，下半部分为纯色，类似截图"""
+    width = max(16, int((size / 3 * 2) ** 0.5 * 4 / 3))
+    noise_rows = max(1, int(size / 3 / width))
+    height = noise_rows * 2
+    flat = b'\x00' + bytes(rng.choice(((40, 40, 40), (240, 240, 240)))) * width
+    raw = b''.join(b'\x00' + rng.getrandbits(width * 24).to_bytes(width * 3, 'little') for _ in range(noise_rows))
+    raw += flat * (height - noise_rows)
+
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data))
+
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw, 1)) + chunk(b'IEND', b''))
+
+
+def _timestamp(now, rng, days):
+    return (now - timedelta(seconds=rng.random() * days * 86400)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def generate(path, **options):
+    """生成合成库到 path (已存在则覆盖)，返回实际使用的参数与各类数量"""
+    opts = {**DEFAULT_LIBRARY, **options}
+    rng = random.Random(opts['seed'])
+    for suffix in ('', '-wal', '-shm', '-journal'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+    db = DBContext(path)
+    conn = db.conn
+    now = datetime.now()
+    try:
+        # 分类：约三分之一为二级分类
+        cat_ids = []
+        for i in range(opts['categories']):
+            parent = rng.choice(cat_ids) if cat_ids and rng.random() < 0.35 else None
+            cur = conn.execute('INSERT INTO categories (name, parent_id, color, sort_order) VALUES (?,?,?,?)',
+                               (f'分类{i}' if i % 2 else f'Category {i}', parent, rng.choice(COLORS), i))
+            cat_ids.append(cur.lastrowid)
+        tag_ids = [conn.execute('INSERT INTO tags (name) VALUES (?)', (f'{rng.choice(ZH_WORDS + EN_WORDS)}{i}',)).lastrowid
+                   for i in range(opts['tags'])]
+        # 标签使用频率按排名的倒数加权 (Zipf)
+        tag_weights = [1.0 / (rank + 1) for rank in range(len(tag_ids))]
+
+        counts = {'text': 0, 'image': 0, 'file': 0, 'trash': 0, 'idea_tags': 0}
+        blob_bytes = opts['blob_kb'] * 1024
+        for start in range(0, opts['ideas'], 1000):
+            rows, tag_rows = [], []
+            for _ in range(start, min(start + 1000, opts['ideas'])):
+                r = rng.random()
+                blob = None
+                if r < opts['image_ratio']:
+                    item_type, title, content = 'image', '[图片]', '[Image Data]'
+                    blob = _png(rng, max(1024, int(rng.expovariate(1 / blob_bytes))))
+                    content_hash = hashlib.sha256(blob).hexdigest()
+                    counts['image'] += 1
+                elif r < opts['image_ratio'] + opts['file_ratio']:
+                    content = _file_paths(rng)
+                    ext = content.rsplit('.', 1)[-1] if ';' not in content else 'files'
+                    item_type, title = ext, f"[{ext}] {os.path.basename(content.split(';')[0])}"
+                    content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
+                    counts['file'] += 1
+                else:
+                    content = random_text(rng, rng.random() < opts['zh_ratio'])
+                    item_type, title = 'text', content.split('\n', 1)[0][:50]
+                    content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
+                    counts['text'] += 1
+                created = _timestamp(now, rng, opts['days'])
+                updated = max(created, _timestamp(now, rng, opts['days']))
+                deleted = int(rng.random() < opts['trash_ratio'])
+                counts['trash'] += deleted
+                rows.append((
+                    title, content, rng.choice(COLORS) if rng.random() < opts['color_ratio'] else None,
+                    None if rng.random() < opts['uncategorized_ratio'] else rng.choice(cat_ids),
+                    item_type, blob, content_hash, 'clipboard' if item_type != 'text' or rng.random() < 0.6 else None,
+                    created, updated, deleted, int(rng.random() < opts['favorite_ratio']),
+                    int(rng.random() < opts['pinned_ratio']), rng.choice((0, 0, 0, 1, 2, 3, 4, 5)),
+                ))
+                k = min(int(rng.expovariate(0.8)), opts['max_tags_per_idea'])
+                tag_rows.append(set(rng.choices(tag_ids, tag_weights, k=k)) if k else ())
+            for row, tags in zip(rows, tag_rows):
+                iid = conn.execute(
+                    'INSERT INTO ideas (title, content, color, category_id, item_type, data_blob, content_hash, source, '
+                    'created_at, updated_at, is_deleted, is_favorite, is_pinned, rating) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)',
+                    row).lastrowid
+                conn.executemany('INSERT INTO idea_tags (idea_id, tag_id) VALUES (?,?)', ((iid, t) for t in tags))
+                counts['idea_tags'] += len(tags)
+            conn.commit()
+        # 生成过程中的变更日志不属于库的内容
+        conn.execute('DELETE FROM change_log')
+        conn.commit()
+        conn.execute('ANALYZE')
+        conn.commit()
+    finally:
+        db.close()
+    return {'options': opts, 'counts': counts, 'bytes': os.path.getsize(path)}
+
+
+def open_service(path):
+    """以应用相同的仓储与服务层打开 path 处的库 (不经过 AppContainer 单例)"""
+    from data.repositories.idea_repository import IdeaRepository
+    from data.repositories.category_repository import CategoryRepository
+    from data.repositories.tag_repository import TagRepository
+    from data.repositories.change_log_repository import ChangeLogRepository
+    from services.idea_service import IdeaService
+    db = DBContext(path)
+    return IdeaService(IdeaRepository(db), CategoryRepository(db), TagRepository(db), ChangeLogRepository(db))
+
+
+def main(argv):
+    if not argv:
+        print(__doc__)
+        return 2
+    options = {}
+    if len(argv) > 1:
+        options['ideas'] = int(argv[1])
+    if len(argv) > 2:
+        options['seed'] = int(argv[2])
+    info = generate(argv[0], **options)
+    print(f"{argv[0]}: {info['counts']}, {info['bytes'] / 1024 / 1024:.1f} MB")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+# benchmarks/ui_bench.py
+"""
+界面渲染基准测试 (无界面环境，QT_QPA_PLATFORM=offscreen)
+
+在临时目录生成两个合成库: mixed (文本为主) 与 images (几乎全是图片)，
+对 CardListView.render_cards、QuickWindow._update_list (每页 PAGE_SIZES 条)、
+Sidebar.refresh_sync 和 FilterPanel.update_stats 分别计时:
+    build   调用本身加上处理完由它产生的布局/延迟删除事件
+    paint   widget.grab() 渲染到图片 (只包含可见区域)
+另对每个用例单独跑一次内存测量: Python 分配峰值 (tracemalloc) 与进程 RSS 增量。
+窗口尺寸、库内容 (固定 seed) 与 QSettings 均固定，同一台机器上不同提交的结果可以直接比较。
+
+命令行:
+    python -m benchmarks.ui_bench run [报告]
+    python -m benchmarks.ui_bench compare [报告]     与基线比较，有回退时返回 1
+    python -m benchmarks.ui_bench baseline [报告]    把报告设为基线
+"""
+import os
+import sys
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import time
+import platform
+import tempfile
+import tracemalloc
+from datetime import datetime
+from PyQt5.QtCore import QEvent, QSettings, QT_VERSION_STR
+from PyQt5.QtWidgets import QApplication
+from benchmarks.synthetic_library import generate, open_service
+from benchmarks.report import load_report, save_report, measure, find_regressions
+
+BENCH_REPORT = 'bench_ui.json'
+BENCH_BASELINE = 'bench_ui_baseline.json'
+LIBRARIES = {
+    'mixed': {'ideas': 3000},
+    'images': {'ideas': 1200, 'image_ratio': 0.95, 'file_ratio': 0.0, 'blob_kb': 48},
+}
+PAGE_SIZES = (20, 100, 1000)
+WINDOW_SIZE = (1000, 800)
+REPEAT = 3
+REGRESSION_RATIO = 1.3
+REGRESSION_MIN_MS = 5
+
+
+def _settle(app):
+    """处理挂起的事件 (布局请求等) 并执行 deleteLater，使下一轮从干净状态开始"""
+    app.processEvents()
+    QApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+    app.processEvents()
+
+
+def _rss_kb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError, AttributeError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _memory(app, fn):
+    """执行一次 fn，返回 Python 分配峰值与 RSS 增量 (KB)"""
+    _settle(app)
+    rss = _rss_kb()
+    tracemalloc.start()
+    try:
+        fn()
+        _settle(app)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'py_peak_kb': peak // 1024, 'rss_delta_kb': _rss_kb() - rss}
+
+
+def _cases(app, service):
+    """返回 [(用例名, 创建 widget, 构建调用, 要 grab 的 widget)]；create 返回的对象传给后两者"""
+    from ui.card_list_view import CardListView
+    from ui.quick_window import QuickWindow
+    from ui.sidebar import Sidebar
+    from ui.filter_panel import FilterPanel
+
+    ids = [m['id'] for m in service.get_metadata('', 'all', None)]
+    stats = service.get_filter_stats('', 'all', None)
+
+    def shown(widget):
+        widget.resize(*WINDOW_SIZE)
+        widget.show()
+        _settle(app)
+        return widget
+
+    cases = []
+    for n in PAGE_SIZES:
+        page = service.get_details(ids[:n])
+        cases.append((f'card_list/{n}', lambda: shown(CardListView(service)),
+                      lambda w, page=page: w.render_cards(page), lambda w: w))
+
+        def quick_window(n=n):
+            w = shown(QuickWindow(service))
+            w.page_size, w.current_page = n, 1
+            return w
+        cases.append((f'quick_list/{n}', quick_window, lambda w: w._update_list(), lambda w: w.list_widget))
+    cases.append(('sidebar', lambda: shown(Sidebar(service)), lambda w: w.refresh_sync(), lambda w: w))
+    cases.append(('filter_panel', lambda: shown(FilterPanel()), lambda w: w.update_stats(stats), lambda w: w))
+    return cases
+
+
+def _close(app, widget):
+    widget.close()
+    widget.deleteLater()
+    _settle(app)
+
+
+def run(repeat=REPEAT, seed=1, log=print):
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    report = {
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(), 'qt': QT_VERSION_STR, 'platform': app.platformName(),
+        'repeat': repeat, 'seed': seed, 'window': list(WINDOW_SIZE),
+        'libraries': {}, 'results': {}, 'memory': {},
+    }
+    with tempfile.TemporaryDirectory(prefix='bench_ui_') as tmp:
+        # QuickWindow 会恢复 QSettings 中保存的窗口状态，改用空的临时配置
+        for fmt in (QSettings.NativeFormat, QSettings.IniFormat):
+            QSettings.setPath(fmt, QSettings.UserScope, tmp)
+        for lib, options in LIBRARIES.items():
+            path = os.path.join(tmp, f'{lib}.db')
+            info = generate(path, seed=seed, **options)
+            report['libraries'][lib] = {'options': options, 'counts': info['counts'], 'bytes': info['bytes']}
+            service = open_service(path)
+            try:
+                for name, create, build, target in _cases(app, service):
+                    case = f'{lib}/{name}'
+                    widget = create()
+                    report['memory'][case] = _memory(app, lambda: build(widget))
+                    _close(app, widget)
+
+                    widget = create()
+                    timing, _ = measure(lambda: (build(widget), _settle(app)), repeat)
+                    report['results'][case + '/build'] = timing
+                    timing, _ = measure(lambda: target(widget).grab(), repeat)
+                    report['results'][case + '/paint'] = timing
+                    _close(app, widget)
+                    log(f"{case:<28} build {report['results'][case + '/build']['median_ms']:>9.1f} ms  "
+                        f"paint {report['results'][case + '/paint']['median_ms']:>7.1f} ms  "
+                        f"py peak {report['memory'][case]['py_peak_kb']:>7} KB  "
+                        f"rss +{report['memory'][case]['rss_delta_kb']} KB")
+            finally:
+                service.idea_repo.db.close()
+    return report
+
+
+def compare(report, baseline):
+    return find_regressions(report['results'], baseline.get('results', {}), REGRESSION_RATIO, REGRESSION_MIN_MS)
+
+
+def main(argv):
+    cmd = argv[0] if argv else 'run'
+    if cmd == 'run':
+        path = argv[1] if len(argv) > 1 else BENCH_REPORT
+        started = time.perf_counter()
+        report = run()
+        baseline = load_report(BENCH_BASELINE)
+        if baseline:
+            report['regressions'] = compare(report, baseline)
+        save_report(report, path)
+        print(f'已写入 {path}，用时 {time.perf_counter() - started:.1f} s')
+        return 1 if report.get('regressions') else 0
+    if cmd not in ('compare', 'baseline'):
+        print(__doc__)
+        return 2
+    path = argv[1] if len(argv) > 1 else BENCH_REPORT
+    report = load_report(path)
+    if report is None:
+        print(f'找不到报告: {path}')
+        return 1
+    if cmd == 'baseline':
+        save_report(report, BENCH_BASELINE)
+        print(f'已设为基线: {path}')
+        return 0
+    baseline = load_report(BENCH_BASELINE)
+    if baseline is None:
+        print(f'找不到基线: {BENCH_BASELINE}')
+        return 1
+    base = baseline.get('results', {})
+    for case, r in report['results'].items():
+        print(f"  {case:<36} {r['median_ms']:>10.2f} {base.get(case, {}).get('median_ms', float('nan')):>10.2f}")
+    regressions = compare(report, baseline)
+    for r in regressions:
+        print(f"回退: {r['case']} {r['ms']} ms (基线 {r['baseline_ms']} ms)")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
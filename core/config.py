@@ -1,6 +1,10 @@
 # core/config.py
 DB_NAME = 'ideas.db'
 BACKUP_DIR = 'backups'
+DIAGNOSTICS_DIR = 'diagnostics'
+
+# 快速窗口 frecency 排序: 使用热度的半衰期 (天)
+FRECENCY_HALF_LIFE_DAYS = 7
 
 COLORS = {
     'primary': '#4a90e2',   # 核心蓝
@@ -12,6 +16,7 @@ COLORS = {
     'orange':  '#FF8C00',   # 深橙色
     'default_note': '#2d2d2d', 
     'trash': '#2d2d2d',
+    'bookmark': '#ff6b81',  # 书签
     'uncategorized': '#0A362F',
     'bg_dark': '#1e1e1e',   # 窗口背景
     'bg_mid':  '#252526',   # 侧边栏/输入框背景
@@ -4,6 +4,7 @@ from data.db_context import DBContext
 from data.repositories.idea_repository import IdeaRepository
 from data.repositories.category_repository import CategoryRepository
 from data.repositories.tag_repository import TagRepository
+from data.repositories.change_log_repository import ChangeLogRepository
 from services.idea_service import IdeaService
 
 class AppContainer:
@@ -21,8 +22,9 @@ class AppContainer:
         self.idea_repo = IdeaRepository(self.db_context)
         self.category_repo = CategoryRepository(self.db_context)
         self.tag_repo = TagRepository(self.db_context)
+        self.change_log_repo = ChangeLogRepository(self.db_context)
 
-        self.idea_service = IdeaService(self.idea_repo, self.category_repo, self.tag_repo)
+        self.idea_service = IdeaService(self.idea_repo, self.category_repo, self.tag_repo, self.change_log_repo)
 
     @property
     def service(self):
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+# core/diagnostics.py
+"""
+运行中的性能与内存诊断 (由工具箱触发，输出到 DIAGNOSTICS_DIR)
+
+profile_session   cProfile 分析界面线程: start() 开始，stop() 写出 .prof 与按累计耗时排序的前 PROFILE_TOP 项文本摘要
+memory_tracker    tracemalloc 快照: 每次 snapshot() 写出一份报告，含分配总量、登记的缓存结构的条目数/估算大小，
+                  以及与上一次快照相比增长最多的分配位置 (首次为当前占用最多的位置)
+
+缓存结构用 memory_tracker.watch(名称, 取值函数) 登记，取值函数返回 None 表示该结构尚未创建。
+.prof 可用 python -m pstats 或 snakeviz 等工具查看。
+"""
+import os
+import sys
+import time
+import pstats
+import cProfile
+import logging
+import tracemalloc
+from datetime import datetime
+from core.config import DIAGNOSTICS_DIR
+
+PROFILE_TOP = 40
+MEMORY_FRAMES = 10
+MEMORY_TOP = 30
+SIZE_WALK_LIMIT = 200000
+
+
+def _output_path(name):
+    os.makedirs(DIAGNOSTICS_DIR, exist_ok=True)
+    return os.path.join(DIAGNOSTICS_DIR, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{name}")
+
+
+def deep_size(obj, limit=SIZE_WALK_LIMIT):
+    """估算容器及其内容的字节数 (sys.getsizeof 递归求和，同一对象只计一次，最多遍历 limit 个对象)"""
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack and len(seen) < limit:
+        o = stack.pop()
+        if id(o) in seen:
+            continue
+        seen.add(id(o))
+        total += sys.getsizeof(o)
+        if isinstance(o, dict):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)):
+            stack.extend(o)
+        elif hasattr(o, 'keys') and not isinstance(o, (str, bytes)):
+            # sqlite3.Row 等
+            try:
+                stack.extend(o)
+            except TypeError:
+                pass
+    return total
+
+
+class ProfileSession:
+    def __init__(self):
+        self._profiler = None
+        self._started = None
+
+    @property
+    def active(self):
+        return self._profiler is not None
+
+    def start(self):
+        """只分析调用线程 (界面线程)"""
+        if self._profiler:
+            return
+        profiler = cProfile.Profile()
+        profiler.enable()
+        self._profiler, self._started = profiler, time.perf_counter()
+        logging.info("[Diagnostics] Profiling started")
+
+    def stop(self):
+        """返回 (.prof 路径, 摘要路径)；未在分析时返回 None"""
+        profiler, self._profiler = self._profiler, None
+        if profiler is None:
+            return None
+        profiler.disable()
+        seconds = time.perf_counter() - self._started
+        base = _output_path('profile')
+        profiler.dump_stats(base + '.prof')
+        with open(base + '.txt', 'w', encoding='utf-8') as f:
+            f.write(f"分析时长 {seconds:.1f} s\n\n")
+            stats = pstats.Stats(profiler, stream=f)
+            stats.sort_stats('cumulative').print_stats(PROFILE_TOP)
+            stats.sort_stats('tottime').print_stats(PROFILE_TOP)
+        logging.info(f"[Diagnostics] Profile written to {base}.prof ({seconds:.1f} s)")
+        return base + '.prof', base + '.txt'
+
+
+class MemoryTracker:
+    def __init__(self):
+        self._watched = {}
+        self._previous = None
+        self._previous_sizes = {}
+
+    def watch(self, name, getter):
+        self._watched[name] = getter
+
+    @property
+    def active(self):
+        return tracemalloc.is_tracing()
+
+    def _structure_sizes(self):
+        sizes = {}
+        for name, getter in self._watched.items():
+            try:
+                obj = getter()
+            except Exception as e:
+                sizes[name] = {'error': str(e)}
+                continue
+            if obj is not None:
+                sizes[name] = {'items': len(obj) if hasattr(obj, '__len__') else None, 'bytes': deep_size(obj)}
+        return sizes
+
+    def snapshot(self):
+        """拍一次快照并写出报告，返回报告路径；首次调用时开始跟踪 (之前的分配不计入)"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(MEMORY_FRAMES)
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        sizes = self._structure_sizes()
+        path = _output_path('memory') + '.txt'
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"tracemalloc 当前 {current / 1024:.0f} KB，峰值 {peak / 1024:.0f} KB\n\n缓存结构:\n")
+            for name, s in sizes.items():
+                if 'error' in s:
+                    f.write(f"  {name:<32} <{s['error']}>\n")
+                    continue
+                prev = self._previous_sizes.get(name, {})
+                delta = f"  ({s['bytes'] - prev['bytes']:+,} B)" if 'bytes' in prev else ''
+                f.write(f"  {name:<32} {s['items'] if s['items'] is not None else '-':>8} 项 {s['bytes']:>14,} B{delta}\n")
+            if self._previous is None:
+                f.write(f"\n占用最多的 {MEMORY_TOP} 个分配位置:\n")
+                for stat in snapshot.statistics('lineno')[:MEMORY_TOP]:
+                    f.write(f"  {stat}\n")
+            else:
+                f.write(f"\n与上次快照相比增长最多的 {MEMORY_TOP} 个分配位置:\n")
+                for stat in snapshot.compare_to(self._previous, 'lineno')[:MEMORY_TOP]:
+                    f.write(f"  {stat}\n")
+                top = snapshot.compare_to(self._previous, 'traceback')[:3]
+                for stat in top:
+                    f.write(f"\n{stat}\n" + '\n'.join(stat.traceback.format()) + '\n')
+        self._previous, self._previous_sizes = snapshot, sizes
+        logging.info(f"[Diagnostics] Memory snapshot written to {path}")
+        return path
+
+    def stop(self):
+        """停止跟踪并丢弃已有快照"""
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._previous, self._previous_sizes = None, {}
+
+
+profile_session = ProfileSession()
+memory_tracker = MemoryTracker()
@@ -1,37 +1,127 @@
+# -*- coding: utf-8 -*-
+# core/logger.py
+"""
+应用日志
 
-import logging
+调用线程只把消息文本 (含异常堆栈) 格式化后放进内存队列，不写文件；由 QueueListener 的后台线程加上
+时间、位置等前缀并写入按大小轮转的日志文件。消息在调用线程格式化，记录的是调用时的参数值，也不会在后台线程
+访问 Qt 对象或长时间持有异常帧。低于当前级别的日志在 isEnabledFor 处直接返回，不会创建记录，
+所以热点路径请使用 logging.debug('... %s', value) 形式，参数只在确实写出时才格式化。
+
+设置项 logging (settings.json):
+    level      全局级别
+    file       日志文件
+    max_bytes  单个文件上限，超过后轮转
+    backups    保留的轮转文件数
+    console    是否同时输出到控制台
+    levels     按模块的级别 {日志器名或模块名: 级别}，如 {"clipboard": "DEBUG", "FilterPanel": "WARNING"}
+               模块名为文件名 (不含 .py)，用于直接调用 logging.xxx 的模块
+"""
 import sys
-from logging.handlers import RotatingFileHandler
+import queue
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from core.settings import load_setting
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s'
+DEFAULT_LOGGING = {
+    'level': 'INFO',
+    'file': 'app_log.txt',
+    'max_bytes': 5 * 1024 * 1024,
+    'backups': 5,
+    'console': False,
+    'levels': {},
+}
+
+_listener = None
+_file_listeners = []
+
+
+class _ModuleLevelFilter(logging.Filter):
+    """依次按日志器名、模块名查找配置的级别，都没有时使用全局级别"""
+    def __init__(self, default_level, levels):
+        super().__init__()
+        self.default_level = default_level
+        self.levels = levels
+
+    def filter(self, record):
+        levels = self.levels
+        return record.levelno >= levels.get(record.name, levels.get(record.module, self.default_level))
+
+
+def _level(value):
+    return value if isinstance(value, int) else logging.getLevelName(str(value).upper())
+
 
 def setup_logging():
-    logger = logging.getLogger('RapidNotes')
-    logger.setLevel(logging.DEBUG)
-
-    # Prevent adding handlers multiple times
-    if logger.hasHandlers():
-        logger.handlers.clear()
-
-    # Formatter
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s'
-    )
-
-    # Console Handler
-    stdout_handler = logging.StreamHandler(sys.stdout)
-    stdout_handler.setLevel(logging.DEBUG)
-    stdout_handler.setFormatter(formatter)
-    logger.addHandler(stdout_handler)
-
-    # File Handler
-    file_handler = RotatingFileHandler(
-        'app_run.log', maxBytes=1024 * 1024 * 5, backupCount=5, encoding='utf-8'
-    )
-    file_handler.setLevel(logging.DEBUG)
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
-
-    logger.info("日志服务初始化成功。")
+    """配置根日志器，返回 QueueListener；重复调用时直接返回已有的监听器"""
+    global _listener
+    if _listener is not None:
+        return _listener
+    settings = {**DEFAULT_LOGGING, **(load_setting('logging') or {})}
+    level = _level(settings['level'])
+    levels = {name: _level(lvl) for name, lvl in (settings.get('levels') or {}).items()}
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = [RotatingFileHandler(settings['file'], maxBytes=int(settings['max_bytes']),
+                                    backupCount=int(settings['backups']), encoding='utf-8')]
+    if settings.get('console'):
+        handlers.append(logging.StreamHandler(sys.stdout))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(_ModuleLevelFilter(level, levels))
+    root = logging.getLogger()
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    root.addHandler(queue_handler)
+    # 根日志器取配置中最低的级别，只有为某个模块单独调低级别时才会为更低级别创建记录，再由过滤器按模块筛选
+    root.setLevel(min([level] + list(levels.values())))
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _listener
+
+
+def file_logger(name, path, max_bytes, backups, fmt='%(message)s'):
+    """
+    写入独立轮转文件的日志器 (不传播到根日志器)，同样只在调用线程入队、由后台线程写文件；
+    重复调用返回同一个日志器
+    """
+    logger = logging.getLogger(name)
+    if logger.handlers:
+        return logger
+    handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding='utf-8')
+    handler.setFormatter(logging.Formatter(fmt))
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(QueueHandler(log_queue))
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    listener = QueueListener(log_queue, handler)
+    listener.start()
+    if not _file_listeners:
+        atexit.register(shutdown_logging)
+    _file_listeners.append(listener)
+    return logger
+
+
+def shutdown_logging():
+    """写完队列中剩余的记录并停止后台线程"""
+    global _listener
+    listeners = _file_listeners[:]
+    _file_listeners.clear()
+    if _listener is not None:
+        listeners.append(_listener)
+        _listener = None
+    for listener in listeners:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
 
 def get_logger(name):
     return logging.getLogger(name)
-
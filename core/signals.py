@@ -4,6 +4,12 @@ from PyQt5.QtCore import QObject, pyqtSignal
 class AppSignals(QObject):
     # 定义一个名为 data_changed 的信号，无参数
     data_changed = pyqtSignal()
+    # 清空回收站进度 (已删除, 总数)
+    trash_purge_progress = pyqtSignal(int, int)
+    # 有笔记被永久删除 (用于让内存中的缓存失效)
+    ideas_purged = pyqtSignal()
+    # 剪贴板内容变化，采集写入之前发出 (让空闲维护先中断并释放数据库锁)
+    clipboard_changed = pyqtSignal()
 
 # 创建一个全局单例，方便在应用各处统一调用
 app_signals = AppSignals()
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+# core/startup_trace.py
+"""
+启动阶段计时
+
+trace.phase(name) 记录一个阶段的起止，trace.mark(name) 记录一个时间点，
+时间均为相对本模块导入时刻的单调时钟毫秒 (本模块是入口脚本导入的第一个项目模块)。
+启动完成后 finish() 把报告写入 startup_report.json，并与 startup_baseline.json 比较，
+比基线慢 REGRESSION_RATIO 倍且多出 REGRESSION_MIN_MS 以上的阶段记为回退 (写入报告并记 warning)。
+
+设置项 startup_trace (settings.json):
+    enabled   是否记录并写报告
+    imports   安装导入钩子，按 -X importtime 的方式记录每个模块首次导入的自身/累计耗时
+
+命令行:
+    python -m core.startup_trace show|compare [报告]   查看报告 / 与基线比较
+    python -m core.startup_trace baseline [报告]       把报告设为基线
+"""
+import os
+import sys
+import json
+import time
+import logging
+import builtins
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from core.settings import load_setting
+
+_ORIGIN = time.perf_counter()
+
+STARTUP_REPORT = 'startup_report.json'
+STARTUP_BASELINE = 'startup_baseline.json'
+DEFAULT_STARTUP_TRACE = {'enabled': True, 'imports': False}
+REGRESSION_RATIO = 1.5
+REGRESSION_MIN_MS = 50
+TOP_IMPORTS = 30
+
+
+def _now_ms():
+    return round((time.perf_counter() - _ORIGIN) * 1000, 2)
+
+
+class ImportTimer:
+    """包装 builtins.__import__，只记录尚未加载的模块；嵌套导入的耗时计入外层的累计、不计入自身"""
+    def __init__(self):
+        self.records = []
+        self._stack = []
+        self._original = None
+        self._thread = threading.get_ident()
+
+    def install(self):
+        if self._original is None:
+            self._original = builtins.__import__
+            builtins.__import__ = self._import
+
+    def uninstall(self):
+        if self._original is not None:
+            builtins.__import__ = self._original
+            self._original = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        # 相对导入和已加载的模块直接放行；只统计主线程
+        if level or name in sys.modules or threading.get_ident() != self._thread:
+            return self._original(name, globals, locals, fromlist, level)
+        self._stack.append(0.0)
+        started = time.perf_counter()
+        try:
+            return self._original(name, globals, locals, fromlist, level)
+        finally:
+            cumulative = time.perf_counter() - started
+            children = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += cumulative
+            self.records.append({'module': name, 'self_ms': round((cumulative - children) * 1000, 2),
+                                 'cumulative_ms': round(cumulative * 1000, 2)})
+
+
+class StartupTrace:
+    def __init__(self):
+        self.settings = {**DEFAULT_STARTUP_TRACE, **(load_setting('startup_trace') or {})}
+        self.enabled = bool(self.settings.get('enabled'))
+        self.phases = []
+        self.marks = []
+        self.finished = False
+        self.import_timer = None
+        if self.enabled and self.settings.get('imports'):
+            self.import_timer = ImportTimer()
+            self.import_timer.install()
+
+    @contextmanager
+    def phase(self, name):
+        if not self.enabled or self.finished:
+            yield
+            return
+        start = _now_ms()
+        try:
+            yield
+        finally:
+            end = _now_ms()
+            self.phases.append({'name': name, 'start_ms': start, 'end_ms': end, 'ms': round(end - start, 2)})
+
+    def mark(self, name):
+        if self.enabled and not self.finished:
+            self.marks.append({'name': name, 'at_ms': _now_ms()})
+
+    def mark_first_paint(self, widget, name):
+        """widget 第一次绘制时记一个时间点"""
+        if not self.enabled or self.finished:
+            return
+        from PyQt5.QtCore import QObject, QEvent
+
+        class _PaintFilter(QObject):
+            def eventFilter(f, obj, event):
+                if event.type() == QEvent.Paint:
+                    self.mark(name)
+                    obj.removeEventFilter(f)
+                    f.deleteLater()
+                return False
+
+        widget.installEventFilter(_PaintFilter(widget))
+
+    def report(self):
+        data = {
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'total_ms': _now_ms(),
+            'phases': self.phases,
+            'marks': self.marks,
+        }
+        if self.import_timer:
+            data['imports'] = sorted(self.import_timer.records, key=lambda r: r['cumulative_ms'], reverse=True)
+        return data
+
+    def finish(self, path=STARTUP_REPORT, baseline_path=STARTUP_BASELINE):
+        """启动完成：写报告并与基线比较，返回报告；只生效一次"""
+        if not self.enabled or self.finished:
+            return None
+        self.finished = True
+        if self.import_timer:
+            self.import_timer.uninstall()
+        data = self.report()
+        baseline = _load_report(baseline_path)
+        if baseline:
+            data['regressions'] = compare(data, baseline)
+            for r in data['regressions']:
+                logging.warning(f"[Startup] Regression: {r['name']} {r['ms']} ms (baseline {r['baseline_ms']} ms)")
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+        except OSError as e:
+            logging.warning(f"[Startup] Failed to write report: {e}")
+        logging.info(f"[Startup] Finished in {data['total_ms']:.0f} ms: "
+                     + ', '.join(f"{p['name']} {p['ms']:.0f}" for p in self.phases))
+        return data
+
+
+def _load_report(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def _timings(data):
+    """报告中的阶段耗时与时间点 {名称: 毫秒}；同名阶段累加"""
+    timings = {}
+    for p in data.get('phases', []):
+        timings[p['name']] = round(timings.get(p['name'], 0) + p['ms'], 2)
+    for m in data.get('marks', []):
+        timings.setdefault('@' + m['name'], m['at_ms'])
+    return timings
+
+
+def compare(data, baseline):
+    """返回比基线明显变慢的阶段/时间点: [{'name', 'ms', 'baseline_ms'}]"""
+    current, base = _timings(data), _timings(baseline)
+    return [{'name': name, 'ms': ms, 'baseline_ms': base[name]}
+            for name, ms in current.items()
+            if name in base and ms > base[name] * REGRESSION_RATIO and ms - base[name] > REGRESSION_MIN_MS]
+
+
+trace = StartupTrace()
+
+
+def main(argv):
+    cmd = argv[0] if argv else 'show'
+    path = argv[1] if len(argv) > 1 else STARTUP_REPORT
+    data = _load_report(path)
+    if cmd not in ('show', 'compare', 'baseline'):
+        print(__doc__)
+        return 2
+    if data is None:
+        print(f'找不到报告: {path}')
+        return 1
+    if cmd == 'show':
+        print(f"{data['started_at']}  共 {data['total_ms']:.0f} ms")
+        for p in data['phases']:
+            print(f"  {p['start_ms']:>9.1f} {p['ms']:>9.1f}  {p['name']}")
+        for m in data['marks']:
+            print(f"  {m['at_ms']:>9.1f} {'':>9}  @{m['name']}")
+        for r in data.get('imports', [])[:TOP_IMPORTS]:
+            print(f"  import {r['cumulative_ms']:>9.1f} {r['self_ms']:>9.1f}  {r['module']}")
+    elif cmd == 'compare':
+        baseline = _load_report(STARTUP_BASELINE)
+        if baseline is None:
+            print(f'找不到基线: {STARTUP_BASELINE}')
+            return 1
+        current, base = _timings(data), _timings(baseline)
+        for name, ms in current.items():
+            print(f"  {ms:>9.1f} {base.get(name, float('nan')):>9.1f}  {name}")
+        regressions = compare(data, baseline)
+        for r in regressions:
+            print(f"回退: {r['name']} {r['ms']} ms (基线 {r['baseline_ms']} ms)")
+        return 1 if regressions else 0
+    elif cmd == 'baseline':
+        with open(STARTUP_BASELINE, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        print(f'已设为基线: {path}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+# core/ui_latency.py
+"""
+界面卡顿检测与操作延迟统计
+
+卡顿检测: 界面线程上的心跳定时器每 heartbeat_ms 记录一次时间，辅助线程检查心跳是否超过 stall_ms 未更新
+(至少为两个心跳间隔)，
+超过时用 sys._current_frames 抓取界面线程的 Python 调用栈 (卡顿持续期间每 stall_ms 再抓一次，最多
+MAX_STACK_SAMPLES 次)；心跳恢复后把卡顿时长和调用栈写入日志。心跳的延迟同时计入 'event_loop' 直方图。
+
+操作延迟: ui_latency.start(动作) 记录起点，finish_on_paint(动作, widget) 在 widget 下一次绘制时记录终点，
+按动作累计为直方图 (BUCKETS_MS)，每 flush_seconds 写出一次增量并清零。
+
+记录以 JSON 行经日志队列由后台线程写入 UI_LATENCY_LOG (按大小轮转)，界面线程不做文件写入。
+心跳间隔默认 250 ms，常驻托盘时每秒只唤醒界面线程和辅助线程几次；需要更细的事件循环延迟分布时可调小。
+
+设置项 ui_watchdog (settings.json):
+    enabled        是否启用
+    stall_ms       卡顿阈值
+    heartbeat_ms   心跳间隔
+    flush_seconds  直方图写出间隔
+"""
+import sys
+import json
+import time
+import logging
+import threading
+import traceback
+from core.settings import load_setting
+from core.logger import file_logger
+
+UI_LATENCY_LOG = 'ui_latency.jsonl'
+LOG_MAX_BYTES = 1024 * 1024
+LOG_BACKUPS = 3
+DEFAULT_UI_WATCHDOG = {'enabled': True, 'stall_ms': 500, 'heartbeat_ms': 250, 'flush_seconds': 300}
+BUCKETS_MS = (16, 33, 50, 100, 200, 500, 1000, 2000, 5000)
+MAX_STACK_SAMPLES = 5
+STACK_DEPTH = 25
+PENDING_TIMEOUT = 10.0
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, ms):
+        i = 0
+        while i < len(BUCKETS_MS) and ms > BUCKETS_MS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def to_dict(self):
+        return {'count': self.count, 'avg_ms': round(self.total_ms / self.count, 2) if self.count else 0,
+                'max_ms': round(self.max_ms, 2), 'buckets': dict(zip([f'<={b}' for b in BUCKETS_MS] + ['>'], self.counts))}
+
+
+class UiLatency:
+    def __init__(self):
+        self.settings = {**DEFAULT_UI_WATCHDOG, **(load_setting('ui_watchdog') or {})}
+        self.enabled = bool(self.settings.get('enabled'))
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._armed = {}
+        self._histograms = {}
+        self._writer = None
+        self._heartbeat = None
+        self._flush_timer = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._gui_thread = None
+        self._last_beat = 0.0
+        self._stall = None
+
+    # --- 操作延迟 ---
+    def start(self, action):
+        """记录动作起点，可在任意线程调用 (如全局热键回调)"""
+        if self.enabled:
+            with self._lock:
+                self._pending[action] = time.perf_counter()
+
+    def cancel(self, action):
+        with self._lock:
+            self._pending.pop(action, None)
+
+    def finish(self, action):
+        with self._lock:
+            started = self._pending.pop(action, None)
+        if started is not None and time.perf_counter() - started < PENDING_TIMEOUT:
+            self.record(action, (time.perf_counter() - started) * 1000)
+
+    def finish_on_paint(self, action, widget):
+        """动作已开始时，在 widget (滚动区域取其 viewport) 下一次绘制时结束计时"""
+        with self._lock:
+            if action not in self._pending or action in self._armed:
+                return
+        from PyQt5.QtCore import QObject, QEvent
+        target = widget.viewport() if hasattr(widget, 'viewport') else widget
+        recorder = self
+
+        class _PaintFilter(QObject):
+            def eventFilter(self, obj, event):
+                if event.type() == QEvent.Paint:
+                    obj.removeEventFilter(self)
+                    recorder._armed.pop(action, None)
+                    recorder.finish(action)
+                    self.deleteLater()
+                return False
+
+        paint_filter = _PaintFilter(target)
+        self._armed[action] = paint_filter
+        target.installEventFilter(paint_filter)
+
+    def record(self, action, ms):
+        with self._lock:
+            self._histograms.setdefault(action, Histogram()).add(ms)
+
+    def snapshot(self):
+        with self._lock:
+            return {action: h.to_dict() for action, h in self._histograms.items()}
+
+    # --- 卡顿检测 ---
+    def start_watchdog(self):
+        """在界面线程、QApplication 创建之后调用"""
+        if not self.enabled or self._thread:
+            return
+        from PyQt5.QtCore import QTimer
+        self._writer = file_logger('RapidNotes.ui_latency', UI_LATENCY_LOG, LOG_MAX_BYTES, LOG_BACKUPS)
+
+        self._gui_thread = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._heartbeat = QTimer()
+        self._heartbeat.timeout.connect(self._beat)
+        self._heartbeat.start(int(self.settings['heartbeat_ms']))
+        self._flush_timer = QTimer()
+        self._flush_timer.timeout.connect(self.flush)
+        self._flush_timer.start(int(self.settings['flush_seconds'] * 1000))
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, daemon=True, name='UiWatchdog')
+        self._thread.start()
+
+    def stop(self):
+        if not self._thread:
+            return
+        self._stop.set()
+        self._heartbeat.stop()
+        self._flush_timer.stop()
+        self._thread = None
+        self.flush()
+
+    def _beat(self):
+        now = time.monotonic()
+        with self._lock:
+            gap_ms = (now - self._last_beat) * 1000
+            self._last_beat = now
+            stall, self._stall = self._stall, None
+            self._histograms.setdefault('event_loop', Histogram()).add(max(0.0, gap_ms - self.settings['heartbeat_ms']))
+        if stall:
+            stall['ms'] = round(gap_ms, 1)
+            top = stall['stacks'][0][-1].strip().splitlines()[0] if stall['stacks'] and stall['stacks'][0] else '?'
+            logging.warning(f"[UiWatchdog] UI stalled for {gap_ms:.0f} ms at {top}")
+            self._write({'type': 'stall', **stall})
+
+    def _watch(self):
+        interval = self.settings['heartbeat_ms'] / 1000
+        # 阈值不小于两个心跳间隔，否则正常的心跳间隔也会被当成卡顿
+        threshold = max(self.settings['stall_ms'] / 1000, 2 * interval)
+        while not self._stop.wait(interval):
+            now = time.monotonic()
+            with self._lock:
+                since = now - self._last_beat
+                if since < threshold:
+                    continue
+                stall = self._stall
+                if stall is None:
+                    stall = self._stall = {'at': time.time(), 'stacks': [], '_next': 0.0}
+                if len(stall['stacks']) >= MAX_STACK_SAMPLES or since < stall['_next']:
+                    continue
+                stall['_next'] = since + threshold
+            frame = sys._current_frames().get(self._gui_thread)
+            stack = traceback.format_stack(frame, limit=STACK_DEPTH) if frame else []
+            with self._lock:
+                if self._stall is stall:
+                    stall['stacks'].append(stack)
+
+    def flush(self):
+        """写出上次以来的直方图增量"""
+        with self._lock:
+            histograms, self._histograms = self._histograms, {}
+        if histograms and self._writer:
+            self._write({'type': 'histograms', 'at': time.time(),
+                         'actions': {action: h.to_dict() for action, h in histograms.items()}})
+
+    def _write(self, record):
+        record.pop('_next', None)
+        try:
+            self._writer.info(json.dumps(record, ensure_ascii=False))
+        except Exception as e:
+            logging.warning(f"[UiWatchdog] Failed to write record: {e}")
+
+
+ui_latency = UiLatency()
@@ -3,13 +3,31 @@
 import sqlite3
 import logging
 from core.config import DB_NAME, COLORS
+from data.schema_migrations import SchemaMigration
+from core.startup_trace import trace
+from data.sql_trace import TracedConnection, load_trace_settings
+
+# 写锁被占用时的等待秒数: 空闲维护 (如一次性 VACUUM) 收到中断后回滚需要时间，期间的采集写入等待而不是失败
+BUSY_TIMEOUT = 15
 
 class DBContext:
-    def __init__(self):
-        self.conn = sqlite3.connect(DB_NAME, check_same_thread=False)
-        self.conn.row_factory = sqlite3.Row
-        self._init_schema()
-        self._fix_trash_consistency()
+    def __init__(self, db_path=None):
+        # db_path 仅供基准测试等工具指向临时库，应用始终使用 DB_NAME
+        self.db_path = db_path or DB_NAME
+        with trace.phase('db.connect'):
+            # 设置 sql_trace.enabled 时记录每条语句的耗时，见 data/sql_trace.py
+            self.traced = bool(load_trace_settings().get('enabled'))
+            factory = TracedConnection if self.traced else sqlite3.Connection
+            self.conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT, check_same_thread=False, factory=factory)
+            self.conn.row_factory = sqlite3.Row
+            # 新建的数据库在建表前设置才生效，已有数据库由空闲维护的 VacuumJob 切换
+            self.conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        # 已是最新版本时不做任何探测；回收站一致性等维护工作由空闲维护任务完成
+        if not SchemaMigration.is_current(self.conn):
+            with trace.phase('db.schema'):
+                self._init_schema()
+            with trace.phase('db.migrations'):
+                SchemaMigration.apply(self.conn)
 
     def get_cursor(self):
         return self.conn.cursor()
@@ -81,13 +99,3 @@ class DBContext:
                 logging.warning(f"Failed to add preset_tags column: {e}")
 
         self.conn.commit()
-
-    def _fix_trash_consistency(self):
-        try:
-            c = self.conn.cursor()
-            trash_color = COLORS.get('trash', '#2d2d2d')
-            c.execute('UPDATE ideas SET category_id = NULL, color = ? WHERE is_deleted = 1', (trash_color,))
-            self.conn.commit()
-            logging.debug("Trash consistency check completed")
-        except Exception as e:
-            logging.error(f"Failed to fix trash consistency: {e}", exc_info=True)
\ No newline at end of file
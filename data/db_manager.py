@@ -5,6 +5,7 @@ import hashlib
 import os
 import random
 from core.config import DB_NAME, COLORS
+from services.trash_service import purge_trash_chunks
 
 class DatabaseManager:
     def __init__(self):
@@ -123,10 +124,8 @@ class DatabaseManager:
             pass
 
     def empty_trash(self):
-        c = self.conn.cursor()
-        c.execute('DELETE FROM idea_tags WHERE idea_id IN (SELECT id FROM ideas WHERE is_deleted=1)')
-        c.execute('DELETE FROM ideas WHERE is_deleted=1')
-        self.conn.commit()
+        # 分块删除，每块单独提交，避免长时间持有写锁
+        for _ in purge_trash_chunks(self.conn): pass
 
     def set_locked(self, idea_ids, state):
         if not idea_ids: return
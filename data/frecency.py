@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+# data/frecency.py
+"""
+Frecency (频率 + 新近度) 分数
+
+每次使用贡献 exp(λ·t)，λ = ln2 / 半衰期，t 为距 1970 的天数；分数 = 所有使用贡献之和。
+存储的是它的对数 ln(Σ exp(λ·t_i))，新增一次使用只需一次 logaddexp，不用随时间重算，
+并且按存储值排序与按当前衰减后的分数排序等价，可以直接建索引。
+"""
+import math
+import time
+from core.config import FRECENCY_HALF_LIFE_DAYS
+
+DECAY = math.log(2) / FRECENCY_HALF_LIFE_DAYS
+UNIX_EPOCH_JULIAN = 2440587.5
+
+
+def frecency_at_sql(ts_expr):
+    """SQL 表达式: 在 ts_expr 时刻发生一次使用对应的分数"""
+    return f'((julianday({ts_expr}) - {UNIX_EPOCH_JULIAN}) * {DECAY!r})'
+
+
+FRECENCY_NOW_SQL = frecency_at_sql("'now'")
+
+
+def bump(score, now=None):
+    """在已有分数上追加一次 now 时刻的使用 (logaddexp)"""
+    now = time.time() if now is None else now
+    x = now / 86400.0 * DECAY
+    if score is None:
+        return x
+    hi, lo = max(score, x), min(score, x)
+    return hi + math.log1p(math.exp(lo - hi))
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+# data/large_text.py
+"""
+超大文本外置存储
+
+超过 SPILL_THRESHOLD 字符的文本，ideas.content 只保存开头摘录 (用于列表预览和搜索)，
+全文按 CHUNK_CHARS 分块 zlib 压缩后存入 content_chunks 表，ideas.full_size 记录全文字符数。
+哈希按块增量计算，结果与对整段文本 encode 后计算的 SHA256 相同，旧记录的去重不受影响。
+"""
+import zlib
+import hashlib
+
+SPILL_THRESHOLD = 1024 * 1024
+CHUNK_CHARS = 1024 * 1024
+EXCERPT_CHARS = 4000
+TITLE_SCAN_CHARS = 4096
+
+
+def is_oversized(text):
+    return text is not None and len(text) > SPILL_THRESHOLD
+
+
+def stream_hash(text):
+    """分块编码计算 SHA256，避免一次性生成整段 bytes 副本"""
+    hasher = hashlib.sha256()
+    for i in range(0, len(text), CHUNK_CHARS):
+        hasher.update(text[i:i + CHUNK_CHARS].encode('utf-8'))
+    return hasher.hexdigest()
+
+
+def iter_compressed_chunks(text):
+    """产出 (seq, 压缩后的块)"""
+    for seq, i in enumerate(range(0, len(text), CHUNK_CHARS)):
+        yield seq, zlib.compress(text[i:i + CHUNK_CHARS].encode('utf-8'), 6)
+
+
+def decompress_chunk(data):
+    return zlib.decompress(data).decode('utf-8')
+
+
+def make_excerpt(text):
+    """写入 content 列的摘录，末尾附带全文大小提示"""
+    size_mb = len(text) / 1024 / 1024
+    return f"{text[:EXCERPT_CHARS]}\n\n…（全文 {size_mb:.1f} M 字符，已外部存储）"
+
+
+def make_title(text, limit=50):
+    """只扫描开头部分取首行作标题，不对整段文本做 strip/split"""
+    head = text[:TITLE_SCAN_CHARS].strip()
+    return head.split('\n')[0][:limit]
@@ -54,8 +54,8 @@ class CategoryRepository:
             all_ids = [row[0] for row in c.fetchall()]
 
             if all_ids:
+                # 笔记颜色在读取时通过分类推导，这里只需更新分类表
                 placeholders = ','.join('?' * len(all_ids))
-                c.execute(f"UPDATE ideas SET color = ? WHERE category_id IN ({placeholders})", (color, *all_ids))
                 c.execute(f"UPDATE categories SET color = ? WHERE id IN ({placeholders})", (color, *all_ids))
                 self.db.commit()
         except:
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+# data/repositories/change_log_repository.py
+
+KEEP_ROWS = 50000
+KEEP_DAYS = 30
+
+
+def compact_old(conn, keep_rows=KEEP_ROWS, keep_days=KEEP_DAYS, limit=None):
+    """删除同时超出 keep_rows 条和 keep_days 天的旧记录，limit 限制本次删除的条数 (供分步调用)；返回删除的行数"""
+    where = ("seq <= (SELECT MAX(seq) FROM change_log) - ? AND changed_at < datetime('now', ?)")
+    params = [keep_rows, f'-{int(keep_days)} days']
+    if limit:
+        where = f'seq IN (SELECT seq FROM change_log WHERE {where} ORDER BY seq LIMIT ?)'
+        params.append(limit)
+    c = conn.execute(f'DELETE FROM change_log WHERE {where}', params)
+    conn.commit()
+    return c.rowcount
+
+
+class ChangeLogRepository:
+    """变更日志 (change_log 表由触发器写入，这里只读和压缩)"""
+    def __init__(self, db_context):
+        self.db = db_context
+
+    def latest_seq(self):
+        c = self.db.get_cursor()
+        c.execute('SELECT COALESCE(MAX(seq), 0) FROM change_log')
+        return c.fetchone()[0]
+
+    def oldest_seq(self):
+        """仍保留的最小序号，0 表示日志为空"""
+        c = self.db.get_cursor()
+        c.execute('SELECT COALESCE(MIN(seq), 0) FROM change_log')
+        return c.fetchone()[0]
+
+    def get_since(self, seq, tables=None, limit=None):
+        """返回 seq 之后的变更 (按 seq 升序)，每行: seq, tbl, row_id, kind, columns, changed_at"""
+        c = self.db.get_cursor()
+        q = 'SELECT seq, tbl, row_id, kind, columns, changed_at FROM change_log WHERE seq > ?'
+        p = [seq]
+        if tables:
+            q += f" AND tbl IN ({','.join('?' * len(tables))})"
+            p.extend(tables)
+        q += ' ORDER BY seq'
+        if limit:
+            q += ' LIMIT ?'
+            p.append(limit)
+        c.execute(q, p)
+        return c.fetchall()
+
+    def get_changed_ids(self, seq, table='ideas'):
+        """seq 之后发生过变化的行 id 集合 (同一行多次变更只出现一次)"""
+        c = self.db.get_cursor()
+        if table == 'ideas':
+            # 标签变化也视为笔记变化
+            c.execute("SELECT DISTINCT row_id FROM change_log WHERE seq > ? AND tbl IN ('ideas', 'idea_tags')", (seq,))
+        else:
+            c.execute('SELECT DISTINCT row_id FROM change_log WHERE seq > ? AND tbl = ?', (seq, table))
+        return {r[0] for r in c.fetchall()}
+
+    def compacted_upto(self):
+        """已被压缩删除的最大序号 (压缩总是删除最旧的一段)，0 表示从未删除过"""
+        oldest = self.oldest_seq()
+        if oldest:
+            return oldest - 1
+        # 日志为空: 全部已分配的序号都已被删除，AUTOINCREMENT 在 sqlite_sequence 中保留了分配过的最大序号
+        c = self.db.get_cursor()
+        c.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'")
+        row = c.fetchone()
+        return row[0] if row else 0
+
+    def is_complete_since(self, seq):
+        """seq 之后的变更是否都还在日志里；为 False 时调用方需要全量重扫"""
+        return seq >= self.compacted_upto()
+
+    def compact(self, upto_seq=None, keep_rows=KEEP_ROWS, keep_days=KEEP_DAYS):
+        """
+        压缩策略:
+        - upto_seq: 所有消费者都已处理到的序号，之前的记录直接删除；
+        - 否则只删除同时超出 keep_rows 条和 keep_days 天的旧记录。
+        返回删除的行数。
+        """
+        if upto_seq is None:
+            return compact_old(self.db.conn, keep_rows, keep_days)
+        c = self.db.get_cursor()
+        c.execute('DELETE FROM change_log WHERE seq <= ?', (upto_seq,))
+        removed = c.rowcount
+        self.db.commit()
+        return removed
@@ -1,6 +1,27 @@
 # -*- coding: utf-8 -*-
 # data/repositories/idea_repository.py
+import io
 from core.config import COLORS
+from data import frecency
+from data import large_text
+
+# 卡片颜色在读取时推导，ideas.color 仅保存用户手动指定的颜色 (NULL 表示跟随)
+# 优先级: 回收站 > 手动指定 > 书签 > 所属分类颜色 > 默认
+EFFECTIVE_COLOR_SQL = f"""CASE
+    WHEN i.is_deleted = 1 THEN '{COLORS['trash']}'
+    WHEN i.color IS NOT NULL THEN i.color
+    WHEN i.is_favorite = 1 THEN '{COLORS['bookmark']}'
+    ELSE COALESCE(cat.color, '{COLORS['default_note']}')
+END"""
+CATEGORY_JOIN_SQL = " LEFT JOIN categories cat ON cat.id = i.category_id "
+
+
+def open_blob(conn, iid):
+    """只读打开 ideas.data_blob 的增量 I/O 句柄；Python 3.11 以下没有 blobopen，退回一次性读取"""
+    if hasattr(conn, 'blobopen'):
+        return conn.blobopen('ideas', 'data_blob', iid, readonly=True)
+    return io.BytesIO(conn.execute('SELECT data_blob FROM ideas WHERE id=?', (iid,)).fetchone()[0])
+
 
 class IdeaRepository:
     # SQL字段白名单 - 防止SQL注入
@@ -19,12 +40,14 @@ class IdeaRepository:
         c.execute(q, p)
         return c.fetchone()[0]
 
-    def get_list_by_filter(self, search, f_type, f_val, page, page_size, tag_filter=None, criteria=None):
+    def get_list_by_filter(self, search, f_type, f_val, page, page_size, tag_filter=None, criteria=None, order='recent'):
         c = self.db.get_cursor()
         q, p = self._build_query(search, f_type, f_val, tag_filter, criteria, count_only=False)
         
         if f_type == 'trash':
             q += ' ORDER BY i.updated_at DESC'
+        elif order == 'frecency':
+            q += ' ORDER BY i.is_pinned DESC, i.frecency DESC'
         else:
             q += ' ORDER BY i.is_pinned DESC, i.updated_at DESC'
             
@@ -41,14 +64,15 @@ class IdeaRepository:
         if count_only:
             q = "SELECT COUNT(DISTINCT i.id) FROM ideas i "
         else:
-            q = """
+            q = f"""
                 SELECT DISTINCT 
-                    i.id, i.title, i.content, i.color, i.is_pinned, i.is_favorite, 
+                    i.id, i.title, i.content, {EFFECTIVE_COLOR_SQL} AS color, i.is_pinned, i.is_favorite, 
                     i.created_at, i.updated_at, i.category_id, i.is_deleted, 
-                    i.item_type, i.data_blob, i.content_hash, i.is_locked, i.rating
+                    i.item_type, i.data_blob, i.content_hash, i.is_locked, i.rating, i.full_size
                 FROM ideas i 
             """
             
+        q += CATEGORY_JOIN_SQL
         q += "LEFT JOIN idea_tags it ON i.id=it.idea_id LEFT JOIN tags t ON it.tag_id=t.id WHERE 1=1"
         p = []
 
@@ -79,7 +103,7 @@ class IdeaRepository:
             if 'colors' in criteria:
                 colors = criteria['colors']
                 placeholders = ','.join('?' * len(colors))
-                q += f" AND i.color IN ({placeholders})"
+                q += f" AND {EFFECTIVE_COLOR_SQL} IN ({placeholders})"
                 p.extend(colors)
             if 'types' in criteria:
                 types = criteria['types']
@@ -104,40 +128,111 @@ class IdeaRepository:
         return q, p
 
     def get_by_id(self, iid, include_blob=False):
+        """color 为推导后的显示颜色，color_override 为用户手动指定的颜色 (可能为 NULL)"""
         c = self.db.get_cursor()
-        if include_blob:
-            c.execute('SELECT * FROM ideas WHERE id=?', (iid,))
-        else:
-            c.execute('''
-                SELECT id, title, content, color, is_pinned, is_favorite, 
-                       created_at, updated_at, category_id, is_deleted, item_type, 
-                       NULL as data_blob, NULL as content_hash, is_locked, rating
-                FROM ideas WHERE id=?
-            ''', (iid,))
+        blob_cols = 'i.data_blob, i.content_hash' if include_blob else 'NULL as data_blob, NULL as content_hash'
+        c.execute(f'''
+            SELECT i.id, i.title, i.content, {EFFECTIVE_COLOR_SQL} AS color, i.is_pinned, i.is_favorite, 
+                   i.created_at, i.updated_at, i.category_id, i.is_deleted, i.item_type, 
+                   {blob_cols}, i.is_locked, i.rating, i.color AS color_override, i.full_size
+            FROM ideas i {CATEGORY_JOIN_SQL} WHERE i.id=?
+        ''', (iid,))
         return c.fetchone()
 
-    def add(self, title, content, color, category_id, item_type, data_blob, content_hash=None):
+    def add(self, title, content, color, category_id, item_type, data_blob, content_hash=None, source=None,
+            image_phash=None, text_simhash=None, bands=(), commit=True):
+        """
+        超大文本只在 content 中保存摘录，全文分块写入 content_chunks (同一事务)。
+        frecency、图片 dHash、文本 SimHash 在插入时一并写入，不再用 UPDATE 回写整行；bands 为 SimHash 的
+        LSH 分段 [(段号, 段值)]，与笔记在同一事务写入。commit=False 时由调用方在追加写入后统一提交。
+        """
         c = self.db.get_cursor()
+        stored, full_size = self._split_content(content)
         c.execute(
-            'INSERT INTO ideas (title, content, color, category_id, item_type, data_blob, content_hash) VALUES (?,?,?,?,?,?,?)',
-            (title, content, color, category_id, item_type, data_blob, content_hash)
+            'INSERT INTO ideas (title, content, color, category_id, item_type, data_blob, content_hash, source, full_size, '
+            'frecency, image_phash, text_simhash) VALUES (?,?,?,?,?,?,?,?,?,?,?,?)',
+            (title, stored, color, category_id, item_type, data_blob, content_hash, source, full_size,
+             frecency.bump(None), image_phash, text_simhash)
         )
-        self.db.commit()
-        return c.lastrowid
+        iid = c.lastrowid
+        if full_size is not None:
+            self._replace_chunks(c, iid, content, full_size)
+        if bands:
+            c.executemany('INSERT INTO text_simhash_bands (band, key, idea_id) VALUES (?,?,?)',
+                          [(band, key, iid) for band, key in bands])
+        if commit:
+            self.db.commit()
+        return iid
 
-    def update(self, iid, title, content, color, category_id, item_type, data_blob):
+    def update(self, iid, title, content, color, category_id, item_type, data_blob, keep_blob=False):
+        """keep_blob=True 时不改动已保存的图片 (编辑窗口未替换图片时无需回写整块数据)"""
         c = self.db.get_cursor()
+        stored, full_size = self._split_content(content)
+        blob_set = '' if keep_blob else 'data_blob=?, '
         c.execute(
-            'UPDATE ideas SET title=?, content=?, color=?, category_id=?, item_type=?, data_blob=?, updated_at=CURRENT_TIMESTAMP WHERE id=?',
-            (title, content, color, category_id, item_type, data_blob, iid)
+            f'UPDATE ideas SET title=?, content=?, color=?, category_id=?, item_type=?, {blob_set}full_size=?, updated_at=CURRENT_TIMESTAMP WHERE id=?',
+            (title, stored, color, category_id, item_type) + (() if keep_blob else (data_blob,)) + (full_size, iid)
         )
+        self._replace_chunks(c, iid, content, full_size)
         self.db.commit()
 
+    @staticmethod
+    def _split_content(content):
+        """返回 (写入 content 列的值, full_size)；未超限时 full_size 为 None"""
+        if large_text.is_oversized(content):
+            return large_text.make_excerpt(content), len(content)
+        return content, None
+
+    @staticmethod
+    def _replace_chunks(c, iid, content, full_size):
+        c.execute('DELETE FROM content_chunks WHERE idea_id=?', (iid,))
+        if full_size is not None:
+            c.executemany('INSERT INTO content_chunks (idea_id, seq, data) VALUES (?,?,?)',
+                          ((iid, seq, data) for seq, data in large_text.iter_compressed_chunks(content)))
+
+    def iter_full_content(self, iid):
+        """逐块产出全文；未外置存储的笔记直接产出 content"""
+        c = self.db.get_cursor()
+        c.execute('SELECT content, full_size FROM ideas WHERE id=?', (iid,))
+        row = c.fetchone()
+        if not row:
+            return
+        if row[1] is None:
+            if row[0]: yield row[0]
+            return
+        # 独立游标逐块读取，每次只解压一块
+        chunks = self.db.get_cursor()
+        chunks.execute('SELECT data FROM content_chunks WHERE idea_id=? ORDER BY seq', (iid,))
+        for (data,) in chunks:
+            yield large_text.decompress_chunk(data)
+
+    def get_full_content(self, iid):
+        return ''.join(self.iter_full_content(iid))
+
+    def open_blob(self, iid):
+        """
+        以增量 I/O 方式只读打开图片数据，返回支持 read/seek/tell/close 的对象；无图片时返回 None。
+        调用方用完需 close()；期间该行被修改会使句柄失效。
+        """
+        c = self.db.get_cursor()
+        c.execute('SELECT length(data_blob) FROM ideas WHERE id=?', (iid,))
+        row = c.fetchone()
+        if not row or not row[0]:
+            return None
+        return open_blob(self.db.conn, iid)
+
     def update_field(self, iid, field, value):
         # 【安全修复】验证字段名是否在白名单中
         if field not in self.ALLOWED_UPDATE_FIELDS:
             raise ValueError(f"Invalid field name: {field}. Allowed fields: {self.ALLOWED_UPDATE_FIELDS}")
         c = self.db.get_cursor()
+        if field == 'content':
+            # 保证外置存储的分块与 content 一致
+            stored, full_size = self._split_content(value)
+            c.execute('UPDATE ideas SET content=?, full_size=? WHERE id=?', (stored, full_size, iid))
+            self._replace_chunks(c, iid, value, full_size)
+            self.db.commit()
+            return
         c.execute(f'UPDATE ideas SET {field} = ? WHERE id = ?', (value, iid))
         self.db.commit()
 
@@ -149,6 +244,21 @@ class IdeaRepository:
         c.execute(f'UPDATE ideas SET {field} = NOT {field} WHERE id=?', (iid,))
         self.db.commit()
 
+    def set_deleted(self, iid, state):
+        """移入/移出回收站，单条语句完成；颜色由读取时推导，这里只清除手动颜色"""
+        c = self.db.get_cursor()
+        c.execute(
+            'UPDATE ideas SET is_deleted=?, category_id=NULL, color=NULL WHERE id=?',
+            (1 if state else 0, iid)
+        )
+        self.db.commit()
+
+    def move_category(self, iid, cat_id):
+        """移动到分类 (同时移出回收站)，清除手动颜色以跟随分类颜色"""
+        c = self.db.get_cursor()
+        c.execute('UPDATE ideas SET category_id=?, is_deleted=0, color=NULL WHERE id=?', (cat_id, iid))
+        self.db.commit()
+
     def delete_permanent(self, iid):
         c = self.db.get_cursor()
         c.execute('DELETE FROM ideas WHERE id=?', (iid,))
@@ -156,9 +266,34 @@ class IdeaRepository:
         self.db.commit()
     
     def update_timestamp(self, iid):
-        """更新记录的时间戳"""
+        """更新记录的时间戳 (重复采集也算一次使用，计入 frecency 但不计入 use_count)"""
         c = self.db.get_cursor()
-        c.execute("UPDATE ideas SET updated_at = CURRENT_TIMESTAMP WHERE id = ?", (iid,))
+        c.execute('SELECT frecency FROM ideas WHERE id = ?', (iid,))
+        row = c.fetchone()
+        c.execute("UPDATE ideas SET updated_at = CURRENT_TIMESTAMP, frecency = ? WHERE id = ?",
+                  (frecency.bump(row[0] if row else None), iid))
+        self.db.commit()
+
+    def touch_many(self, ids):
+        """批量更新时间戳 (重复采集)，一次提交"""
+        if not ids: return
+        c = self.db.get_cursor()
+        placeholders = ','.join('?' * len(ids))
+        c.execute(f'SELECT id, frecency FROM ideas WHERE id IN ({placeholders})', list(ids))
+        updates = [(frecency.bump(f), iid) for iid, f in c.fetchall()]
+        c.executemany('UPDATE ideas SET updated_at = CURRENT_TIMESTAMP, frecency = ? WHERE id = ?', updates)
+        self.db.commit()
+
+    def record_use(self, iid):
+        """记录一次使用 (如在快速窗口中粘贴)"""
+        c = self.db.get_cursor()
+        c.execute('SELECT frecency FROM ideas WHERE id = ?', (iid,))
+        row = c.fetchone()
+        if not row: return
+        c.execute(
+            'UPDATE ideas SET use_count = COALESCE(use_count, 0) + 1, last_used_at = CURRENT_TIMESTAMP, frecency = ? WHERE id = ?',
+            (frecency.bump(row[0]), iid)
+        )
         self.db.commit()
 
     def get_counts(self):
@@ -206,7 +341,7 @@ class IdeaRepository:
         c.execute(f"SELECT i.rating, COUNT(*) FROM ideas i WHERE {where_str} GROUP BY i.rating", params)
         stats['stars'] = dict(c.fetchall())
 
-        c.execute(f"SELECT i.color, COUNT(*) FROM ideas i WHERE {where_str} GROUP BY i.color", params)
+        c.execute(f"SELECT {EFFECTIVE_COLOR_SQL} AS color, COUNT(*) FROM ideas i {CATEGORY_JOIN_SQL} WHERE {where_str} GROUP BY 1", params)
         stats['colors'] = dict(c.fetchall())
 
         c.execute(f"SELECT i.item_type, COUNT(*) FROM ideas i WHERE {where_str} GROUP BY i.item_type", params)
@@ -256,6 +391,53 @@ class IdeaRepository:
         c.execute("SELECT id FROM ideas WHERE content_hash = ?", (content_hash,))
         return c.fetchone()
 
+    def find_by_image_fingerprint(self, fingerprint):
+        """按图片原始像素指纹查找已保存的图片"""
+        c = self.db.get_cursor()
+        c.execute('''SELECT i.id FROM image_fingerprints f JOIN ideas i ON i.content_hash = f.content_hash
+                     WHERE f.fingerprint = ? LIMIT 1''', (fingerprint,))
+        return c.fetchone()
+
+    def save_image_fingerprint(self, fingerprint, content_hash):
+        c = self.db.get_cursor()
+        c.execute('INSERT OR REPLACE INTO image_fingerprints (fingerprint, content_hash) VALUES (?, ?)', (fingerprint, content_hash))
+        self.db.commit()
+
+    def get_image_phashes(self):
+        """未删除图片的 (id, image_phash)"""
+        c = self.db.get_cursor()
+        c.execute("SELECT id, image_phash FROM ideas WHERE image_phash IS NOT NULL AND COALESCE(is_deleted, 0) = 0")
+        return c.fetchall()
+
+    def set_text_simhash(self, iid, simhash, bands):
+        """写入文本指纹及其 LSH 分段 [(段号, 段值)]"""
+        c = self.db.get_cursor()
+        c.execute('DELETE FROM text_simhash_bands WHERE idea_id=?', (iid,))
+        c.execute('UPDATE ideas SET text_simhash=? WHERE id=?', (simhash, iid))
+        c.executemany('INSERT INTO text_simhash_bands (band, key, idea_id) VALUES (?,?,?)',
+                      [(band, key, iid) for band, key in bands])
+        self.db.commit()
+
+    def find_text_candidates(self, probes):
+        """任一分段命中探测键的未删除文本: probes 为 [(段号, [段值, ...])]，返回 [(id, text_simhash)]"""
+        if not probes: return []
+        c = self.db.get_cursor()
+        where = ' OR '.join(f"(b.band=? AND b.key IN ({','.join('?' * len(keys))}))" for _, keys in probes)
+        c.execute(f'''SELECT DISTINCT i.id, i.text_simhash FROM text_simhash_bands b JOIN ideas i ON i.id = b.idea_id
+                      WHERE ({where}) AND COALESCE(i.is_deleted, 0) = 0''', [v for band, keys in probes for v in (band, *keys)])
+        return c.fetchall()
+
+    def get_live_by_recency(self, ids):
+        """按最近使用排序返回 (id, 是否受保护)；已删除或进入回收站的不返回"""
+        if not ids: return []
+        c = self.db.get_cursor()
+        placeholders = ','.join('?' * len(ids))
+        c.execute(f'''SELECT id, (COALESCE(is_pinned, 0) OR COALESCE(is_favorite, 0) OR COALESCE(is_locked, 0)
+                                 OR COALESCE(rating, 0) > 0) AS protected
+                      FROM ideas WHERE id IN ({placeholders}) AND COALESCE(is_deleted, 0) = 0
+                      ORDER BY updated_at DESC, id DESC''', list(ids))
+        return [(r[0], bool(r[1])) for r in c.fetchall()]
+
     # --- New Methods for Smart Caching Architecture ---
     
     def get_metadata_by_filter(self, search, f_type, f_val):
@@ -315,10 +497,10 @@ class IdeaRepository:
         # 重写查询以支持 tags 聚合
         q_grouped = f"""
             SELECT 
-                i.id, i.title, i.color, i.is_pinned, i.is_favorite, 
+                i.id, i.title, {EFFECTIVE_COLOR_SQL} AS color, i.is_pinned, i.is_favorite, 
                 i.created_at, i.updated_at, i.item_type, i.rating, i.is_locked,
                 GROUP_CONCAT(t.name) as tag_names
-            FROM ideas i 
+            FROM ideas i {CATEGORY_JOIN_SQL}
             LEFT JOIN idea_tags it ON i.id=it.idea_id 
             LEFT JOIN tags t ON it.tag_id=t.id 
             WHERE 1=1
@@ -375,11 +557,11 @@ class IdeaRepository:
         
         q = f"""
             SELECT 
-                i.id, i.title, i.content, i.color, i.is_pinned, i.is_favorite, 
+                i.id, i.title, i.content, {EFFECTIVE_COLOR_SQL} AS color, i.is_pinned, i.is_favorite, 
                 i.created_at, i.updated_at, i.category_id, i.is_deleted, i.item_type, 
                 i.data_blob, i.content_hash, i.is_locked, i.rating,
-                GROUP_CONCAT(t.name) as tag_names
-            FROM ideas i
+                GROUP_CONCAT(t.name) as tag_names, i.full_size
+            FROM ideas i {CATEGORY_JOIN_SQL}
             LEFT JOIN idea_tags it ON i.id = it.idea_id
             LEFT JOIN tags t ON it.tag_id = t.id
             WHERE i.id IN ({placeholders})
@@ -397,7 +579,8 @@ class IdeaRepository:
                 'updated_at': r[7], 'category_id': r[8], 'is_deleted': r[9],
                 'item_type': r[10], 'data_blob': r[11], 'content_hash': r[12],
                 'is_locked': r[13], 'rating': r[14],
-                'tags': r[15].split(',') if r[15] else []
+                'tags': r[15].split(',') if r[15] else [],
+                'full_size': r[16]
             })
             
         # 按 id_list 顺序重排
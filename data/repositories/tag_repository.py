@@ -30,7 +30,7 @@ class TagRepository:
                         c.execute('INSERT OR IGNORE INTO idea_tags VALUES (?,?)', (iid, tid))
         self.db.commit()
 
-    def add_to_multiple(self, idea_ids, tags):
+    def add_to_multiple(self, idea_ids, tags, commit=True):
         if not idea_ids or not tags: return
         c = self.db.get_cursor()
         for t in tags:
@@ -43,7 +43,8 @@ class TagRepository:
                     tid = res[0]
                     for iid in idea_ids:
                         c.execute('INSERT OR IGNORE INTO idea_tags (idea_id, tag_id) VALUES (?,?)', (iid, tid))
-        self.db.commit()
+        if commit:
+            self.db.commit()
 
     def remove_from_multiple(self, idea_ids, tag_name):
         if not idea_ids or not tag_name: return
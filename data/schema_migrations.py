@@ -1,9 +1,27 @@
 # data/schema_migrations.py
 import logging
+from core.config import COLORS
+from data.frecency import FRECENCY_NOW_SQL, frecency_at_sql
 
 logger = logging.getLogger(__name__)
 
+# 变更日志跟踪的列 (增删列后需要在新的迁移里调用 create_change_triggers 重建触发器)
+# 不跟踪 data_blob: 比较新旧值要读出整个二进制，图片内容的变化由 content_hash 体现
+CHANGE_TRACKED_COLUMNS = {
+    'ideas': ('title', 'content', 'color', 'is_pinned', 'is_favorite', 'updated_at',
+              'category_id', 'is_deleted', 'item_type', 'content_hash',
+              'is_locked', 'rating'),
+    'categories': ('name', 'parent_id', 'color', 'sort_order', 'preset_tags'),
+}
+
 class SchemaMigration:
+    LATEST_VERSION = 12
+
+    @staticmethod
+    def is_current(conn):
+        """已是最新版本时启动无需再探测表结构"""
+        return SchemaMigration._get_db_version(conn) >= SchemaMigration.LATEST_VERSION
+
     @staticmethod
     def _get_db_version(conn):
         c = conn.cursor()
@@ -32,11 +50,66 @@ class SchemaMigration:
             SchemaMigration._set_db_version(conn, 1)
             logger.info("数据库迁移到 v1")
         
-        # Add future migrations here
-        # if current_version < 2:
-        #     SchemaMigration._migrate_to_v2(conn)
-        #     SchemaMigration._set_db_version(conn, 2)
-        #     logger.info("数据库迁移到 v2")
+        if current_version < 2:
+            SchemaMigration._migrate_to_v2(conn)
+            SchemaMigration._set_db_version(conn, 2)
+            logger.info("数据库迁移到 v2")
+
+        if current_version < 3:
+            SchemaMigration._migrate_to_v3(conn)
+            SchemaMigration._set_db_version(conn, 3)
+            logger.info("数据库迁移到 v3")
+
+        if current_version < 4:
+            SchemaMigration._migrate_to_v4(conn)
+            SchemaMigration._set_db_version(conn, 4)
+            logger.info("数据库迁移到 v4")
+
+        if current_version < 5:
+            SchemaMigration._migrate_to_v5(conn)
+            SchemaMigration._set_db_version(conn, 5)
+            logger.info("数据库迁移到 v5")
+
+        if current_version < 6:
+            SchemaMigration._migrate_to_v6(conn)
+            SchemaMigration._set_db_version(conn, 6)
+            logger.info("数据库迁移到 v6")
+
+        if current_version < 7:
+            SchemaMigration._migrate_to_v7(conn)
+            SchemaMigration._set_db_version(conn, 7)
+            logger.info("数据库迁移到 v7")
+
+        if current_version < 8:
+            SchemaMigration._migrate_to_v8(conn)
+            SchemaMigration._set_db_version(conn, 8)
+            logger.info("数据库迁移到 v8")
+
+        if current_version < 9:
+            SchemaMigration._migrate_to_v9(conn)
+            SchemaMigration._set_db_version(conn, 9)
+            logger.info("数据库迁移到 v9")
+
+        if current_version < 10:
+            SchemaMigration._migrate_to_v10(conn)
+            SchemaMigration._set_db_version(conn, 10)
+            logger.info("数据库迁移到 v10")
+
+        if current_version < 11:
+            SchemaMigration._migrate_to_v11(conn)
+            SchemaMigration._set_db_version(conn, 11)
+            logger.info("数据库迁移到 v11")
+
+        if current_version < 12:
+            SchemaMigration._migrate_to_v12(conn)
+            SchemaMigration._set_db_version(conn, 12)
+            logger.info("数据库迁移到 v12")
+
+        # Add future migrations here (并同步更新 LATEST_VERSION)
+        # if current_version < 13:
+        #     SchemaMigration._migrate_to_v13(conn)
+        #     SchemaMigration._set_db_version(conn, 13)
+        #     logger.info("数据库迁移到 v13")
             
         logger.info("数据库结构检查完成。")
 
@@ -93,3 +166,202 @@ class SchemaMigration:
             except: pass
             
         conn.commit()
+
+    @staticmethod
+    def _migrate_to_v2(conn):
+        """
+        颜色改为读取时推导: ideas.color 只保留用户手动指定的颜色。
+        把由分类/回收站/书签/默认值写入的冗余颜色清空为 NULL (一次性)。
+        """
+        c = conn.cursor()
+        logger.info("v2 迁移: 清除冗余的笔记颜色...")
+        c.execute('''
+            UPDATE ideas SET color = NULL
+            WHERE color IS NOT NULL AND (
+                is_deleted = 1
+                OR (is_favorite = 1 AND color = ?)
+                OR (category_id IS NULL AND color IN (?, ?))
+                OR (category_id IS NOT NULL AND color = (SELECT cat.color FROM categories cat WHERE cat.id = ideas.category_id))
+            )
+        ''', (COLORS['bookmark'], COLORS['default_note'], COLORS['uncategorized']))
+        conn.commit()
+
+    @staticmethod
+    def _migrate_to_v3(conn):
+        """变更日志 (CDC): 由触发器追加写入，seq 单调递增"""
+        c = conn.cursor()
+        logger.info("v3 迁移: 创建变更日志表和触发器...")
+        c.execute('''CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            tbl TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            columns TEXT,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''')
+        c.execute('CREATE INDEX IF NOT EXISTS idx_change_log_row ON change_log(tbl, row_id)')
+        SchemaMigration.create_change_triggers(conn)
+        conn.commit()
+
+    @staticmethod
+    def _migrate_to_v4(conn):
+        """
+        auto_vacuum=INCREMENTAL 需要一次完整 VACUUM 才能生效，大库要几分钟，不能在启动时执行:
+        这里不做改动，auto_vacuum 仍不为 INCREMENTAL 本身就是"需要切换"的标记，由空闲维护的 VacuumJob 完成切换
+        """
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            logger.info("v4 迁移: auto_vacuum 将在空闲维护时切换为 INCREMENTAL")
+
+    @staticmethod
+    def _migrate_to_v5(conn):
+        """ideas.source 记录来源 (clipboard / import / NULL 手动)，剪贴板保留策略只作用于 clipboard"""
+        c = conn.cursor()
+        logger.info("v5 迁移: 添加 ideas.source 列...")
+        c.execute("PRAGMA table_info(ideas)")
+        if 'source' not in [i[1] for i in c.fetchall()]:
+            c.execute('ALTER TABLE ideas ADD COLUMN source TEXT')
+            # 此前只有剪贴板采集会写入 content_hash
+            c.execute("UPDATE ideas SET source = 'clipboard' WHERE content_hash IS NOT NULL")
+        c.execute('CREATE INDEX IF NOT EXISTS idx_ideas_source ON ideas(source, updated_at)')
+        conn.commit()
+
+    @staticmethod
+    def _migrate_to_v6(conn):
+        """使用次数 / 最近使用时间 / frecency 分数 (见 data/frecency.py)"""
+        c = conn.cursor()
+        logger.info("v6 迁移: 添加 frecency 相关列...")
+        c.execute("PRAGMA table_info(ideas)")
+        cols = [i[1] for i in c.fetchall()]
+        for col, type_def in (('use_count', 'INTEGER DEFAULT 0'), ('last_used_at', 'TIMESTAMP'), ('frecency', 'REAL')):
+            if col not in cols:
+                c.execute(f'ALTER TABLE ideas ADD COLUMN {col} {type_def}')
+        # 未使用过的条目以最后更新时间作为一次使用
+        c.execute(f'UPDATE ideas SET frecency = {frecency_at_sql("updated_at")} WHERE frecency IS NULL')
+        # 只作为直接用 SQL 插入且未给出 frecency 时的兜底: 触发器会再回写整行，应用内的插入
+        # (IdeaRepository.add、ImportService) 都在 INSERT 中直接写入 frecency，不会触发
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_ideas_frecency_init AFTER INSERT ON ideas
+            WHEN new.frecency IS NULL BEGIN
+                UPDATE ideas SET frecency = {FRECENCY_NOW_SQL} WHERE id = new.id;
+            END''')
+        c.execute('CREATE INDEX IF NOT EXISTS idx_ideas_frecency ON ideas(is_pinned DESC, frecency DESC)')
+        conn.commit()
+
+    @staticmethod
+    def _migrate_to_v7(conn):
+        """图片原始像素指纹 -> content_hash 映射，重复截图无需 PNG 编码即可识别"""
+        c = conn.cursor()
+        logger.info("v7 迁移: 创建图片指纹表...")
+        c.execute('CREATE TABLE IF NOT EXISTS image_fingerprints (fingerprint TEXT PRIMARY KEY, content_hash TEXT NOT NULL)')
+        conn.commit()
+
+    @staticmethod
+    def _migrate_to_v8(conn):
+        """超大文本分块外置存储: content_chunks 表 + ideas.full_size 列"""
+        c = conn.cursor()
+        logger.info("v8 迁移: 创建大文本分块表...")
+        c.execute('''CREATE TABLE IF NOT EXISTS content_chunks (
+            idea_id INTEGER NOT NULL, seq INTEGER NOT NULL, data BLOB NOT NULL,
+            PRIMARY KEY (idea_id, seq)) WITHOUT ROWID''')
+        c.execute("PRAGMA table_info(ideas)")
+        if 'full_size' not in [i[1] for i in c.fetchall()]:
+            c.execute('ALTER TABLE ideas ADD COLUMN full_size INTEGER')
+        # 任何途径删除笔记都会一并删除其分块
+        c.execute('''CREATE TRIGGER IF NOT EXISTS trg_ideas_chunks_delete AFTER DELETE ON ideas
+            WHEN old.full_size IS NOT NULL BEGIN
+                DELETE FROM content_chunks WHERE idea_id = old.id;
+            END''')
+        conn.commit()
+
+    @staticmethod
+    def _migrate_to_v9(conn):
+        """图片感知哈希 (dHash)，用于近似重复检测；已有图片由后台补算"""
+        c = conn.cursor()
+        logger.info("v9 迁移: 添加 ideas.image_phash 列...")
+        c.execute("PRAGMA table_info(ideas)")
+        if 'image_phash' not in [i[1] for i in c.fetchall()]:
+            c.execute('ALTER TABLE ideas ADD COLUMN image_phash INTEGER')
+        conn.commit()
+
+    @staticmethod
+    def _migrate_to_v10(conn):
+        """文本 SimHash 指纹 + LSH 分段索引表；已有文本由后台补算"""
+        c = conn.cursor()
+        logger.info("v10 迁移: 添加文本 SimHash 列和分段索引表...")
+        c.execute("PRAGMA table_info(ideas)")
+        if 'text_simhash' not in [i[1] for i in c.fetchall()]:
+            c.execute('ALTER TABLE ideas ADD COLUMN text_simhash INTEGER')
+        c.execute('''CREATE TABLE IF NOT EXISTS text_simhash_bands (
+            band INTEGER NOT NULL, key INTEGER NOT NULL, idea_id INTEGER NOT NULL,
+            PRIMARY KEY (band, key, idea_id)) WITHOUT ROWID''')
+        c.execute('CREATE INDEX IF NOT EXISTS idx_text_simhash_bands_idea ON text_simhash_bands(idea_id)')
+        # 删除笔记或内容变化时清除指纹，内容变化后由调用方或后台补算重新写入
+        c.execute('''CREATE TRIGGER IF NOT EXISTS trg_ideas_simhash_delete AFTER DELETE ON ideas
+            WHEN old.text_simhash IS NOT NULL BEGIN
+                DELETE FROM text_simhash_bands WHERE idea_id = old.id;
+            END''')
+        c.execute('''CREATE TRIGGER IF NOT EXISTS trg_ideas_simhash_content AFTER UPDATE OF content ON ideas
+            WHEN old.text_simhash IS NOT NULL AND old.content IS NOT new.content BEGIN
+                DELETE FROM text_simhash_bands WHERE idea_id = old.id;
+                UPDATE ideas SET text_simhash = NULL WHERE id = old.id;
+            END''')
+        conn.commit()
+
+    @staticmethod
+    def _migrate_to_v11(conn):
+        """空闲维护任务的进度表；内容变化时作废旧的 content_hash，由维护任务重新计算"""
+        c = conn.cursor()
+        logger.info("v11 迁移: 添加维护任务表...")
+        c.execute('''CREATE TABLE IF NOT EXISTS maintenance_jobs (
+            name TEXT PRIMARY KEY, state TEXT, started_at REAL, completed_at REAL,
+            runs INTEGER DEFAULT 0, last_error TEXT)''')
+        c.execute('''CREATE TRIGGER IF NOT EXISTS trg_ideas_hash_stale AFTER UPDATE OF content, data_blob ON ideas
+            WHEN old.content_hash IS NOT NULL AND new.content_hash IS old.content_hash
+                 AND (old.content IS NOT new.content OR old.data_blob IS NOT new.data_blob) BEGIN
+                UPDATE ideas SET content_hash = NULL WHERE id = old.id;
+            END''')
+        conn.commit()
+
+    @staticmethod
+    def _migrate_to_v12(conn):
+        """触发器不再比较 data_blob (否则置顶、收藏等任何更新都会把图片整块读出两次)"""
+        c = conn.cursor()
+        logger.info("v12 迁移: 重建不比较 data_blob 的触发器...")
+        SchemaMigration.create_change_triggers(conn)
+        c.execute('DROP TRIGGER IF EXISTS trg_ideas_hash_stale')
+        c.execute('''CREATE TRIGGER trg_ideas_hash_stale AFTER UPDATE OF content ON ideas
+            WHEN old.content_hash IS NOT NULL AND new.content_hash IS old.content_hash
+                 AND old.content IS NOT new.content BEGIN
+                UPDATE ideas SET content_hash = NULL WHERE id = old.id;
+            END''')
+        conn.commit()
+
+    @staticmethod
+    def drop_change_triggers(conn):
+        """批量写入前临时移除变更日志触发器，结束后用 create_change_triggers 恢复"""
+        c = conn.cursor()
+        for tbl in list(CHANGE_TRACKED_COLUMNS) + ['idea_tags']:
+            for kind in ('insert', 'update', 'delete'):
+                c.execute(f'DROP TRIGGER IF EXISTS trg_{tbl}_{kind}_log')
+
+    @staticmethod
+    def create_change_triggers(conn):
+        c = conn.cursor()
+        SchemaMigration.drop_change_triggers(conn)
+        for tbl, cols in CHANGE_TRACKED_COLUMNS.items():
+            changed = ' || '.join(f"CASE WHEN old.{col} IS NOT new.{col} THEN '{col},' ELSE '' END" for col in cols)
+            when = ' OR '.join(f'old.{col} IS NOT new.{col}' for col in cols)
+            c.execute(f'''CREATE TRIGGER trg_{tbl}_insert_log AFTER INSERT ON {tbl} BEGIN
+                INSERT INTO change_log (tbl, row_id, kind) VALUES ('{tbl}', new.id, 'insert');
+            END''')
+            c.execute(f'''CREATE TRIGGER trg_{tbl}_update_log AFTER UPDATE ON {tbl} WHEN {when} BEGIN
+                INSERT INTO change_log (tbl, row_id, kind, columns) VALUES ('{tbl}', new.id, 'update', rtrim({changed}, ','));
+            END''')
+            c.execute(f'''CREATE TRIGGER trg_{tbl}_delete_log AFTER DELETE ON {tbl} BEGIN
+                INSERT INTO change_log (tbl, row_id, kind) VALUES ('{tbl}', old.id, 'delete');
+            END''')
+
+        # idea_tags 是复合主键，row_id 记录 idea_id，columns 记录 tag_id
+        for kind, ref in (('insert', 'new'), ('delete', 'old')):
+            c.execute(f'''CREATE TRIGGER trg_idea_tags_{kind}_log AFTER {kind.upper()} ON idea_tags BEGIN
+                INSERT INTO change_log (tbl, row_id, kind, columns) VALUES ('idea_tags', {ref}.idea_id, '{kind}', {ref}.tag_id);
+            END''')
@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+# data/sql_trace.py
+"""
+SQL 语句计时与慢查询日志 (默认关闭)
+
+启用后 DBContext 以 TracedConnection 打开连接，其游标记录每条语句的
+执行+取数耗时、返回行数和调用位置 (项目代码中最近的一帧)，按归一化后的 SQL 汇总到 sql_stats。
+超过 slow_ms 的语句记 warning，SELECT 语句附带 EXPLAIN QUERY PLAN (每种语句只查一次计划)。
+
+设置项 sql_trace (settings.json):
+    enabled   是否启用 (修改后需重启)
+    slow_ms   慢查询阈值，毫秒
+    explain   慢查询是否附带查询计划
+
+代码中读取统计: from data.sql_trace import sql_stats; sql_stats.snapshot(order_by='total_ms')
+"""
+import os
+import re
+import sys
+import time
+import logging
+import sqlite3
+import threading
+from core.settings import load_setting
+
+DEFAULT_SQL_TRACE = {'enabled': False, 'slow_ms': 100, 'explain': True}
+TOP_STATEMENTS = 20
+MAX_SLOW_SAMPLES = 50
+
+_SKIP_FILES = (os.path.normcase(os.path.abspath(__file__)), os.path.normcase(os.path.dirname(sqlite3.__file__)))
+
+_RE_STRING = re.compile(r"'(?:[^']|'')*'")
+_RE_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_RE_PLACEHOLDERS = re.compile(r'\?(?:\s*,\s*\?)+')
+_RE_SPACE = re.compile(r'\s+')
+
+
+def load_trace_settings():
+    return {**DEFAULT_SQL_TRACE, **(load_setting('sql_trace') or {})}
+
+
+def normalize_sql(sql):
+    """去掉字面量、合并 IN (?,?,...) 占位符和空白，使拼接出的同类语句归为一组"""
+    sql = _RE_STRING.sub('?', sql)
+    sql = _RE_NUMBER.sub('?', sql)
+    sql = _RE_PLACEHOLDERS.sub('?+', sql)
+    return _RE_SPACE.sub(' ', sql).strip()
+
+
+def _call_site():
+    frame = sys._getframe(2)
+    while frame:
+        path = os.path.normcase(os.path.abspath(frame.f_code.co_filename))
+        if not path.startswith(_SKIP_FILES):
+            return f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno} {frame.f_code.co_name}"
+        frame = frame.f_back
+    return '?'
+
+
+class SqlStats:
+    """按归一化 SQL 汇总的语句统计，线程安全"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.statements = {}
+            self.slow = []
+
+    def add(self, sql, ms, rows, site, slow_ms):
+        key = normalize_sql(sql)
+        with self._lock:
+            entry = self.statements.get(key)
+            if entry is None:
+                entry = self.statements[key] = {'sql': key, 'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                                                'rows': 0, 'sites': {}, 'plan': None}
+            entry['calls'] += 1
+            entry['total_ms'] += ms
+            entry['max_ms'] = max(entry['max_ms'], ms)
+            entry['rows'] += rows
+            entry['sites'][site] = entry['sites'].get(site, 0) + 1
+            is_slow = ms >= slow_ms
+            if is_slow:
+                self.slow.append({'sql': key, 'ms': round(ms, 2), 'rows': rows, 'site': site,
+                                  'at': time.time()})
+                del self.slow[:-MAX_SLOW_SAMPLES]
+            need_plan = is_slow and entry['plan'] is None
+        return key, is_slow, need_plan
+
+    def set_plan(self, key, plan):
+        with self._lock:
+            if key in self.statements:
+                self.statements[key]['plan'] = plan
+
+    def snapshot(self, order_by='total_ms', limit=None):
+        """返回按 order_by (total_ms / max_ms / calls / rows / avg_ms) 降序的语句统计列表"""
+        with self._lock:
+            result = []
+            for e in self.statements.values():
+                result.append({**e, 'total_ms': round(e['total_ms'], 2), 'max_ms': round(e['max_ms'], 2),
+                               'avg_ms': round(e['total_ms'] / e['calls'], 2), 'sites': dict(e['sites'])})
+        result.sort(key=lambda e: e[order_by], reverse=True)
+        return result[:limit] if limit else result
+
+    def slow_queries(self):
+        with self._lock:
+            return list(self.slow)
+
+    def log_summary(self, limit=TOP_STATEMENTS):
+        for e in self.snapshot(limit=limit):
+            logging.info(f"[SqlTrace] {e['total_ms']:.1f} ms / {e['calls']} calls (max {e['max_ms']:.1f}, "
+                         f"{e['rows']} rows): {e['sql'][:200]}")
+
+
+sql_stats = SqlStats()
+
+
+class TracedCursor(sqlite3.Cursor):
+    """一条语句从 execute 开始，到取完结果 / 执行下一条 / 游标关闭或回收时结束并计入统计"""
+
+    def __init__(self, connection):
+        super().__init__(connection)
+        self._pending = None
+
+    def _begin(self, sql, params, many=False):
+        self._finish()
+        self._pending = [sql, None if many else params, 0.0, 0, _call_site()]
+
+    def _add(self, seconds, rows=0):
+        if self._pending is not None:
+            self._pending[2] += seconds
+            self._pending[3] += rows
+
+    def _finish(self):
+        pending, self._pending = self._pending, None
+        if pending is None:
+            return
+        sql, params, seconds, rows, site = pending
+        conn = self.connection
+        ms = seconds * 1000
+        key, is_slow, need_plan = sql_stats.add(sql, ms, rows, site, conn.slow_ms)
+        if not is_slow:
+            return
+        plan = None
+        if need_plan and conn.explain:
+            plan = conn.explain_plan(sql, params)
+            sql_stats.set_plan(key, plan)
+        logging.warning(f"[SqlTrace] Slow query {ms:.1f} ms, {rows} rows at {site}: {key[:500]}"
+                        + (f"\n  plan: {plan}" if plan else ''))
+
+    def execute(self, sql, parameters=()):
+        self._begin(sql, parameters)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._add(time.perf_counter() - started, 0)
+            if self.description is None:
+                self._finish()
+
+    def executemany(self, sql, seq_of_parameters):
+        self._begin(sql, None, many=True)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._add(time.perf_counter() - started, 0)
+            self._finish()
+
+    def executescript(self, sql_script):
+        self._begin(sql_script, None, many=True)
+        started = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            self._add(time.perf_counter() - started, 0)
+            self._finish()
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._add(time.perf_counter() - started, row is not None)
+        if row is None:
+            self._finish()
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._add(time.perf_counter() - started, len(rows))
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._add(time.perf_counter() - started, len(rows))
+        self._finish()
+        return rows
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        row = self.fetchone()
+        if row is None:
+            raise StopIteration
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+
+class TracedConnection(sqlite3.Connection):
+    """sqlite3.connect(..., factory=TracedConnection)；conn.execute 等快捷方法也经过 TracedCursor"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        settings = load_trace_settings()
+        self.slow_ms = float(settings.get('slow_ms', DEFAULT_SQL_TRACE['slow_ms']))
+        self.explain = bool(settings.get('explain'))
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+    def explain_plan(self, sql, params):
+        """用未计时的游标取查询计划，只对 SELECT / WITH 语句生效"""
+        if params is None or not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+            return None
+        try:
+            c = sqlite3.Connection.cursor(self)
+            c.row_factory = None
+            rows = c.execute('EXPLAIN QUERY PLAN ' + sql, params).fetchall()
+            c.close()
+        except sqlite3.Error as e:
+            return f'<{e}>'
+        return ' | '.join(row[-1] for row in rows)
@@ -1,2 +1,327 @@
-﻿# -*- coding: utf-8 -*-
-# services/backup_service.pyimport osimport shutilfrom datetime import datetimefrom core.config import DB_NAME, BACKUP_DIRclass BackupService:    @staticmethod    def run_backup():        """执行数据库备份并清理旧文件"""        if not os.path.exists(BACKUP_DIR):            os.makedirs(BACKUP_DIR)                if os.path.exists(DB_NAME):            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')            target = os.path.join(BACKUP_DIR, f'ideas_{timestamp}.db')            try:                shutil.copy2(DB_NAME, target)                BackupService._clean_old_backups()                print(f"[System] Backup created: {target}")            except Exception as e:                print(f"[System] Backup failed: {e}")    @staticmethod    def _clean_old_backups(keep=20):        try:            files = sorted(                [os.path.join(BACKUP_DIR, f) for f in os.listdir(BACKUP_DIR)],                key=os.path.getmtime            )            while len(files) > keep:                os.remove(files.pop(0))        except Exception:            pass
\ No newline at end of file
+﻿# -*- coding: utf-8 -*-
+# services/backup_service.py
+"""
+数据库备份服务
+
+备份通过 SQLite 在线备份 API 分步完成 (不阻塞写入)，然后把快照按页对齐切成固定大小的块，
+块以内容哈希寻址、压缩后只存一份；每个快照只是一个列出块哈希的清单 (manifest)。
+未变化的页落在相同的块里，所以每次备份新增的磁盘占用只与改动量有关。
+
+注意只有存储是增量的: 每次真正执行备份都要复制整个数据库并对所有块重新计算哈希，耗时与数据库大小成正比。
+因此只在有变化时才备份: 清单记录快照时变更日志 (change_log) 已分配到的序号，序号未增长 (用户数据没有变化，
+只有维护任务写入的派生数据) 或文件的修改时间和大小都未变时直接跳过。
+
+目录结构:
+    backups/
+        chunks/ab/abcdef...zz   压缩后的数据块 (.zz = zlib, .xz = lzma)
+        snapshots/ideas_YYYYmmdd_HHMMSS.json
+
+命令行:
+    python -m services.backup_service backup|list|verify [快照]|restore <快照> [目标文件]
+"""
+import os
+import sys
+import json
+import lzma
+import time
+import zlib
+import sqlite3
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from core.config import DB_NAME, BACKUP_DIR
+
+CHUNK_DIR = os.path.join(BACKUP_DIR, 'chunks')
+SNAPSHOT_DIR = os.path.join(BACKUP_DIR, 'snapshots')
+
+CHUNK_PAGES = 64        # 每块包含的页数 (4K 页 -> 256KB)
+STEP_PAGES = 256        # 在线备份每步复制的页数
+STEP_PAUSE = 0.005      # 每步之间让出的时间 (秒)，避免长时间占用数据库锁
+KEEP_SNAPSHOTS = 20
+
+CODECS = {
+    'zlib': ('.zz', lambda b: zlib.compress(b, 6), zlib.decompress),
+    'lzma': ('.xz', lambda b: lzma.compress(b, preset=6), lzma.decompress),
+}
+
+
+class BackupService:
+    _lock = threading.Lock()
+
+    @staticmethod
+    def run_backup(wait=False, codec='zlib', keep=KEEP_SNAPSHOTS):
+        """在后台线程执行备份；wait=True 时阻塞直到完成并返回快照名"""
+        if wait:
+            return BackupService._backup_job(codec, keep)
+        t = threading.Thread(target=BackupService._backup_job, args=(codec, keep), daemon=True, name='BackupService')
+        t.start()
+        return t
+
+    @staticmethod
+    def list_snapshots():
+        """按时间顺序返回所有快照名"""
+        if not os.path.isdir(SNAPSHOT_DIR):
+            return []
+        return sorted(f[:-5] for f in os.listdir(SNAPSHOT_DIR) if f.endswith('.json'))
+
+    @staticmethod
+    def verify(name=None, integrity_check=True):
+        """校验快照 (默认最新一个)，返回错误信息列表，空列表表示通过"""
+        name = name or BackupService._latest()
+        if not name:
+            return ['没有可用的快照']
+        tmp = os.path.join(BACKUP_DIR, f'.verify_{name}.db')
+        try:
+            errors = BackupService._materialize(name, tmp)
+            if not errors and integrity_check:
+                conn = sqlite3.connect(tmp)
+                try:
+                    result = conn.execute('PRAGMA integrity_check').fetchone()[0]
+                finally:
+                    conn.close()
+                if result != 'ok':
+                    errors.append(f'integrity_check: {result}')
+            return errors
+        finally:
+            BackupService._remove(tmp)
+
+    @staticmethod
+    def restore(name, target=DB_NAME):
+        """
+        从快照恢复到 target。先在临时文件中重建并校验，
+        再通过在线备份 API 写入目标库，已打开的连接会直接看到恢复后的数据。
+        """
+        tmp = os.path.join(BACKUP_DIR, f'.restore_{name}.db')
+        with BackupService._lock:
+            try:
+                errors = BackupService._materialize(name, tmp)
+                if errors:
+                    raise ValueError(f"快照 {name} 校验失败: {'; '.join(errors)}")
+                src = sqlite3.connect(tmp)
+                dst = sqlite3.connect(target)
+                try:
+                    src.backup(dst, pages=STEP_PAGES)
+                finally:
+                    dst.close()
+                    src.close()
+                logging.info(f"[Backup] Restored {name} -> {target}")
+            finally:
+                BackupService._remove(tmp)
+
+    # --- 内部实现 ---
+
+    @staticmethod
+    def _backup_job(codec, keep):
+        if not os.path.exists(DB_NAME):
+            return None
+        if not BackupService._lock.acquire(blocking=False):
+            logging.info("[Backup] Backup already running, skipped")
+            return None
+        try:
+            return BackupService._take_snapshot(codec, keep)
+        except Exception as e:
+            logging.error(f"[Backup] Backup failed: {e}", exc_info=True)
+            return None
+        finally:
+            BackupService._lock.release()
+
+    @staticmethod
+    def _take_snapshot(codec, keep):
+        os.makedirs(CHUNK_DIR, exist_ok=True)
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+
+        # 源文件自上次快照后未被修改，或变更日志没有新记录则跳过 (完整备份要读整个数据库)
+        st = os.stat(DB_NAME)
+        change_seq = BackupService._change_seq()
+        latest = BackupService._latest()
+        if latest:
+            last = BackupService._load_manifest(latest)
+            if last.get('source_mtime') == st.st_mtime and last.get('source_size') == st.st_size:
+                logging.debug("[Backup] Database unchanged, skipped")
+                return latest
+            if change_seq is not None and last.get('change_seq') == change_seq:
+                logging.debug("[Backup] No logged changes since last snapshot, skipped")
+                return latest
+
+        started = time.perf_counter()
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        name = f'ideas_{timestamp}'
+        tmp = os.path.join(BACKUP_DIR, f'.{name}.db')
+
+        src = sqlite3.connect(DB_NAME, timeout=30)
+        dst = sqlite3.connect(tmp)
+        try:
+            src.backup(dst, pages=STEP_PAGES, progress=lambda *_: time.sleep(STEP_PAUSE))
+            page_size = dst.execute('PRAGMA page_size').fetchone()[0]
+        finally:
+            dst.close()
+            src.close()
+
+        ext, compress, _ = CODECS[codec]
+        chunk_size = page_size * CHUNK_PAGES
+        chunks, new_chunks, new_bytes = [], 0, 0
+        whole = hashlib.sha256()
+        try:
+            with open(tmp, 'rb') as f:
+                while True:
+                    block = f.read(chunk_size)
+                    if not block:
+                        break
+                    whole.update(block)
+                    h = hashlib.sha256(block).hexdigest()
+                    chunks.append(h)
+                    if BackupService._find_chunk(h) is None:
+                        path = os.path.join(CHUNK_DIR, h[:2], h + ext)
+                        os.makedirs(os.path.dirname(path), exist_ok=True)
+                        data = compress(block)
+                        BackupService._write_atomic(path, data)
+                        new_chunks += 1
+                        new_bytes += len(data)
+            size = os.path.getsize(tmp)
+        finally:
+            BackupService._remove(tmp)
+
+        manifest = {
+            'version': 1,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'page_size': page_size,
+            'chunk_size': chunk_size,
+            'size': size,
+            'sha256': whole.hexdigest(),
+            'chunks': chunks,
+            'source_mtime': st.st_mtime,
+            'source_size': st.st_size,
+            'change_seq': change_seq,
+        }
+        BackupService._write_atomic(
+            os.path.join(SNAPSHOT_DIR, name + '.json'),
+            json.dumps(manifest).encode('utf-8')
+        )
+        BackupService._clean_old_backups(keep)
+        logging.info(
+            f"[Backup] Snapshot {name}: {len(chunks)} chunks, {new_chunks} new "
+            f"({new_bytes / 1024:.1f} KB) in {time.perf_counter() - started:.2f}s"
+        )
+        return name
+
+    @staticmethod
+    def _change_seq():
+        """变更日志已分配到的最大序号 (压缩日志不影响)；没有变更日志时返回 None"""
+        conn = sqlite3.connect(f'file:{os.path.abspath(DB_NAME)}?mode=ro', uri=True, timeout=30)
+        try:
+            row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'").fetchone()
+            return row[0] if row else None
+        except sqlite3.OperationalError:
+            return None
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _materialize(name, path):
+        """按清单把快照重建到 path，返回错误信息列表"""
+        try:
+            manifest = BackupService._load_manifest(name)
+        except (OSError, ValueError) as e:
+            return [f'无法读取快照 {name}: {e}']
+        errors = []
+        whole = hashlib.sha256()
+        with open(path, 'wb') as out:
+            for h in manifest['chunks']:
+                chunk = BackupService._find_chunk(h)
+                if chunk is None:
+                    errors.append(f'缺少数据块 {h}')
+                    continue
+                try:
+                    block = CODECS[chunk[1]][2](BackupService._read(chunk[0]))
+                except (zlib.error, lzma.LZMAError) as e:
+                    errors.append(f'数据块 {h} 解压失败: {e}')
+                    continue
+                if hashlib.sha256(block).hexdigest() != h:
+                    errors.append(f'数据块 {h} 哈希不匹配')
+                    continue
+                whole.update(block)
+                out.write(block)
+        if not errors and whole.hexdigest() != manifest['sha256']:
+            errors.append('快照整体哈希不匹配')
+        return errors
+
+    @staticmethod
+    def _clean_old_backups(keep=KEEP_SNAPSHOTS):
+        """只保留最近 keep 个快照，并删除不再被任何快照引用的数据块"""
+        try:
+            names = BackupService.list_snapshots()
+            for name in names[:-keep] if keep else []:
+                os.remove(os.path.join(SNAPSHOT_DIR, name + '.json'))
+            live = set()
+            for name in BackupService.list_snapshots():
+                live.update(BackupService._load_manifest(name)['chunks'])
+            for sub in os.listdir(CHUNK_DIR):
+                d = os.path.join(CHUNK_DIR, sub)
+                for f in os.listdir(d):
+                    if os.path.splitext(f)[0] not in live:
+                        os.remove(os.path.join(d, f))
+        except Exception as e:
+            logging.warning(f"[Backup] Cleanup failed: {e}")
+
+    @staticmethod
+    def _latest():
+        names = BackupService.list_snapshots()
+        return names[-1] if names else None
+
+    @staticmethod
+    def _load_manifest(name):
+        with open(os.path.join(SNAPSHOT_DIR, name + '.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    @staticmethod
+    def _find_chunk(h):
+        for codec, (ext, _, _) in CODECS.items():
+            path = os.path.join(CHUNK_DIR, h[:2], h + ext)
+            if os.path.exists(path):
+                return path, codec
+        return None
+
+    @staticmethod
+    def _read(path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    @staticmethod
+    def _write_atomic(path, data):
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def main(argv):
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    cmd = argv[0] if argv else 'backup'
+    if cmd == 'backup':
+        codec = argv[1] if len(argv) > 1 else 'zlib'
+        print(BackupService.run_backup(wait=True, codec=codec) or '备份失败')
+    elif cmd == 'list':
+        for name in BackupService.list_snapshots():
+            print(name)
+    elif cmd == 'verify':
+        errors = BackupService.verify(argv[1] if len(argv) > 1 else None)
+        print('\n'.join(errors) if errors else 'OK')
+        return 1 if errors else 0
+    elif cmd == 'restore' and len(argv) > 1:
+        BackupService.restore(argv[1], argv[2] if len(argv) > 2 else DB_NAME)
+    else:
+        print(__doc__)
+        return 2
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -5,31 +5,125 @@ import os
 import uuid
 import hashlib
 import logging
-from PyQt5.QtCore import QObject, pyqtSignal, QBuffer
+from collections import OrderedDict
+from PyQt5.QtCore import QObject, pyqtSignal, QTimer
 from PyQt5.QtGui import QImage
 from PyQt5.QtWidgets import QApplication
+from core.signals import app_signals
+from data import large_text
+from services.image_encoding import submit_encode
+
+DEBOUNCE_MS = 150          # 同一次复制触发的多次 dataChanged 合并为一次
+RECENT_CAPACITY = 256      # 最近内容哈希环的容量
+TOUCH_FLUSH_MS = 2000      # 重复内容的时间戳更新批量写入间隔
 
 class ClipboardManager(QObject):
     """
     管理剪贴板数据,处理数据并将其存入数据库。
     """
     data_captured = pyqtSignal(int)
+    # 后台编码完成 (跨线程，排队回到界面线程处理)
+    _image_encoded = pyqtSignal(object, object)
 
     def __init__(self, db_manager):
         super().__init__()
         self.db = db_manager
         self._last_hash = None
+        # 最近采集过的内容: hash -> idea_id (LRU)，命中时无需查询数据库
+        self._recent = OrderedDict()
+        self._pending_touch = set()
+        # 正在后台编码的图片指纹，编码完成前重复复制不再提交
+        self._encoding = set()
+        self._image_encoded.connect(self._on_image_encoded)
+
+        self._debounce_timer = QTimer(self)
+        self._debounce_timer.setSingleShot(True)
+        self._debounce_timer.timeout.connect(self._process_pending)
+        self._pending_source = None
+
+        self._touch_timer = QTimer(self)
+        self._touch_timer.setSingleShot(True)
+        self._touch_timer.timeout.connect(self.flush_touches)
+
+        # 有笔记被永久删除时，环中的 id 可能失效
+        app_signals.ideas_purged.connect(self._recent.clear)
+
+    def schedule(self, clipboard, category_id=None):
+        """dataChanged 时调用: 在防抖窗口结束后只处理最终的剪贴板内容"""
+        # 在其他程序中复制也算用户活动: 防抖期间维护任务即可中断，采集写入时不会遇到锁
+        app_signals.clipboard_changed.emit()
+        self._pending_source = (clipboard, category_id)
+        self._debounce_timer.start(DEBOUNCE_MS)
+
+    def _process_pending(self):
+        if not self._pending_source: return
+        clipboard, category_id = self._pending_source
+        self._pending_source = None
+        self.process_clipboard(clipboard.mimeData(), category_id)
+
+    def _recent_hit(self, content_hash):
+        """命中最近哈希环时登记一次延迟的时间戳更新并返回 True"""
+        idea_id = self._recent.get(content_hash)
+        if idea_id is None:
+            return False
+        self._recent.move_to_end(content_hash)
+        self._pending_touch.add(idea_id)
+        if not self._touch_timer.isActive():
+            self._touch_timer.start(TOUCH_FLUSH_MS)
+        return True
+
+    def _remember(self, content_hash, idea_id):
+        self._recent[content_hash] = idea_id
+        self._recent.move_to_end(content_hash)
+        while len(self._recent) > RECENT_CAPACITY:
+            self._recent.popitem(last=False)
+
+    def flush_touches(self):
+        """把累积的重复采集一次性写入数据库"""
+        if not self._pending_touch: return
+        ids, self._pending_touch = list(self._pending_touch), set()
+        try:
+            self.db.touch_ideas(ids)
+        except Exception as e:
+            logging.error(f"Failed to flush clipboard timestamps: {e}", exc_info=True)
+
+    @staticmethod
+    def image_fingerprint(image):
+        """
+        直接对 QImage 的原始像素缓冲区做哈希 (memoryview，不拷贝、不编码)。
+        尺寸/格式/行字节数一并计入，避免不同布局的缓冲区碰撞。
+        """
+        ptr = image.constBits()
+        size = image.sizeInBytes() if hasattr(image, 'sizeInBytes') else image.byteCount()
+        ptr.setsize(size)
+        hasher = hashlib.sha256(f"{image.width()}x{image.height()}:{int(image.format())}:{image.bytesPerLine()}".encode())
+        hasher.update(memoryview(ptr))
+        return hasher.hexdigest()
+
+    def _on_image_encoded(self, job, future):
+        fingerprint, category_id = job
+        self._encoding.discard(fingerprint)
+        try:
+            encoded = future.result()
+            result = self.db.add_clipboard_item(item_type='image', content='[Image Data]', data_blob=encoded['data'],
+                                                category_id=category_id, image_fingerprint=fingerprint,
+                                                image_phash=encoded['phash'])
+        except Exception as e:
+            logging.error(f"Failed to store clipboard image: {e}", exc_info=True)
+            return
+        if result:
+            idea_id, is_new = result
+            self._remember(fingerprint, idea_id)
+            if is_new:
+                self.data_captured.emit(idea_id)
 
     def _hash_data(self, data):
         """为数据创建一个统一的哈希值以检查重复。"""
         try:
             if isinstance(data, QImage):
                 # 【安全规范】禁止使用MD5,必须使用SHA256
-                buffer = QBuffer()
-                buffer.open(QBuffer.ReadWrite)
-                data.save(buffer, "PNG")
-                return hashlib.sha256(buffer.data()).hexdigest()
-            return hashlib.sha256(str(data).encode('utf-8')).hexdigest()
+                return self.image_fingerprint(data)
+            return large_text.stream_hash(str(data))
         except Exception as e:
             logging.error(f"Failed to hash data: {e}", exc_info=True)
             return None
@@ -69,6 +163,9 @@ class ClipboardManager(QObject):
                         return
                     
                     if current_hash != self._last_hash:
+                        self._last_hash = current_hash
+                        if self._recent_hit(current_hash):
+                            return
                         
                         # 【优化逻辑:扩展名作为类型记录】
                         detected_type = 'file' # 默认
@@ -94,10 +191,10 @@ class ClipboardManager(QObject):
                         try:
                             # 将 detected_type 传入 item_type
                             result = self.db.add_clipboard_item(item_type=detected_type, content=content, category_id=category_id)
-                            self._last_hash = current_hash
                             
                             if result:
                                 idea_id, is_new = result
+                                self._remember(current_hash, idea_id)
                                 if is_new:
                                     # 注意：不再将扩展名作为标签添加
                                     self.data_captured.emit(idea_id)
@@ -109,23 +206,26 @@ class ClipboardManager(QObject):
             if mime_data.hasImage():
                 try:
                     image = mime_data.imageData()
-                    buffer = QBuffer()
-                    buffer.open(QBuffer.ReadWrite)
-                    image.save(buffer, "PNG")
-                    image_bytes = buffer.data()
-                    
-                    # 【安全规范】禁止使用MD5,必须使用SHA256
-                    current_hash = hashlib.sha256(image_bytes).hexdigest()
-                    
-                    if current_hash != self._last_hash:
-                        result = self.db.add_clipboard_item(item_type='image', content='[Image Data]', data_blob=image_bytes, category_id=category_id)
-                        self._last_hash = current_hash
-                        
-                        if result:
-                            idea_id, is_new = result
-                            if is_new:
-                                self.data_captured.emit(idea_id)
+                    # 先用原始像素指纹查重，只有新图片才做 PNG 编码
+                    fingerprint = self.image_fingerprint(image)
+                    if fingerprint == self._last_hash:
                         return
+                    self._last_hash = fingerprint
+                    if self._recent_hit(fingerprint):
+                        return
+
+                    idea_id = self.db.touch_clipboard_image(fingerprint)
+                    if idea_id is not None:
+                        self._remember(fingerprint, idea_id)
+                        return
+                    if fingerprint in self._encoding:
+                        return
+
+                    # 按编码策略在后台线程编码，完成后回到界面线程入库
+                    self._encoding.add(fingerprint)
+                    future = submit_encode(image, with_phash=True)
+                    future.add_done_callback(lambda f: self._image_encoded.emit((fingerprint, category_id), f))
+                    return
                 except Exception as e:
                     logging.error(f"Failed to process image from clipboard: {e}", exc_info=True)
                     return
@@ -134,7 +234,7 @@ class ClipboardManager(QObject):
             if mime_data.hasText():
                 try:
                     text = mime_data.text()
-                    if not text.strip(): 
+                    if not text or text.isspace():
                         return
                     
                     current_hash = self._hash_data(text)
@@ -143,18 +243,23 @@ class ClipboardManager(QObject):
                         return
                         
                     if current_hash != self._last_hash:
+                        self._last_hash = current_hash
+                        if self._recent_hit(current_hash):
+                            return
                         
                         # 【智能打标逻辑:网址】
-                        stripped_text = text.strip()
+                        # 只看开头部分，避免对超大文本整体 strip
+                        stripped_text = text[:large_text.TITLE_SCAN_CHARS].lstrip()
                         if stripped_text.startswith(('http://', 'https://')):
                             extra_tags.add("网址")
                             extra_tags.add("链接")
                         
-                        result = self.db.add_clipboard_item(item_type='text', content=text, category_id=category_id)
-                        self._last_hash = current_hash
+                        result = self.db.add_clipboard_item(item_type='text', content=text, category_id=category_id,
+                                                         content_hash=current_hash)
                         
                         if result:
                             idea_id, is_new = result
+                            self._remember(current_hash, idea_id)
                             if is_new:
                                 # 【应用智能标签】
                                 if extra_tags:
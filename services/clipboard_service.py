@@ -68,7 +68,8 @@ class ClipboardService(QObject):
                 category_id=category_id,
                 item_type=item_type,
                 data_blob=data_blob,
-                content_hash=content_hash
+                content_hash=content_hash,
+                source='clipboard'
             )
             
             # Automatically add "剪贴板" tag
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+# services/export_service.py
+"""
+流式导出: 按 id 分块 (keyset) 读取窄投影，逐条写出到 Markdown / JSONL / Zip。
+图片只在写 Zip 时按条单独读取，内存占用与笔记总数无关。
+外置存储的超大文本按块从 content_chunks 读取，Markdown 逐块写出。
+"""
+import os
+import json
+import sqlite3
+import zipfile
+import tempfile
+from core.config import DB_NAME
+from data import large_text
+
+EXPORT_FORMATS = {
+    'markdown': ('Markdown', '.md'),
+    'jsonl': ('JSONL', '.jsonl'),
+    'zip': ('Zip (含图片)', '.zip'),
+}
+
+# 窄投影: 不读取 data_blob，只取其长度
+EXPORT_COLUMNS = '''
+    i.id, i.title, i.content, i.item_type, i.created_at, i.updated_at,
+    i.is_favorite, i.rating, cat.name AS category,
+    (SELECT group_concat(t.name, ',') FROM idea_tags it JOIN tags t ON t.id = it.tag_id WHERE it.idea_id = i.id) AS tags,
+    length(i.data_blob) AS blob_size, i.full_size
+'''
+
+IMAGE_EXTS = ((b'\x89PNG', '.png'), (b'\xff\xd8', '.jpg'), (b'GIF8', '.gif'), (b'BM', '.bmp'))
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+class ExportService:
+    def __init__(self, db_path=DB_NAME, chunk_size=500):
+        self.db_path = db_path
+        self.chunk_size = chunk_size
+
+    def _connect(self):
+        # 独立连接，可在工作线程中使用，不与界面共用游标
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def count(self, include_deleted=False):
+        conn = self._connect()
+        try:
+            q = 'SELECT COUNT(*) FROM ideas' + ('' if include_deleted else ' WHERE is_deleted=0 OR is_deleted IS NULL')
+            return conn.execute(q).fetchone()[0]
+        finally:
+            conn.close()
+
+    def get_page(self, after_id=0, limit=50, include_deleted=False):
+        """预览用: 返回 id 大于 after_id 的一页"""
+        conn = self._connect()
+        try:
+            return [dict(r) for r in self._fetch_chunk(conn, after_id, limit, include_deleted)]
+        finally:
+            conn.close()
+
+    def iter_rows(self, conn, include_deleted=False):
+        """按 id 分块产出行，每块一次查询，游标位置由上一块最后的 id 决定"""
+        after_id = 0
+        while True:
+            rows = self._fetch_chunk(conn, after_id, self.chunk_size, include_deleted)
+            if not rows:
+                return
+            for r in rows:
+                yield r
+            after_id = rows[-1]['id']
+
+    def _fetch_chunk(self, conn, after_id, limit, include_deleted):
+        q = f'SELECT {EXPORT_COLUMNS} FROM ideas i LEFT JOIN categories cat ON cat.id = i.category_id WHERE i.id > ?'
+        if not include_deleted:
+            q += ' AND (i.is_deleted=0 OR i.is_deleted IS NULL)'
+        q += ' ORDER BY i.id LIMIT ?'
+        return conn.execute(q, (after_id, limit)).fetchall()
+
+    def export(self, path, fmt, progress=None, is_cancelled=None, include_deleted=False):
+        """
+        导出到 path。progress(done, total) 每块回调一次；is_cancelled() 返回 True 时中止并删除半成品。
+        返回导出的条数。
+        """
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f'不支持的导出格式: {fmt}')
+        part = path + '.part'
+        conn = self._connect()
+        try:
+            total = conn.execute(
+                'SELECT COUNT(*) FROM ideas' + ('' if include_deleted else ' WHERE is_deleted=0 OR is_deleted IS NULL')
+            ).fetchone()[0]
+            rows = self._tracked(self.iter_rows(conn, include_deleted), total, progress, is_cancelled)
+            if fmt == 'zip':
+                done = self._write_zip(conn, rows, part)
+            else:
+                done = 0
+                write = self._write_markdown if fmt == 'markdown' else self._write_jsonl
+                with open(part, 'w', encoding='utf-8', newline='\n') as f:
+                    for r in rows:
+                        write(f, r, conn=conn)
+                        done += 1
+            os.replace(part, path)
+            return done
+        except BaseException:
+            try: os.remove(part)
+            except OSError: pass
+            raise
+        finally:
+            conn.close()
+
+    def _tracked(self, rows, total, progress, is_cancelled):
+        done = 0
+        for r in rows:
+            if done % self.chunk_size == 0:
+                if is_cancelled and is_cancelled():
+                    raise ExportCancelled()
+                if progress: progress(done, total)
+            yield r
+            done += 1
+        if progress: progress(done, total)
+
+    @staticmethod
+    def _markdown_header(r):
+        meta = [f"创建: {r['created_at']}"]
+        if r['category']: meta.append(f"分类: {r['category']}")
+        if r['tags']: meta.append(f"标签: {r['tags'].replace(',', ', ')}")
+        if r['is_favorite']: meta.append('书签')
+        if r['rating']: meta.append('★' * r['rating'])
+        return f"## {r['title']}\n\n> {' | '.join(meta)}\n\n"
+
+    @staticmethod
+    def to_markdown(r, asset=None):
+        if asset:
+            body = f'![{r["title"]}]({asset})'
+        elif r['item_type'] == 'image':
+            body = f"[图片 {r['blob_size'] or 0} 字节]"
+        else:
+            body = r['content'] or ''
+        return f"{ExportService._markdown_header(r)}{body}\n\n---\n\n"
+
+    @staticmethod
+    def _iter_full_content(conn, iid):
+        for (data,) in conn.execute('SELECT data FROM content_chunks WHERE idea_id=? ORDER BY seq', (iid,)):
+            yield large_text.decompress_chunk(data)
+
+    def _write_markdown(self, f, r, asset=None, conn=None):
+        if r['full_size'] and conn is not None:
+            f.write(self._markdown_header(r))
+            for part in self._iter_full_content(conn, r['id']):
+                f.write(part)
+            f.write('\n\n---\n\n')
+        else:
+            f.write(self.to_markdown(r, asset))
+
+    @classmethod
+    def _write_jsonl(cls, f, r, asset=None, conn=None):
+        item = {k: r[k] for k in ('id', 'title', 'content', 'item_type', 'category', 'created_at', 'updated_at', 'is_favorite', 'rating')}
+        if r['full_size'] and conn is not None:
+            item['content'] = ''.join(cls._iter_full_content(conn, r['id']))
+        item['tags'] = r['tags'].split(',') if r['tags'] else []
+        if asset: item['asset'] = asset
+        f.write(json.dumps(item, ensure_ascii=False) + '\n')
+
+    def _write_zip(self, conn, rows, part):
+        """图片逐条写入 assets/，Markdown 与 JSONL 先写临时文件，最后放进压缩包"""
+        done = 0
+        with tempfile.TemporaryDirectory() as tmp, zipfile.ZipFile(part, 'w', zipfile.ZIP_DEFLATED) as zf:
+            md_path, jsonl_path = os.path.join(tmp, 'notes.md'), os.path.join(tmp, 'notes.jsonl')
+            with open(md_path, 'w', encoding='utf-8', newline='\n') as md, open(jsonl_path, 'w', encoding='utf-8', newline='\n') as jl:
+                for r in rows:
+                    asset = None
+                    if r['blob_size']:
+                        blob = conn.execute('SELECT data_blob FROM ideas WHERE id=?', (r['id'],)).fetchone()[0]
+                        ext = next((e for magic, e in IMAGE_EXTS if blob.startswith(magic)), '.bin')
+                        asset = f"assets/{r['id']}{ext}"
+                        # 图片本身已压缩，直接存储
+                        zf.writestr(asset, blob, compress_type=zipfile.ZIP_STORED)
+                        del blob
+                    self._write_markdown(md, r, asset, conn)
+                    self._write_jsonl(jl, r, asset, conn)
+                    done += 1
+            zf.write(md_path, 'notes.md')
+            zf.write(jsonl_path, 'notes.jsonl')
+        return done
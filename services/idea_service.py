@@ -1,20 +1,34 @@
 # -*- coding: utf-8 -*-
 # services/idea_service.py
-from core.config import COLORS
 from core.signals import app_signals
+from services.import_service import ImportService
+from services.trash_service import TrashPurger
+from services.retention_service import RetentionSweeper
+from services.near_duplicates import (ImageHashIndex, HashBackfill, TextHashBackfill, NEAR_DUPLICATE_TAG,
+                                      load_near_duplicate_settings, load_text_near_duplicate_settings,
+                                      simhash, text_bands, text_probes, hamming, cluster_pairs, text_duplicate_pairs)
+from data import large_text
 import hashlib
 import os
 
+# 每新增多少条剪贴板记录触发一次后台保留策略清理
+RETENTION_SWEEP_EVERY = 200
+
 class IdeaService:
-    def __init__(self, idea_repo, category_repo, tag_repo):
+    def __init__(self, idea_repo, category_repo, tag_repo, change_log_repo=None):
         self.idea_repo = idea_repo
         self.category_repo = category_repo
         self.tag_repo = tag_repo
+        self.change_log_repo = change_log_repo
+        self._clipboard_added = 0
+        # 图片感知哈希索引，首次使用时从数据库构建；有笔记被永久删除时丢弃重建
+        self._phash_index = None
+        app_signals.ideas_purged.connect(self._drop_phash_index)
         self.conn = self.idea_repo.db.conn # 用于暴露给需要直接访问 conn 的旧代码(如 AdvancedTagSelector)
 
     # --- Idea Operations ---
-    def get_ideas(self, search, f_type, f_val, page=1, page_size=100, tag_filter=None, filter_criteria=None):
-        return self.idea_repo.get_list_by_filter(search, f_type, f_val, page, page_size, tag_filter, filter_criteria)
+    def get_ideas(self, search, f_type, f_val, page=1, page_size=100, tag_filter=None, filter_criteria=None, order='recent'):
+        return self.idea_repo.get_list_by_filter(search, f_type, f_val, page, page_size, tag_filter, filter_criteria, order)
 
     def get_ideas_count(self, search, f_type, f_val, tag_filter=None, filter_criteria=None):
         return self.idea_repo.get_count_by_filter(search, f_type, f_val, tag_filter, filter_criteria)
@@ -30,16 +44,31 @@ class IdeaService:
     def get_idea(self, iid, include_blob=False):
         return self.idea_repo.get_by_id(iid, include_blob)
 
+    def get_full_content(self, iid):
+        """全文 (超大文本从分块表拼接)，用于粘贴、编辑和提取"""
+        return self.idea_repo.get_full_content(iid)
+
+    def iter_full_content(self, iid):
+        return self.idea_repo.iter_full_content(iid)
+
+    def open_image_blob(self, iid):
+        """只读打开图片数据 (增量读取，不整块载入内存)，无图片返回 None"""
+        return self.idea_repo.open_blob(iid)
+
     def add_idea(self, title, content, color, tags, category_id=None, item_type='text', data_blob=None):
-        if color is None: color = COLORS['default_note']
-        iid = self.idea_repo.add(title, content, color, category_id, item_type, data_blob)
+        # color 为 None 时不写入手动颜色，显示颜色由分类/状态推导
+        text_hash = simhash(content) if item_type == 'text' else None
+        # 笔记、指纹和标签在同一事务中写入，由 update_tags 提交
+        iid = self.idea_repo.add(title, content, color, category_id, item_type, data_blob, text_simhash=text_hash,
+                                 bands=text_bands(text_hash) if text_hash is not None else (), commit=False)
         self.tag_repo.update_tags(iid, tags)
         app_signals.data_changed.emit()
         return iid
 
-    def update_idea(self, iid, title, content, color, tags, category_id=None, item_type='text', data_blob=None):
-        self.idea_repo.update(iid, title, content, color, category_id, item_type, data_blob)
+    def update_idea(self, iid, title, content, color, tags, category_id=None, item_type='text', data_blob=None, keep_blob=False):
+        self.idea_repo.update(iid, title, content, color, category_id, item_type, data_blob, keep_blob)
         self.tag_repo.update_tags(iid, tags)
+        if item_type == 'text': self._save_text_simhash(iid, simhash(content))
         app_signals.data_changed.emit()
 
     def update_field(self, iid, field, value):
@@ -50,19 +79,17 @@ class IdeaService:
         self.idea_repo.toggle_field(iid, field)
         app_signals.data_changed.emit()
 
+    def record_use(self, iid):
+        """记录使用，用于 frecency 排序；不触发全局刷新"""
+        self.idea_repo.record_use(iid)
+
     def set_favorite(self, iid, state, emit_signal=True):
         self.idea_repo.update_field(iid, 'is_favorite', 1 if state else 0)
         if emit_signal:
             app_signals.data_changed.emit()
 
     def set_deleted(self, iid, state, emit_signal=True):
-        val = 1 if state else 0
-        self.idea_repo.update_field(iid, 'is_deleted', val)
-        if state:
-            self.idea_repo.update_field(iid, 'category_id', None)
-            self.idea_repo.update_field(iid, 'color', COLORS['trash'])
-        else:
-            self.idea_repo.update_field(iid, 'color', COLORS['uncategorized'])
+        self.idea_repo.set_deleted(iid, state)
         if emit_signal:
             app_signals.data_changed.emit()
 
@@ -72,27 +99,19 @@ class IdeaService:
 
     def delete_permanent(self, iid):
         self.idea_repo.delete_permanent(iid)
+        app_signals.ideas_purged.emit()
+        app_signals.data_changed.emit()
+
+    def touch_ideas(self, ids):
+        """批量标记重复采集 (更新时间戳)，只刷新一次"""
+        self.idea_repo.touch_many(ids)
         app_signals.data_changed.emit()
 
     def move_category(self, iid, cat_id, emit_signal=True):
         """
-        移动笔记到指定分类，并自动应用该分类的颜色。
+        移动笔记到指定分类。颜色不再逐行写入，读取时自动跟随分类颜色。
         """
-        self.idea_repo.update_field(iid, 'category_id', cat_id)
-        self.idea_repo.update_field(iid, 'is_deleted', 0)
-        
-        # [关键修复] 自动同步颜色
-        if cat_id is not None:
-            # 查询目标分类的颜色
-            c = self.idea_repo.db.get_cursor()
-            c.execute('SELECT color FROM categories WHERE id=?', (cat_id,))
-            row = c.fetchone()
-            if row and row[0]:
-                self.idea_repo.update_field(iid, 'color', row[0])
-        else:
-            # 移回未分类，恢复为默认的未分类颜色
-            self.idea_repo.update_field(iid, 'color', COLORS['uncategorized'])
-
+        self.idea_repo.move_category(iid, cat_id)
         if emit_signal:
             app_signals.data_changed.emit()
 
@@ -107,32 +126,55 @@ class IdeaService:
         return self.idea_repo.get_filter_stats(search, f_type, f_val)
         
     def empty_trash(self):
-        c = self.idea_repo.db.get_cursor()
-        c.execute('DELETE FROM idea_tags WHERE idea_id IN (SELECT id FROM ideas WHERE is_deleted=1)')
-        c.execute('DELETE FROM ideas WHERE is_deleted=1')
-        self.idea_repo.db.commit()
-        app_signals.data_changed.emit()
+        """后台分块清空回收站，完成后发出刷新信号；返回工作线程"""
+        return TrashPurger(self.idea_repo.db.db_path).run_async(
+            progress=app_signals.trash_purge_progress.emit,
+            on_finished=lambda n: (app_signals.ideas_purged.emit(), app_signals.data_changed.emit())
+        )
 
     # --- Clipboard Logic (Ported from db_manager) ---
-    def add_clipboard_item(self, item_type, content, data_blob=None, category_id=None):
-        hasher = hashlib.sha256()
-        
-        if item_type == 'image' and data_blob:
-            hasher.update(data_blob)
-        else:
-            safe_content = str(content) if content else ""
-            hasher.update(safe_content.encode('utf-8'))
-            
-        content_hash = hasher.hexdigest()
+    def touch_clipboard_image(self, fingerprint):
+        """按像素指纹命中已有图片时只更新时间戳，返回 idea id；未命中返回 None"""
+        existing = self.idea_repo.find_by_image_fingerprint(fingerprint)
+        if not existing:
+            return None
+        self.idea_repo.update_timestamp(existing[0])
+        app_signals.data_changed.emit()
+        return existing[0]
+
+    def add_clipboard_item(self, item_type, content, data_blob=None, category_id=None, image_fingerprint=None, content_hash=None,
+                           image_phash=None):
+        # content_hash 可由调用方传入 (剪贴板监听已算过)，避免对大文本重复哈希
+        if content_hash is None:
+            if item_type == 'image' and data_blob:
+                content_hash = hashlib.sha256(data_blob).hexdigest()
+            else:
+                content_hash = large_text.stream_hash(str(content) if content else "")
+        if image_fingerprint:
+            self.idea_repo.save_image_fingerprint(image_fingerprint, content_hash)
 
         existing = self.idea_repo.find_by_hash(content_hash)
+        if not existing and image_phash is not None:
+            settings = load_near_duplicate_settings()
+            if settings['merge_on_capture']:
+                existing = self.find_similar_image(image_phash, settings['radius'])
+                if existing:
+                    existing = (existing,)
+        text_hash = near_text = None
+        if not existing and item_type == 'text':
+            text_hash = simhash(content)
+            settings = load_text_near_duplicate_settings()
+            if text_hash is not None and settings['mode'] in ('flag', 'merge'):
+                near_text = self.find_similar_text(text_hash, settings['radius'])
+                if near_text and settings['mode'] == 'merge':
+                    existing = (near_text,)
         if existing:
             self.idea_repo.update_timestamp(existing[0])
             app_signals.data_changed.emit()
             return existing[0], False
         else:
             if item_type == 'text':
-                title = content.strip().split('\n')[0][:50]
+                title = large_text.make_title(content)
             elif item_type == 'image':
                 title = "[图片]"
             else:
@@ -145,19 +187,105 @@ class IdeaService:
                 except Exception:
                     title = f"[{item_type}]"
             
-            # 如果有传入分类ID，尝试使用分类颜色，否则用默认
-            color = COLORS['default_note']
-            if category_id:
-                c = self.idea_repo.db.get_cursor()
-                c.execute('SELECT color FROM categories WHERE id=?', (category_id,))
-                row = c.fetchone()
-                if row and row[0]:
-                    color = row[0]
-            
-            iid = self.idea_repo.add(title, content, color, category_id, item_type, data_blob, content_hash)
+            # 不写入手动颜色，显示颜色由所属分类推导
+            # 笔记、指纹分段和近似重复标签在同一事务中写入，每次采集只提交一次
+            iid = self.idea_repo.add(title, content, None, category_id, item_type, data_blob, content_hash,
+                                     source='clipboard', image_phash=image_phash, text_simhash=text_hash,
+                                     bands=text_bands(text_hash) if text_hash is not None else (), commit=False)
+            if near_text:
+                self.tag_repo.add_to_multiple([iid], [NEAR_DUPLICATE_TAG], commit=False)
+            self.idea_repo.db.commit()
+            if image_phash is not None and self._phash_index is not None:
+                self._phash_index.add(iid, image_phash)
             app_signals.data_changed.emit()
+            self._clipboard_added += 1
+            if self._clipboard_added % RETENTION_SWEEP_EVERY == 0:
+                self.sweep_clipboard()
             return iid, True
 
+    def sweep_clipboard(self):
+        """后台按保留策略把超出的剪贴板历史移入回收站，有变动时刷新界面"""
+        return RetentionSweeper(self.idea_repo.db.db_path).run_async(self._on_clipboard_swept)
+
+    def _on_clipboard_swept(self, result):
+        if result['trashed']:
+            app_signals.data_changed.emit()
+
+    # --- Near-duplicate Images ---
+    def _drop_phash_index(self):
+        self._phash_index = None
+
+    def _image_index(self):
+        if self._phash_index is None:
+            self._phash_index = ImageHashIndex(self.idea_repo.get_image_phashes(), load_near_duplicate_settings()['radius'])
+        return self._phash_index
+
+    def find_similar_image(self, phash, radius=None):
+        """汉明距离 radius 内最相近且未删除的图片 id，没有则返回 None"""
+        if radius is None: radius = load_near_duplicate_settings()['radius']
+        candidates = [iid for _, iid in self._image_index().near(phash, radius)]
+        # 索引只增不删，需确认候选仍然有效 (进入回收站的也排除)
+        live = {iid for iid, _ in self.idea_repo.get_live_by_recency(candidates)}
+        return next((iid for iid in candidates if iid in live), None)
+
+    def get_duplicate_image_clusters(self, radius=None):
+        """近似重复图片簇，每簇按最近使用排序: [[(id, 是否受保护), ...], ...]"""
+        if radius is None: radius = load_near_duplicate_settings()['radius']
+        return self._rank_clusters(self._image_index().clusters(radius))
+
+    def _rank_clusters(self, groups):
+        clusters = []
+        for group in groups:
+            rows = self.idea_repo.get_live_by_recency(group)
+            if len(rows) > 1:
+                clusters.append(rows)
+        clusters.sort(key=len, reverse=True)
+        return clusters
+
+    def trash_duplicates(self, clusters):
+        """每簇保留最近使用的一条，其余未受保护的移入回收站，返回移动的条数"""
+        moved = 0
+        for rows in clusters:
+            for iid, protected in rows[1:]:
+                if not protected:
+                    self.idea_repo.set_deleted(iid, True)
+                    moved += 1
+        if moved:
+            app_signals.data_changed.emit()
+        return moved
+
+    def trash_duplicate_images(self, clusters=None):
+        if clusters is None: clusters = self.get_duplicate_image_clusters()
+        return self.trash_duplicates(clusters)
+
+    def backfill_image_hashes(self):
+        """后台为已有图片补算感知哈希，完成后重建索引"""
+        return HashBackfill(self.idea_repo.db.db_path).run_async(self._on_images_hashed)
+
+    def _on_images_hashed(self, n):
+        if n: self._drop_phash_index()
+
+    # --- Near-duplicate Texts ---
+    def _save_text_simhash(self, iid, text_hash):
+        if text_hash is not None:
+            self.idea_repo.set_text_simhash(iid, text_hash, text_bands(text_hash))
+
+    def find_similar_text(self, text_hash, radius=None):
+        """通过分段索引 (含单比特探测) 取候选，返回汉明距离 radius 内最相近的文本 id"""
+        if radius is None: radius = load_text_near_duplicate_settings()['radius']
+        candidates = self.idea_repo.find_text_candidates(text_probes(text_hash))
+        best = min(((hamming(text_hash, h), iid) for iid, h in candidates), default=None)
+        return best[1] if best and best[0] <= radius else None
+
+    def get_duplicate_text_clusters(self, radius=None):
+        """全库近似重复文本簇 (分段等值连接，不做两两比较)，格式同 get_duplicate_image_clusters"""
+        if radius is None: radius = load_text_near_duplicate_settings()['radius']
+        return self._rank_clusters(cluster_pairs(text_duplicate_pairs(self.idea_repo.db.conn, radius)))
+
+    def backfill_text_hashes(self):
+        """后台为已有文本补算 SimHash"""
+        return TextHashBackfill(self.idea_repo.db.db_path).run_async()
+
     # --- Tag Operations ---
     def get_tags(self, iid):
         return self.tag_repo.get_by_idea(iid)
@@ -219,4 +347,22 @@ class IdeaService:
         
     def save_category_order(self, update_list):
         self.category_repo.save_order(update_list)
-        app_signals.data_changed.emit()
\ No newline at end of file
+        app_signals.data_changed.emit()
+
+    # --- Bulk Import ---
+    def import_items(self, kind, source, progress=None, on_finished=None, is_cancelled=None):
+        """后台批量导入 (kind: jsonl / markdown / db)，结束后只发一次刷新信号再调用 on_finished(结果)；返回工作线程"""
+        def finished(result):
+            app_signals.data_changed.emit()
+            if on_finished: on_finished(result)
+        return ImportService(self.idea_repo.db.db_path).run_async(kind, source, progress, finished, is_cancelled)
+
+    # --- Change Log ---
+    def get_change_seq(self):
+        return self.change_log_repo.latest_seq()
+
+    def get_changes_since(self, seq, tables=None, limit=None):
+        return self.change_log_repo.get_since(seq, tables, limit)
+
+    def compact_change_log(self, upto_seq=None):
+        return self.change_log_repo.compact(upto_seq)
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+# services/image_encoding.py
+"""
+采集图片的编码策略
+
+设置项 image_encoding (settings.json):
+    png_compression  'fast' | 'default' | 'small'  PNG 压缩级别 (速度优先 / Qt 默认 / 体积优先)
+    max_dimension    长边超过该像素数时等比缩小，0 表示保持原尺寸
+    lossy_photos     照片类图片 (颜色丰富且无透明通道) 存为 JPEG，截图始终无损 PNG
+    jpeg_quality     有损存储时的 JPEG 质量
+
+编码在单个后台线程中进行，submit_encode 返回 concurrent.futures.Future。
+"""
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from PyQt5.QtCore import QBuffer, QByteArray, QIODevice, Qt
+from PyQt5.QtGui import QImage
+from core.settings import load_setting
+
+DEFAULT_IMAGE_ENCODING = {
+    'png_compression': 'fast',
+    'max_dimension': 0,
+    'lossy_photos': False,
+    'jpeg_quality': 85,
+}
+
+# Qt PNG 插件的 quality 参数: 85 -> zlib 级别 1，0 -> 级别 9，-1 为插件默认
+PNG_QUALITY = {'fast': 85, 'default': -1, 'small': 0}
+
+PHOTO_SAMPLE = 64
+PHOTO_COLOR_RATIO = 0.6
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ImageEncoder')
+
+
+def load_encoding_policy():
+    return {**DEFAULT_IMAGE_ENCODING, **(load_setting('image_encoding') or {})}
+
+
+def looks_like_photo(image):
+    """缩略采样后统计颜色数，颜色丰富的视为照片；带透明通道的一律按截图处理"""
+    if image.hasAlphaChannel():
+        return False
+    sample = image.scaled(PHOTO_SAMPLE, PHOTO_SAMPLE, Qt.IgnoreAspectRatio, Qt.FastTransformation)
+    sample = sample.convertToFormat(QImage.Format_RGB32)
+    ptr = sample.constBits()
+    ptr.setsize(sample.bytesPerLine() * sample.height())
+    colors = len(set(memoryview(ptr).cast('I')))
+    return colors > PHOTO_SAMPLE * PHOTO_SAMPLE * PHOTO_COLOR_RATIO
+
+
+def encode_image(image, policy=None):
+    """
+    按策略编码 QImage，返回 {'data', 'format', 'width', 'height', 'raw_bytes', 'ms'}。
+    raw_bytes 为原始像素缓冲区大小，用于统计节省的字节数。
+    """
+    policy = policy or load_encoding_policy()
+    started = time.perf_counter()
+    raw_bytes = image.bytesPerLine() * image.height()
+
+    limit = int(policy.get('max_dimension') or 0)
+    if limit and max(image.width(), image.height()) > limit:
+        image = image.scaled(limit, limit, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+    if policy.get('lossy_photos') and looks_like_photo(image):
+        fmt, quality = 'JPG', int(policy.get('jpeg_quality', 85))
+    else:
+        fmt, quality = 'PNG', PNG_QUALITY.get(policy.get('png_compression'), -1)
+
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.WriteOnly)
+    image.save(buffer, fmt, quality)
+    buffer.close()
+
+    result = {
+        'data': data.data(), 'format': fmt, 'width': image.width(), 'height': image.height(),
+        'raw_bytes': raw_bytes, 'ms': round((time.perf_counter() - started) * 1000, 1),
+    }
+    encoding_stats.add(result)
+    return result
+
+
+def _encode_with_phash(image, policy):
+    from services.near_duplicates import dhash
+    phash = dhash(image)
+    result = encode_image(image, policy)
+    result['phash'] = phash
+    return result
+
+
+def submit_encode(image, policy=None, with_phash=False):
+    """在后台线程编码，返回 Future (结果同 encode_image；with_phash 时另含原图的感知哈希 'phash')"""
+    # 策略在提交时读取，工作线程不访问设置文件
+    job = _encode_with_phash if with_phash else encode_image
+    return _executor.submit(job, QImage(image), policy or load_encoding_policy())
+
+
+class EncodingStats:
+    """累计编码统计，线程安全"""
+    LOG_EVERY = 20
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.count = 0
+            self.raw_bytes = 0
+            self.stored_bytes = 0
+            self.ms = 0.0
+            self.by_format = {}
+
+    def add(self, result):
+        with self._lock:
+            self.count += 1
+            self.raw_bytes += result['raw_bytes']
+            self.stored_bytes += len(result['data'])
+            self.ms += result['ms']
+            self.by_format[result['format']] = self.by_format.get(result['format'], 0) + 1
+            summary = self.count % self.LOG_EVERY == 0
+        logging.debug("[ImageEncoding] %dx%d %s %.0f KB in %s ms", result['width'], result['height'],
+                      result['format'], len(result['data']) / 1024, result['ms'])
+        if summary:
+            logging.info("[ImageEncoding] %s", self.snapshot())
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'count': self.count,
+                'raw_bytes': self.raw_bytes,
+                'stored_bytes': self.stored_bytes,
+                'saved_bytes': self.raw_bytes - self.stored_bytes,
+                'total_ms': round(self.ms, 1),
+                'avg_ms': round(self.ms / self.count, 1) if self.count else 0,
+                'by_format': dict(self.by_format),
+            }
+
+
+encoding_stats = EncodingStats()
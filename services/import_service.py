@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+# services/import_service.py
+"""
+批量导入: JSONL (含导出的 zip) / Markdown 文件夹 / 旧版 ideas.db
+
+解析在后台线程进行，通过有界队列按批交给写入端；写入端每批一个事务，用 executemany 批量插入，
+按 content_hash 批量查重。事务内先移除变更日志触发器，写完后补写本批的日志并恢复触发器再提交，
+其他连接看不到没有触发器的中间状态；批与批之间让出写锁，导入期间剪贴板采集和编辑不会被长时间阻塞。
+取消或出错时只回滚当前批，已提交的批保留。
+
+命令行:
+    python -m services.import_service jsonl|markdown|db <路径>
+"""
+import os
+import sys
+import json
+import time
+import queue
+import sqlite3
+import hashlib
+import logging
+import zipfile
+import threading
+from core.config import DB_NAME
+from data.schema_migrations import SchemaMigration
+from data.frecency import frecency_at_sql
+from services.trash_service import PAUSE
+
+BATCH_SIZE = 2000
+MARKDOWN_EXTS = ('.md', '.markdown', '.txt')
+_DONE = object()
+
+
+class ImportCancelled(Exception):
+    pass
+
+
+def content_hash(item_type, content, data_blob):
+    """与 IdeaService.add_clipboard_item 相同的哈希规则"""
+    hasher = hashlib.sha256()
+    if item_type == 'image' and data_blob:
+        hasher.update(data_blob)
+    else:
+        hasher.update((str(content) if content else '').encode('utf-8'))
+    return hasher.hexdigest()
+
+
+# --- 解析器: 产出统一格式的 dict ---
+# title, content, item_type, data_blob, tags(list), category(名称路径 list), color,
+# is_pinned, is_favorite, rating, created_at, updated_at
+
+def parse_jsonl(path):
+    """JSONL 文件，或导出的 zip (notes.jsonl + assets/)"""
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zf:
+            with zf.open('notes.jsonl') as f:
+                for line in f:
+                    item = _from_export(json.loads(line))
+                    if item.get('asset'):
+                        item['data_blob'] = zf.read(item.pop('asset'))
+                    yield item
+        return
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip(): continue
+            item = _from_export(json.loads(line))
+            asset = item.pop('asset', None)
+            if asset and os.path.exists(os.path.join(base, asset)):
+                with open(os.path.join(base, asset), 'rb') as af:
+                    item['data_blob'] = af.read()
+            yield item
+
+
+def _from_export(d):
+    cat = d.get('category')
+    d['category'] = [cat] if isinstance(cat, str) and cat else (cat or [])
+    return d
+
+
+def parse_markdown_folder(root):
+    """每个文件一条笔记；标题取首个 # 标题或文件名，分类取相对目录"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        rel = os.path.relpath(dirpath, root)
+        category = [] if rel == '.' else rel.replace('\\', '/').split('/')
+        for name in sorted(filenames):
+            if not name.lower().endswith(MARKDOWN_EXTS): continue
+            path = os.path.join(dirpath, name)
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                text = f.read()
+            title = os.path.splitext(name)[0]
+            for line in text.splitlines():
+                if line.strip():
+                    if line.startswith('#'): title = line.lstrip('#').strip() or title
+                    break
+            ts = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(os.path.getmtime(path)))
+            yield {'title': title[:200], 'content': text, 'item_type': 'text', 'category': category,
+                   'created_at': ts, 'updated_at': ts}
+
+
+def parse_legacy_db(path):
+    """旧版数据库: 保留分类层级和标签；v2 之前的颜色是冗余的派生值，不导入"""
+    src = sqlite3.connect(f'file:{os.path.abspath(path)}?mode=ro', uri=True)
+    src.row_factory = sqlite3.Row
+    try:
+        keep_color = src.execute('PRAGMA user_version').fetchone()[0] >= 2
+        cats = {r['id']: (r['name'], r['parent_id']) for r in src.execute('SELECT id, name, parent_id FROM categories')}
+
+        def cat_path(cid):
+            out, seen = [], set()
+            while cid in cats and cid not in seen:
+                seen.add(cid)
+                out.append(cats[cid][0]); cid = cats[cid][1]
+            return out[::-1]
+
+        cols = {r[1] for r in src.execute('PRAGMA table_info(ideas)')}
+        opt = lambda c, default='NULL': c if c in cols else f'{default} AS {c}'
+        q = f'''SELECT i.id, i.title, i.content, i.color, i.is_pinned, i.is_favorite, i.created_at, i.updated_at,
+                       {opt('category_id')}, {opt('is_deleted', '0')}, {opt('item_type', "'text'")}, {opt('data_blob')},
+                       {opt('rating', '0')},
+                       (SELECT group_concat(t.name, char(31)) FROM idea_tags it JOIN tags t ON t.id = it.tag_id WHERE it.idea_id = i.id) AS tags
+                FROM ideas i WHERE {'is_deleted=0 OR is_deleted IS NULL' if 'is_deleted' in cols else '1=1'} ORDER BY i.id'''
+        for r in src.execute(q):
+            yield {'title': r['title'], 'content': r['content'], 'item_type': r['item_type'] or 'text',
+                   'data_blob': r['data_blob'], 'tags': r['tags'].split('\x1f') if r['tags'] else [],
+                   'category': cat_path(r['category_id']), 'color': r['color'] if keep_color else None,
+                   'is_pinned': r['is_pinned'], 'is_favorite': r['is_favorite'], 'rating': r['rating'],
+                   'created_at': r['created_at'], 'updated_at': r['updated_at']}
+    finally:
+        src.close()
+
+
+PARSERS = {'jsonl': parse_jsonl, 'markdown': parse_markdown_folder, 'db': parse_legacy_db}
+
+
+class ImportService:
+    def __init__(self, db_path=DB_NAME, batch_size=BATCH_SIZE):
+        self.db_path = db_path
+        self.batch_size = batch_size
+
+    def run(self, kind, source, progress=None, is_cancelled=None):
+        """
+        导入 source，progress(imported, duplicates) 每批提交后回调一次。
+        返回 {'imported', 'duplicates', 'seconds', 'rate'}；取消时抛出 ImportCancelled (已提交的批保留)。
+        """
+        started = time.perf_counter()
+        batches = queue.Queue(maxsize=4)
+        stop = threading.Event()
+        parser = threading.Thread(target=self._parse, args=(PARSERS[kind], source, batches, stop), daemon=True, name='ImportParser')
+        parser.start()
+
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        imported = duplicates = 0
+        try:
+            c = conn.cursor()
+            self._tags = {name: tid for tid, name in c.execute('SELECT id, name FROM tags')}
+            self._cats = {}
+            self._seen = set()
+            while True:
+                batch = batches.get()
+                if batch is _DONE: break
+                if isinstance(batch, BaseException): raise batch
+                if is_cancelled and is_cancelled(): raise ImportCancelled()
+                n, dup = self._commit_batch(conn, c, batch)
+                imported += n; duplicates += dup
+                if progress: progress(imported, duplicates)
+                # 让出写锁，等待中的其他连接可以先写入
+                time.sleep(PAUSE)
+        except BaseException:
+            stop.set()
+            if conn.in_transaction: conn.execute('ROLLBACK')
+            raise
+        finally:
+            stop.set()
+            conn.close()
+
+        seconds = time.perf_counter() - started
+        result = {'imported': imported, 'duplicates': duplicates, 'seconds': round(seconds, 2),
+                  'rate': round(imported / seconds, 1) if seconds else 0}
+        logging.info(f"[Import] {kind} {source}: {imported} imported, {duplicates} duplicates, "
+                     f"{result['seconds']}s ({result['rate']}/s)")
+        return result
+
+    def run_async(self, kind, source, progress=None, on_finished=None, is_cancelled=None):
+        """在后台线程导入，结束后 on_finished(结果)；取消或出错时结果为 None"""
+        def job():
+            result = None
+            try:
+                result = self.run(kind, source, progress, is_cancelled)
+            except ImportCancelled:
+                logging.info(f"[Import] {kind} {source}: cancelled")
+            except Exception as e:
+                logging.error(f"[Import] {kind} {source} failed: {e}", exc_info=True)
+            if on_finished: on_finished(result)
+        t = threading.Thread(target=job, daemon=True, name='ImportWriter')
+        t.start()
+        return t
+
+    def _commit_batch(self, conn, c, batch):
+        """一批一个事务: 移除触发器、写入、补写本批的变更日志、恢复触发器后提交"""
+        c.execute('BEGIN IMMEDIATE')
+        try:
+            SchemaMigration.drop_change_triggers(conn)
+            # 批与批之间其他连接可能已插入新行，每批重新取起始 id
+            first_id = self._next_id(c)
+            self._new_cats = []
+            n, dup = self._write_batch(c, batch, first_id)
+            c.executemany("INSERT INTO change_log (tbl, row_id, kind) VALUES ('categories', ?, 'insert')",
+                          [(cid,) for cid in self._new_cats])
+            c.execute("INSERT INTO change_log (tbl, row_id, kind) SELECT 'ideas', id, 'insert' FROM ideas WHERE id >= ? ORDER BY id", (first_id,))
+            c.execute("INSERT INTO change_log (tbl, row_id, kind, columns) SELECT 'idea_tags', idea_id, 'insert', tag_id FROM idea_tags WHERE idea_id >= ?", (first_id,))
+            SchemaMigration.create_change_triggers(conn)
+            c.execute('COMMIT')
+        except BaseException:
+            if conn.in_transaction: c.execute('ROLLBACK')
+            raise
+        return n, dup
+
+    def _parse(self, parser, source, batches, stop):
+        """后台线程: 解析并计算哈希，按批放入有界队列"""
+        def put(obj):
+            # 写入端中止后不再阻塞在满队列上
+            while not stop.is_set():
+                try:
+                    batches.put(obj, timeout=0.2)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        try:
+            batch = []
+            for item in parser(source):
+                item['content_hash'] = content_hash(item.get('item_type', 'text'), item.get('content'), item.get('data_blob'))
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    if not put(batch): return
+                    batch = []
+            if batch and not put(batch): return
+            put(_DONE)
+        except BaseException as e:
+            put(e)
+
+    @staticmethod
+    def _next_id(c):
+        c.execute("SELECT COALESCE(MAX(seq), 0) FROM sqlite_sequence WHERE name='ideas'")
+        seq = c.fetchone()[0]
+        c.execute('SELECT COALESCE(MAX(id), 0) FROM ideas')
+        return max(seq, c.fetchone()[0]) + 1
+
+    def _write_batch(self, c, batch, next_id):
+        # 批量查重: 库中已有的 + 本次导入中已出现的
+        hashes = list({item['content_hash'] for item in batch})
+        existing = set()
+        for i in range(0, len(hashes), 500):
+            part = hashes[i:i + 500]
+            c.execute(f"SELECT content_hash FROM ideas WHERE content_hash IN ({','.join('?' * len(part))})", part)
+            existing.update(r[0] for r in c.fetchall())
+
+        rows, tag_rows, duplicates = [], [], 0
+        for item in batch:
+            h = item['content_hash']
+            if h in existing or h in self._seen:
+                duplicates += 1
+                continue
+            self._seen.add(h)
+            iid = next_id + len(rows)
+            title = (item.get('title') or '').strip() or (item.get('content') or '').strip().split('\n')[0][:50] or '未命名'
+            updated_at = item.get('updated_at') or item.get('created_at')
+            rows.append((
+                iid, title, item.get('content'), item.get('color'),
+                item.get('is_pinned') or 0, item.get('is_favorite') or 0,
+                item.get('created_at'), updated_at,
+                self._category_id(c, item.get('category')), item.get('item_type') or 'text',
+                item.get('data_blob'), h, item.get('rating') or 0, updated_at
+            ))
+            for tag in item.get('tags') or []:
+                tid = self._tag_id(c, tag)
+                if tid: tag_rows.append((iid, tid))
+
+        c.executemany(f'''INSERT INTO ideas (id, title, content, color, is_pinned, is_favorite, created_at, updated_at,
+                                            category_id, item_type, data_blob, content_hash, rating, source, frecency)
+                         VALUES (?,?,?,?,?,?,COALESCE(?, CURRENT_TIMESTAMP),COALESCE(?, CURRENT_TIMESTAMP),?,?,?,?,?,'import',
+                                 {frecency_at_sql("COALESCE(?, CURRENT_TIMESTAMP)")})''', rows)
+        c.executemany('INSERT OR IGNORE INTO idea_tags (idea_id, tag_id) VALUES (?,?)', tag_rows)
+        return len(rows), duplicates
+
+    def _tag_id(self, c, name):
+        name = (name or '').strip()
+        if not name: return None
+        if name not in self._tags:
+            c.execute('INSERT OR IGNORE INTO tags (name) VALUES (?)', (name,))
+            c.execute('SELECT id FROM tags WHERE name=?', (name,))
+            self._tags[name] = c.fetchone()[0]
+        return self._tags[name]
+
+    def _category_id(self, c, path):
+        """按名称路径查找分类，不存在则逐级创建"""
+        parent = None
+        for name in path or []:
+            key = (parent, name)
+            if key not in self._cats:
+                if parent is None: c.execute('SELECT id FROM categories WHERE name=? AND parent_id IS NULL', (name,))
+                else: c.execute('SELECT id FROM categories WHERE name=? AND parent_id=?', (name, parent))
+                row = c.fetchone()
+                if row: self._cats[key] = row[0]
+                else:
+                    c.execute('INSERT INTO categories (name, parent_id, sort_order) VALUES (?, ?, (SELECT COALESCE(MAX(sort_order), 0) + 1 FROM categories))', (name, parent))
+                    self._cats[key] = c.lastrowid
+                    self._new_cats.append(c.lastrowid)
+            parent = self._cats[key]
+        return parent
+
+
+def main(argv):
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    if len(argv) != 2 or argv[0] not in PARSERS:
+        print(__doc__)
+        return 2
+    result = ImportService().run(argv[0], argv[1], progress=lambda n, d: print(f'\r{n} imported, {d} duplicates', end=''))
+    print()
+    print(result)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,433 @@
+# -*- coding: utf-8 -*-
+# services/maintenance_service.py
+"""
+空闲时数据库维护
+
+启动时不做任何维护。应用连续 idle_seconds 秒没有键盘/鼠标输入、剪贴板变化和数据变化后，后台线程按优先级
+逐个运行到期的任务；每个任务拆成许多小步，步与步之间检查中断标志。用户一有操作 (包括在其他程序中复制) 就中断，
+正在执行的长语句 (ANALYZE、quick_check 等) 由 progress handler 中止。
+任务进度保存在 maintenance_jobs 表中，下次空闲时从断点继续。
+
+设置项 maintenance (settings.json):
+    enabled        是否启用
+    idle_seconds   无操作多少秒后开始
+    disabled_jobs  不运行的任务名列表
+
+命令行:
+    python -m services.maintenance_service list           查看任务状态
+    python -m services.maintenance_service run [任务 ...]  立即运行 (指定任务名时不论是否到期)
+"""
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from PyQt5.QtCore import QObject, QTimer, QEvent
+from core.config import DB_NAME
+from core.settings import load_setting
+from core.signals import app_signals
+from data import large_text
+from data.repositories.idea_repository import open_blob
+from data.repositories.change_log_repository import compact_old
+from services.trash_service import incremental_vacuum, PAUSE
+
+DEFAULT_MAINTENANCE = {'enabled': True, 'idle_seconds': 60, 'disabled_jobs': []}
+
+HOUR = 3600
+DAY = 24 * HOUR
+WEEK = 7 * DAY
+
+STEP_ROWS = 500
+HASH_STEP_ROWS = 100
+BLOB_READ = 1024 * 1024
+CHANGE_LOG_STEP = 5000
+FTS_MERGE_PAGES = 500
+# progress handler 每执行这么多条虚拟机指令检查一次中断
+PROGRESS_OPS = 10000
+CHECK_INTERVAL_MS = 15000
+
+
+def load_maintenance_settings():
+    return {**DEFAULT_MAINTENANCE, **(load_setting('maintenance') or {})}
+
+
+class MaintenanceJob:
+    """
+    维护任务: step() 做一小步并返回 (新状态, 是否完成)。
+    状态是可 JSON 序列化的 dict，中断后从保存的状态继续；完成后清空，间隔 interval 秒后再次到期。
+    """
+    name = ''
+    priority = 100
+    interval = DAY
+
+    def step(self, conn, state, is_cancelled):
+        raise NotImplementedError
+
+    def finished(self):
+        """整个任务完成后调用 (在维护线程中)"""
+
+
+class TrashConsistencyJob(MaintenanceJob):
+    """回收站中的笔记不应再挂在分类下 (原先每次启动都全表更新)"""
+    name, priority, interval = 'trash_consistency', 10, DAY
+
+    def step(self, conn, state, is_cancelled):
+        after_id = state.get('after_id', 0)
+        ids = [r[0] for r in conn.execute(
+            'SELECT id FROM ideas WHERE id > ? AND is_deleted = 1 AND category_id IS NOT NULL ORDER BY id LIMIT ?',
+            (after_id, STEP_ROWS))]
+        if ids:
+            conn.execute(f"UPDATE ideas SET category_id = NULL WHERE id IN ({','.join('?' * len(ids))})", ids)
+            conn.commit()
+            after_id = ids[-1]
+        return {'after_id': after_id}, len(ids) < STEP_ROWS
+
+
+class ContentHashJob(MaintenanceJob):
+    """为旧数据和内容被修改过的笔记补算 content_hash (与采集时的算法一致)"""
+    name, priority, interval = 'content_hash', 20, DAY
+
+    def step(self, conn, state, is_cancelled):
+        after_id = state.get('after_id', 0)
+        rows = conn.execute(
+            'SELECT id, item_type, content, full_size, data_blob IS NOT NULL FROM ideas '
+            'WHERE id > ? AND content_hash IS NULL ORDER BY id LIMIT ?', (after_id, HASH_STEP_ROWS)).fetchall()
+        updates = []
+        for iid, item_type, content, full_size, has_blob in rows:
+            if item_type == 'image' and has_blob:
+                updates.append((self._blob_hash(conn, iid), iid))
+            elif full_size:
+                hasher = hashlib.sha256()
+                for (data,) in conn.execute('SELECT data FROM content_chunks WHERE idea_id=? ORDER BY seq', (iid,)):
+                    hasher.update(large_text.decompress_chunk(data).encode('utf-8'))
+                updates.append((hasher.hexdigest(), iid))
+            else:
+                updates.append((large_text.stream_hash(content or ''), iid))
+        conn.executemany('UPDATE ideas SET content_hash=? WHERE id=?', updates)
+        conn.commit()
+        return {'after_id': rows[-1][0] if rows else after_id}, len(rows) < HASH_STEP_ROWS
+
+    @staticmethod
+    def _blob_hash(conn, iid):
+        hasher = hashlib.sha256()
+        blob = open_blob(conn, iid)
+        try:
+            for data in iter(lambda: blob.read(BLOB_READ), b''):
+                hasher.update(data)
+        finally:
+            blob.close()
+        return hasher.hexdigest()
+
+
+class ChangeLogCompactJob(MaintenanceJob):
+    name, priority, interval = 'change_log_compact', 30, DAY
+
+    def step(self, conn, state, is_cancelled):
+        return state, compact_old(conn, limit=CHANGE_LOG_STEP) < CHANGE_LOG_STEP
+
+
+class RetentionJob(MaintenanceJob):
+    """按保留策略清理剪贴板历史"""
+    name, priority, interval = 'retention_sweep', 40, 6 * HOUR
+
+    def __init__(self, db_path=DB_NAME, on_finished=None):
+        self.db_path = db_path
+        self.on_finished = on_finished
+        self.result = None
+
+    def step(self, conn, state, is_cancelled):
+        from services.retention_service import RetentionSweeper
+        self.result = RetentionSweeper(self.db_path).run(is_cancelled)
+        return state, not is_cancelled()
+
+    def finished(self):
+        if self.on_finished and self.result: self.on_finished(self.result)
+
+
+class BackupJob(MaintenanceJob):
+    name, priority, interval = 'backup', 50, 6 * HOUR
+
+    def step(self, conn, state, is_cancelled):
+        from services.backup_service import BackupService
+        if BackupService.run_backup(wait=True) is None:
+            raise RuntimeError('备份失败')
+        return state, True
+
+
+class HashBackfillJob(MaintenanceJob):
+    """包装图片 dHash / 文本 SimHash 补算 (两者本身按 id 续跑，未完成的行保持 NULL)"""
+    priority, interval = 60, DAY
+
+    def __init__(self, name, backfill, on_finished=None):
+        self.name = name
+        self.backfill = backfill
+        self.on_finished = on_finished
+        self.done = 0
+
+    def step(self, conn, state, is_cancelled):
+        self.done = self.backfill.run(is_cancelled)
+        return state, not is_cancelled()
+
+    def finished(self):
+        if self.on_finished and self.done: self.on_finished(self.done)
+
+
+class OptimizeJob(MaintenanceJob):
+    name, priority, interval = 'optimize', 70, DAY
+
+    def step(self, conn, state, is_cancelled):
+        conn.execute('PRAGMA optimize')
+        return state, True
+
+
+class AnalyzeJob(MaintenanceJob):
+    """限制采样行数的 ANALYZE，大库也只需很短时间"""
+    name, priority, interval = 'analyze', 75, WEEK
+
+    def step(self, conn, state, is_cancelled):
+        conn.execute('PRAGMA analysis_limit = 1000')
+        conn.execute('ANALYZE')
+        conn.commit()
+        return state, True
+
+
+class FtsOptimizeJob(MaintenanceJob):
+    """分步合并 FTS5 索引段 (每步 merge 若干页，变更行数小于 2 表示已合并完)"""
+    name, priority, interval = 'fts_optimize', 80, WEEK
+
+    def step(self, conn, state, is_cancelled):
+        tables = [r[0] for r in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND sql LIKE 'CREATE VIRTUAL TABLE%fts5%' ORDER BY name")]
+        index = state.get('index', 0)
+        if index >= len(tables):
+            return state, True
+        table = tables[index]
+        before = conn.total_changes
+        conn.execute(f'INSERT INTO "{table}"("{table}", rank) VALUES (\'merge\', ?)', (FTS_MERGE_PAGES,))
+        conn.commit()
+        if conn.total_changes - before < 2:
+            index += 1
+        return {'index': index}, index >= len(tables)
+
+
+class VacuumJob(MaintenanceJob):
+    """
+    分步回收空闲页。旧库尚未切换到 auto_vacuum=INCREMENTAL 时先执行一次完整 VACUUM 完成切换
+    (同一连接上设置后 VACUUM 才生效)；VACUUM 被中断时整体回滚，下次空闲重新执行。
+    """
+    name, priority, interval = 'incremental_vacuum', 90, HOUR
+
+    def step(self, conn, state, is_cancelled):
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            started = time.perf_counter()
+            conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            conn.execute('VACUUM')
+            logging.info(f"[Maintenance] Switched to auto_vacuum=INCREMENTAL in {time.perf_counter() - started:.1f}s")
+            return state, True
+        return state, incremental_vacuum(conn) == 0
+
+
+class IntegrityCheckJob(MaintenanceJob):
+    name, priority, interval = 'quick_check', 100, WEEK
+
+    def step(self, conn, state, is_cancelled):
+        problems = [r[0] for r in conn.execute('PRAGMA quick_check')]
+        if problems != ['ok']:
+            raise RuntimeError('; '.join(problems[:10]))
+        return state, True
+
+
+def default_jobs(service=None, db_path=DB_NAME):
+    """全部维护任务；传入 service 时任务完成后通知其刷新缓存和界面"""
+    from services.near_duplicates import HashBackfill, TextHashBackfill
+    return [
+        TrashConsistencyJob(),
+        ContentHashJob(),
+        ChangeLogCompactJob(),
+        RetentionJob(db_path, service._on_clipboard_swept if service else None),
+        BackupJob(),
+        HashBackfillJob('image_phash', HashBackfill(db_path), service._on_images_hashed if service else None),
+        HashBackfillJob('text_simhash', TextHashBackfill(db_path)),
+        OptimizeJob(),
+        AnalyzeJob(),
+        FtsOptimizeJob(),
+        VacuumJob(),
+        IntegrityCheckJob(),
+    ]
+
+
+class MaintenanceRunner:
+    """在独立连接上运行到期的维护任务，直到全部完成或被中断"""
+    _lock = threading.Lock()
+
+    def __init__(self, db_path=DB_NAME, jobs=None, disabled=()):
+        self.db_path = db_path
+        self.jobs = sorted(jobs if jobs is not None else default_jobs(db_path=db_path), key=lambda j: j.priority)
+        self.disabled = set(disabled)
+
+    def run(self, is_cancelled=None, only=None):
+        """返回下一个任务到期的时间 (time.time())；only 给出任务名时不论是否到期都运行"""
+        is_cancelled = is_cancelled or (lambda: False)
+        if not MaintenanceRunner._lock.acquire(blocking=False):
+            return time.time() + HOUR
+        conn = None
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            # 长语句执行中也能响应中断 (sqlite3.OperationalError: interrupted)
+            conn.set_progress_handler(lambda: 1 if is_cancelled() else 0, PROGRESS_OPS)
+            status = self.status(conn)
+            for job in self.jobs:
+                if is_cancelled():
+                    break
+                if job.name in self.disabled or (only and job.name not in only):
+                    continue
+                row = status.get(job.name, {})
+                if only or row.get('state') or self._due_at(job, row) <= time.time():
+                    self._run_job(conn, job, json.loads(row['state']) if row.get('state') else {}, is_cancelled)
+            status = self.status(conn)
+            return min((self._due_at(j, status.get(j.name, {})) for j in self.jobs if j.name not in self.disabled),
+                       default=time.time() + DAY)
+        finally:
+            if conn: conn.close()
+            MaintenanceRunner._lock.release()
+
+    @staticmethod
+    def _due_at(job, row):
+        return (row.get('completed_at') or 0) + job.interval
+
+    @staticmethod
+    def status(conn):
+        conn.row_factory = sqlite3.Row
+        try:
+            return {r['name']: dict(r) for r in conn.execute('SELECT * FROM maintenance_jobs')}
+        finally:
+            conn.row_factory = None
+
+    def _run_job(self, conn, job, state, is_cancelled):
+        started = time.perf_counter()
+        conn.execute('INSERT INTO maintenance_jobs (name, started_at) VALUES (?, ?) '
+                     'ON CONFLICT(name) DO UPDATE SET started_at = excluded.started_at', (job.name, time.time()))
+        conn.commit()
+        steps = 0
+        try:
+            while not is_cancelled():
+                state, done = job.step(conn, state, is_cancelled)
+                steps += 1
+                if done:
+                    conn.execute('UPDATE maintenance_jobs SET state = NULL, completed_at = ?, runs = runs + 1, '
+                                 'last_error = NULL WHERE name = ?', (time.time(), job.name))
+                    conn.commit()
+                    logging.info(f"[Maintenance] {job.name} finished in {steps} steps, "
+                                 f"{time.perf_counter() - started:.2f}s")
+                    job.finished()
+                    return True
+                conn.execute('UPDATE maintenance_jobs SET state = ? WHERE name = ?', (json.dumps(state), job.name))
+                conn.commit()
+                time.sleep(PAUSE)
+        except Exception as e:
+            if conn.in_transaction: conn.rollback()
+            if is_cancelled():
+                # 被中断的语句不影响已保存的进度
+                pass
+            else:
+                # 出错的任务本轮视为完成，到下一个周期再试
+                logging.error(f"[Maintenance] {job.name} failed: {e}", exc_info=True)
+                conn.execute('UPDATE maintenance_jobs SET state = NULL, completed_at = ?, last_error = ? WHERE name = ?',
+                             (time.time(), str(e), job.name))
+                conn.commit()
+                return False
+        logging.debug("[Maintenance] %s interrupted after %d steps", job.name, steps)
+        return False
+
+
+class MaintenanceScheduler(QObject):
+    """在 GUI 线程中检测空闲，空闲时启动维护线程；有用户操作时中断"""
+    INPUT_EVENTS = frozenset({QEvent.KeyPress, QEvent.MouseButtonPress, QEvent.MouseButtonDblClick,
+                              QEvent.Wheel, QEvent.MouseMove, QEvent.Drop})
+
+    def __init__(self, service=None, jobs=None, db_path=None, parent=None):
+        super().__init__(parent)
+        self.settings = load_maintenance_settings()
+        self.db_path = db_path or (service.idea_repo.db.db_path if service else DB_NAME)
+        self.jobs = jobs if jobs is not None else default_jobs(service, self.db_path)
+        self._interrupt = threading.Event()
+        self._thread = None
+        self._last_activity = time.monotonic()
+        self._next_due = 0
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._tick)
+
+    def start(self):
+        if not self.settings['enabled']:
+            return
+        from PyQt5.QtWidgets import QApplication
+        QApplication.instance().installEventFilter(self)
+        app_signals.data_changed.connect(self.notify_activity)
+        app_signals.clipboard_changed.connect(self.notify_activity)
+        self._timer.start(CHECK_INTERVAL_MS)
+
+    def stop(self):
+        self._timer.stop()
+        self._interrupt.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(2)
+
+    def eventFilter(self, obj, event):
+        if event.type() in self.INPUT_EVENTS:
+            self.notify_activity()
+        return False
+
+    def notify_activity(self):
+        self._last_activity = time.monotonic()
+        if self._thread is not None and self._thread.is_alive():
+            self._interrupt.set()
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _tick(self):
+        if self.is_running() or time.time() < self._next_due:
+            return
+        if time.monotonic() - self._last_activity < self.settings['idle_seconds']:
+            return
+        self._interrupt.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='Maintenance')
+        self._thread.start()
+
+    def _run(self):
+        runner = MaintenanceRunner(self.db_path, self.jobs, self.settings.get('disabled_jobs') or ())
+        try:
+            next_due = runner.run(self._interrupt.is_set)
+        except Exception as e:
+            logging.error(f"[Maintenance] Run failed: {e}", exc_info=True)
+            next_due = time.time() + HOUR
+        # 被中断时下次空闲立即继续
+        self._next_due = 0 if self._interrupt.is_set() else next_due
+
+
+def main(argv):
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    cmd = argv[0] if argv else 'list'
+    if cmd == 'list':
+        conn = sqlite3.connect(DB_NAME)
+        try:
+            status = MaintenanceRunner.status(conn)
+        finally:
+            conn.close()
+        for job in MaintenanceRunner(DB_NAME).jobs:
+            row = status.get(job.name, {})
+            done = time.strftime('%Y-%m-%d %H:%M', time.localtime(row['completed_at'])) if row.get('completed_at') else '-'
+            print(f"{job.priority:>4}  {job.name:<20} {done:<17} {'进行中 ' + row['state'] if row.get('state') else ''}"
+                  f"{' 错误: ' + row['last_error'] if row.get('last_error') else ''}")
+    elif cmd == 'run':
+        MaintenanceRunner(DB_NAME).run(only=set(argv[1:]) or None)
+    else:
+        print(__doc__)
+        return 2
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,364 @@
+# -*- coding: utf-8 -*-
+# services/near_duplicates.py
+"""
+近似重复检测
+
+图片: 每张图片保存 64 位差值哈希 (dHash，存于 ideas.image_phash)：缩成 9x8 灰度图，逐行比较相邻像素。
+同一窗口带/不带闪烁光标的两张截图、重新压缩过的图片，哈希只差几位。
+ImageHashIndex 用多索引哈希按汉明距离查找邻居，数万张图片内查询在亚毫秒级。
+
+文本: 规范化空白后按词 (不足三个词时按字符) 切成重叠片段，计算 64 位 SimHash (ideas.text_simhash)。
+哈希切成 TEXT_BANDS 段写入 text_simhash_bands 表 (LSH 分段索引)。查找时每段同时探测相差一位的段值，
+距离不超过 2*TEXT_BANDS-1 的两条文本必有一段命中，查找候选和全库扫描都不做两两比较。
+改动一行的片段通常相差 5~7 位，只差空白的文本距离为 0。
+
+设置项 image_near_duplicates (settings.json):
+    merge_on_capture  采集时发现近似图片则只更新原条目的时间，不新增
+    radius            汉明距离阈值
+设置项 text_near_duplicates:
+    mode              'off' | 'flag' (新条目打上“近似重复”标签) | 'merge' (只更新原条目时间)
+    radius            汉明距离阈值
+
+命令行:
+    python -m services.near_duplicates list|texts|backfill [radius]
+"""
+import sys
+import time
+import hashlib
+import sqlite3
+import logging
+import threading
+from PyQt5.QtCore import Qt, QSize
+from PyQt5.QtGui import QImage
+from core.config import DB_NAME
+from core.settings import load_setting
+from data.repositories.idea_repository import open_blob
+from data import large_text
+
+DEFAULT_NEAR_DUPLICATES = {'merge_on_capture': False, 'radius': 4}
+DEFAULT_TEXT_NEAR_DUPLICATES = {'mode': 'flag', 'radius': 6}
+NEAR_DUPLICATE_TAG = '近似重复'
+BACKFILL_DECODE = QSize(256, 256)
+BACKFILL_BATCH = 50
+
+TEXT_BANDS = 4
+TEXT_MIN_CHARS = 32
+TEXT_MAX_CHARS = 64 * 1024
+TEXT_BACKFILL_BATCH = 500
+
+
+def load_near_duplicate_settings():
+    return {**DEFAULT_NEAR_DUPLICATES, **(load_setting('image_near_duplicates') or {})}
+
+
+def load_text_near_duplicate_settings():
+    return {**DEFAULT_TEXT_NEAR_DUPLICATES, **(load_setting('text_near_duplicates') or {})}
+
+
+def dhash(image):
+    """64 位差值哈希 (以 SQLite 可存储的有符号整数返回)"""
+    small = image.scaled(9, 8, Qt.IgnoreAspectRatio, Qt.SmoothTransformation).convertToFormat(QImage.Format_Grayscale8)
+    ptr = small.constBits()
+    bpl = small.bytesPerLine()
+    ptr.setsize(bpl * 8)
+    px = bytes(ptr)
+    value = 0
+    for y in range(8):
+        row = px[y * bpl:y * bpl + 9]
+        for x in range(8):
+            value = (value << 1) | (row[x] > row[x + 1])
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def hamming(a, b):
+    return bin((a ^ b) & 0xFFFFFFFFFFFFFFFF).count('1')
+
+
+def _shingles(text):
+    words = ' '.join(text[:TEXT_MAX_CHARS].split()).lower()
+    tokens = words.split(' ')
+    if len(tokens) >= 3:
+        return [' '.join(tokens[i:i + 3]) for i in range(len(tokens) - 2)]
+    return [words[i:i + 4] for i in range(max(1, len(words) - 3))]
+
+
+def simhash(text):
+    """
+    64 位 SimHash (有符号整数)；太短的文本返回 None。
+    每个片段取 8 字节 blake2b，按字节列统计每一位被置位的次数，超过半数的位置 1。
+    """
+    if not text or len(text) < TEXT_MIN_CHARS:
+        return None
+    features = _shingles(text)
+    digests = b''.join(hashlib.blake2b(f.encode('utf-8'), digest_size=8).digest() for f in features)
+    half = len(features) / 2
+    value = 0
+    for i in range(8):
+        # 按字节列计数 (在 C 层完成)，再展开到 8 个位
+        counts = [0] * 8
+        column = digests[i::8]
+        for byte in set(column):
+            n = column.count(byte)
+            for j in range(8):
+                if byte >> j & 1: counts[j] += n
+        for j in range(8):
+            if counts[j] > half: value |= 1 << (8 * i + j)
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def text_bands(h):
+    """LSH 分段: [(段号, 段值)]"""
+    u = h & 0xFFFFFFFFFFFFFFFF
+    width = 64 // TEXT_BANDS
+    return [(b, (u >> (b * width)) & ((1 << width) - 1)) for b in range(TEXT_BANDS)]
+
+
+def text_probes(h):
+    """查找用的探测键: [(段号, [段值及其所有单比特翻转])]"""
+    width = 64 // TEXT_BANDS
+    return [(b, [key] + [key ^ (1 << j) for j in range(width)]) for b, key in text_bands(h)]
+
+
+def cluster_pairs(pairs):
+    """由相似对做并查集，返回含两条以上的簇"""
+    parent = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in pairs:
+        ra, rb = find(a), find(b)
+        if ra != rb: parent[ra] = rb
+    groups = {}
+    for x in parent:
+        groups.setdefault(find(x), []).append(x)
+    return [g for g in groups.values() if len(g) > 1]
+
+
+class ImageHashIndex:
+    """
+    内存中的图片哈希索引 (多索引哈希)：64 位哈希切成 radius+1 段，每段各建一个精确匹配的桶。
+    由抽屉原理，距离不超过 radius 的两个哈希至少有一段完全相同，只需比较同桶的候选。
+    查询半径超过建索引时的 radius 会退化为线性扫描。只增不删，调用方需自行过滤已删除的条目。
+    """
+    def __init__(self, rows=(), radius=DEFAULT_NEAR_DUPLICATES['radius']):
+        segments = max(1, min(int(radius) + 1, 16))
+        self.max_radius = segments - 1
+        bounds = [64 * k // segments for k in range(segments + 1)]
+        self._segments = [(lo, (1 << (hi - lo)) - 1) for lo, hi in zip(bounds, bounds[1:])]
+        self._buckets = [{} for _ in self._segments]
+        self.hashes = {}
+        for iid, h in rows:
+            self.add(iid, h)
+
+    def _keys(self, h):
+        u = h & 0xFFFFFFFFFFFFFFFF
+        return [(u >> lo) & mask for lo, mask in self._segments]
+
+    def add(self, iid, h):
+        if h is None or iid in self.hashes: return
+        self.hashes[iid] = h
+        for bucket, key in zip(self._buckets, self._keys(h)):
+            bucket.setdefault(key, []).append(iid)
+
+    def near(self, h, radius):
+        """返回 [(距离, idea_id)]，按距离升序"""
+        if radius > self.max_radius:
+            candidates = self.hashes
+        else:
+            candidates = set()
+            for bucket, key in zip(self._buckets, self._keys(h)):
+                candidates.update(bucket.get(key, ()))
+        found = []
+        for iid in candidates:
+            d = hamming(h, self.hashes[iid])
+            if d <= radius:
+                found.append((d, iid))
+        found.sort()
+        return found
+
+    def clusters(self, radius):
+        """把距离不超过 radius 的图片连通成簇，只返回含两张以上的簇"""
+        return cluster_pairs((iid, other) for iid, h in self.hashes.items()
+                             for _, other in self.near(h, radius) if other != iid)
+
+
+class HashBackfill:
+    """后台为尚无哈希的图片补算 dHash (独立连接，图片按缩小尺寸流式解码)"""
+    _lock = threading.Lock()
+
+    def __init__(self, db_path=DB_NAME):
+        self.db_path = db_path
+
+    def run(self, is_cancelled=None):
+        if not HashBackfill._lock.acquire(blocking=False):
+            return 0
+        from ui.components.blob_image import read_blob_image
+        started = time.perf_counter()
+        conn = None
+        done = 0
+        after_id = 0
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            while not (is_cancelled and is_cancelled()):
+                ids = [r[0] for r in conn.execute(
+                    "SELECT id FROM ideas WHERE id > ? AND item_type='image' AND image_phash IS NULL "
+                    "AND data_blob IS NOT NULL ORDER BY id LIMIT ?", (after_id, BACKFILL_BATCH))]
+                if not ids:
+                    break
+                after_id = ids[-1]
+                updates = []
+                for iid in ids:
+                    # 无法解码的保持 NULL，下次启动再试
+                    image = read_blob_image(open_blob(conn, iid), BACKFILL_DECODE)
+                    if not image.isNull():
+                        updates.append((dhash(image), iid))
+                conn.executemany('UPDATE ideas SET image_phash=? WHERE id=?', updates)
+                conn.commit()
+                done += len(updates)
+            if done:
+                logging.info(f"[NearDup] Hashed {done} images in {time.perf_counter() - started:.2f}s")
+            return done
+        finally:
+            if conn: conn.close()
+            HashBackfill._lock.release()
+
+    def run_async(self, on_finished=None):
+        def job():
+            try:
+                n = self.run()
+            except Exception as e:
+                logging.error(f"[NearDup] Backfill failed: {e}", exc_info=True)
+                return
+            if on_finished: on_finished(n)
+        t = threading.Thread(target=job, daemon=True, name='HashBackfill')
+        t.start()
+        return t
+
+
+class TextHashBackfill:
+    """后台为尚无 SimHash 的文本补算指纹并写入分段索引"""
+    _lock = threading.Lock()
+
+    def __init__(self, db_path=DB_NAME):
+        self.db_path = db_path
+
+    def run(self, is_cancelled=None):
+        if not TextHashBackfill._lock.acquire(blocking=False):
+            return 0
+        started = time.perf_counter()
+        conn = None
+        done = 0
+        after_id = 0
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            while not (is_cancelled and is_cancelled()):
+                rows = conn.execute(
+                    "SELECT id, content, full_size FROM ideas WHERE id > ? AND COALESCE(item_type, 'text') = 'text' "
+                    "AND text_simhash IS NULL AND length(content) >= ? ORDER BY id LIMIT ?",
+                    (after_id, TEXT_MIN_CHARS, TEXT_BACKFILL_BATCH)).fetchall()
+                if not rows:
+                    break
+                after_id = rows[-1][0]
+                updates, bands = [], []
+                for iid, content, full_size in rows:
+                    if full_size:
+                        # 外置存储的超大文本: content 只是摘录，取第一块全文的开头
+                        first = conn.execute('SELECT data FROM content_chunks WHERE idea_id=? AND seq=0', (iid,)).fetchone()
+                        if first: content = large_text.decompress_chunk(first[0])[:TEXT_MAX_CHARS]
+                    h = simhash(content)
+                    if h is None: continue
+                    updates.append((h, iid))
+                    bands.extend((b, key, iid) for b, key in text_bands(h))
+                conn.executemany('UPDATE ideas SET text_simhash=? WHERE id=?', updates)
+                conn.executemany('INSERT OR IGNORE INTO text_simhash_bands (band, key, idea_id) VALUES (?,?,?)', bands)
+                conn.commit()
+                done += len(updates)
+            if done:
+                logging.info(f"[NearDup] Fingerprinted {done} texts in {time.perf_counter() - started:.2f}s")
+            return done
+        finally:
+            if conn: conn.close()
+            TextHashBackfill._lock.release()
+
+    def run_async(self, on_finished=None):
+        def job():
+            try:
+                n = self.run()
+            except Exception as e:
+                logging.error(f"[NearDup] Text backfill failed: {e}", exc_info=True)
+                return
+            if on_finished: on_finished(n)
+        t = threading.Thread(target=job, daemon=True, name='TextHashBackfill')
+        t.start()
+        return t
+
+
+def text_duplicate_pairs(conn, radius):
+    """
+    全库近似文本对: 读出分段索引按段分桶，同桶及相差一位的桶之间的条目为候选，再核对汉明距离。
+    十万条文本默认半径下约数秒。
+    返回 [(id_a, id_b)]，只包含未删除的条目。
+    """
+    width = 64 // TEXT_BANDS
+    buckets = [{} for _ in range(TEXT_BANDS)]
+    hashes = {}
+    for band, key, iid, h in conn.execute('''
+            SELECT b.band, b.key, b.idea_id, i.text_simhash FROM text_simhash_bands b
+            JOIN ideas i ON i.id = b.idea_id WHERE COALESCE(i.is_deleted, 0) = 0'''):
+        buckets[band].setdefault(key, []).append(iid)
+        hashes[iid] = h & 0xFFFFFFFFFFFFFFFF
+    pairs = set()
+    # 半径小于段数时精确同段即可覆盖，不必探测相邻桶
+    masks = [1 << j for j in range(width)] if radius >= TEXT_BANDS else []
+    for bucket in buckets:
+        for key, ids in bucket.items():
+            # 每对相邻桶只从较小的段值一侧检查一次
+            neighbours = [b for m in masks if key ^ m > key and key ^ m in bucket for b in bucket[key ^ m]]
+            for i, a in enumerate(ids):
+                ha = hashes[a]
+                # 候选可达数百万，距离比较内联在推导式中
+                for b in [b for b in ids[i + 1:] + neighbours if bin(ha ^ hashes[b]).count('1') <= radius]:
+                    pairs.add((a, b) if a < b else (b, a))
+    return list(pairs)
+
+
+def main(argv):
+    from PyQt5.QtCore import QCoreApplication
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    # 图片格式插件需要应用实例
+    app = QCoreApplication.instance() or QCoreApplication(['near_duplicates'])
+    cmd = argv[0] if argv else 'list'
+    radius = int(argv[1]) if len(argv) > 1 else None
+    if cmd == 'backfill':
+        print(HashBackfill().run(), TextHashBackfill().run())
+    elif cmd == 'texts':
+        conn = sqlite3.connect(DB_NAME)
+        try:
+            if radius is None: radius = load_text_near_duplicate_settings()['radius']
+            for group in cluster_pairs(text_duplicate_pairs(conn, radius)):
+                print(' '.join(str(i) for i in sorted(group)))
+        finally:
+            conn.close()
+    elif cmd == 'list':
+        conn = sqlite3.connect(DB_NAME)
+        try:
+            rows = conn.execute("SELECT id, image_phash FROM ideas WHERE image_phash IS NOT NULL "
+                                "AND COALESCE(is_deleted, 0) = 0").fetchall()
+            if radius is None: radius = load_near_duplicate_settings()['radius']
+            for group in ImageHashIndex(rows, radius).clusters(radius):
+                print(' '.join(str(i) for i in sorted(group)))
+        finally:
+            conn.close()
+    else:
+        print(__doc__)
+        return 2
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+# services/retention_service.py
+"""
+剪贴板历史保留策略
+
+规则保存在 settings.json 的 clipboard_retention 中，可按全部 / 类型 / 分类分别设置:
+    max_items     最多保留条数 (按最近使用时间)
+    max_bytes     图片等二进制数据总字节数上限
+    max_age_days  超过天数未再使用的清理
+所有限制默认均为 None (不清理)，用户设置了规则后才会生效。
+超出的条目移入回收站 (is_deleted=1)，不直接删除，由用户清空回收站时才真正释放空间。
+置顶、书签、锁定、有评分、已归入分类、有标签 (自动添加的近似重复标签除外) 的条目不参与计算，也不会被清理；
+为某个分类单独设置的规则只作用于该分类，此时不再以"已归入分类"作为保护条件。
+只处理 source='clipboard' 且不在回收站中的条目。
+"""
+import time
+import sqlite3
+import logging
+import threading
+from core.config import DB_NAME
+from core.settings import load_setting
+from services.trash_service import CHUNK_ROWS, PAUSE
+from services.near_duplicates import NEAR_DUPLICATE_TAG
+
+DEFAULT_RETENTION = {
+    'default': {'max_items': None, 'max_bytes': None, 'max_age_days': None},
+    'types': {},
+    'categories': {},
+}
+
+PROTECTED_SQL = f'''COALESCE(is_pinned, 0) = 0 AND COALESCE(is_favorite, 0) = 0
+    AND COALESCE(is_locked, 0) = 0 AND COALESCE(rating, 0) = 0
+    AND NOT EXISTS (SELECT 1 FROM idea_tags it JOIN tags t ON t.id = it.tag_id
+                    WHERE it.idea_id = ideas.id AND t.name != '{NEAR_DUPLICATE_TAG}')'''
+UNCATEGORIZED_SQL = 'category_id IS NULL'
+
+
+def load_retention_rules():
+    """读取用户设置，未设置的部分使用默认值"""
+    user = load_setting('clipboard_retention') or {}
+    rules = {k: (dict(v) if isinstance(v, dict) else v) for k, v in DEFAULT_RETENTION.items()}
+    rules['default'] = {**rules['default'], **user.get('default', {})}
+    rules['types'] = {**rules['types'], **user.get('types', {})}
+    rules['categories'] = {**rules['categories'], **user.get('categories', {})}
+    return rules
+
+
+def collect_expired(conn, rules):
+    """返回 {id: 字节数}，包含违反任一规则的条目"""
+    scopes = [(UNCATEGORIZED_SQL, [], rules.get('default') or {})]
+    scopes += [(f'item_type = ? AND {UNCATEGORIZED_SQL}', [t], r) for t, r in (rules.get('types') or {}).items()]
+    scopes += [('category_id = ?', [int(cid)], r) for cid, r in (rules.get('categories') or {}).items()]
+
+    expired = {}
+    for scope, params, rule in scopes:
+        conds, p = [], []
+        if rule.get('max_items') is not None:
+            conds.append('rn > ?'); p.append(int(rule['max_items']))
+        if rule.get('max_bytes') is not None:
+            conds.append('running > ?'); p.append(int(rule['max_bytes']))
+        if rule.get('max_age_days') is not None:
+            conds.append("updated_at < datetime('now', ?)"); p.append(f"-{int(rule['max_age_days'])} days")
+        if not conds:
+            continue
+        # 按最近使用排序，超出条数/累计字节的尾部即为需要清理的部分
+        rows = conn.execute(f'''
+            SELECT id, size FROM (
+                SELECT id, updated_at, COALESCE(length(data_blob), 0) AS size,
+                       ROW_NUMBER() OVER w AS rn,
+                       SUM(COALESCE(length(data_blob), 0)) OVER w AS running
+                FROM ideas
+                WHERE source = 'clipboard' AND COALESCE(is_deleted, 0) = 0 AND {PROTECTED_SQL} AND {scope}
+                WINDOW w AS (ORDER BY updated_at DESC, id DESC)
+            ) WHERE {' OR '.join(conds)}
+        ''', params + p).fetchall()
+        expired.update(rows)
+    return expired
+
+
+def trash_ideas_chunks(conn, ids, chunk_rows=CHUNK_ROWS):
+    """按 id 列表逐块移入回收站 (与 IdeaRepository.set_deleted 相同的字段)，每块单独提交并产出本块条数"""
+    ids = list(ids)
+    c = conn.cursor()
+    for i in range(0, len(ids), chunk_rows):
+        part = ids[i:i + chunk_rows]
+        placeholders = ','.join('?' * len(part))
+        c.execute(f'UPDATE ideas SET is_deleted=1, category_id=NULL, color=NULL WHERE id IN ({placeholders})', part)
+        conn.commit()
+        yield len(part)
+
+
+class RetentionSweeper:
+    _lock = threading.Lock()
+
+    def __init__(self, db_path=DB_NAME, rules=None):
+        self.db_path = db_path
+        self.rules = rules
+
+    def run(self, is_cancelled=None):
+        """执行一次清理，返回 {'trashed', 'bytes', 'seconds'}"""
+        result = {'trashed': 0, 'bytes': 0, 'seconds': 0}
+        if not RetentionSweeper._lock.acquire(blocking=False):
+            return result
+        started = time.perf_counter()
+        conn = None
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            expired = collect_expired(conn, self.rules or load_retention_rules())
+            if expired:
+                ids = list(expired)
+                for n in trash_ideas_chunks(conn, ids):
+                    result['trashed'] += n
+                    if is_cancelled and is_cancelled(): break
+                    time.sleep(PAUSE)
+                result['bytes'] = sum(expired[i] for i in ids[:result['trashed']])
+            result['seconds'] = round(time.perf_counter() - started, 2)
+            if result['trashed']:
+                logging.info(f"[Retention] Moved {result['trashed']} clipboard items "
+                             f"({result['bytes'] / 1024 / 1024:.1f} MB) to trash in {result['seconds']}s")
+            return result
+        finally:
+            if conn: conn.close()
+            RetentionSweeper._lock.release()
+
+    def run_async(self, on_finished=None):
+        def job():
+            try:
+                result = self.run()
+            except Exception as e:
+                logging.error(f"[Retention] Sweep failed: {e}", exc_info=True)
+                return
+            if on_finished: on_finished(result)
+        t = threading.Thread(target=job, daemon=True, name='RetentionSweeper')
+        t.start()
+        return t
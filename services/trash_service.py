@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+# services/trash_service.py
+"""
+分块清空回收站 + 增量回收磁盘空间
+
+每块按行数和图片字节数双重限制，单独提交，块之间让出写锁；
+数据库为 auto_vacuum=INCREMENTAL 模式，删除后留下的空闲页由空闲维护的 VacuumJob 用 incremental_vacuum 分步还给文件系统。
+"""
+import time
+import sqlite3
+import logging
+import threading
+from core.config import DB_NAME
+
+CHUNK_ROWS = 200
+CHUNK_BYTES = 8 * 1024 * 1024
+VACUUM_PAGES = 1024
+PAUSE = 0.02
+
+
+def purge_trash_chunks(conn, chunk_rows=CHUNK_ROWS, chunk_bytes=CHUNK_BYTES):
+    """逐块删除回收站中的笔记，每删一块产出本块条数"""
+    c = conn.cursor()
+    while True:
+        c.execute('SELECT id, COALESCE(length(data_blob), 0) FROM ideas WHERE is_deleted=1 LIMIT ?', (chunk_rows,))
+        ids, size = [], 0
+        for iid, n in c.fetchall():
+            if ids and size + n > chunk_bytes: break
+            ids.append(iid); size += n
+        if not ids:
+            return
+        placeholders = ','.join('?' * len(ids))
+        c.execute(f'DELETE FROM idea_tags WHERE idea_id IN ({placeholders})', ids)
+        c.execute(f'DELETE FROM ideas WHERE id IN ({placeholders})', ids)
+        conn.commit()
+        yield len(ids)
+
+
+def delete_ideas_chunks(conn, ids, chunk_rows=CHUNK_ROWS):
+    """按 id 列表逐块删除笔记及其标签关联，每删一块产出本块条数"""
+    ids = list(ids)
+    c = conn.cursor()
+    for i in range(0, len(ids), chunk_rows):
+        part = ids[i:i + chunk_rows]
+        placeholders = ','.join('?' * len(part))
+        c.execute(f'DELETE FROM idea_tags WHERE idea_id IN ({placeholders})', part)
+        c.execute(f'DELETE FROM ideas WHERE id IN ({placeholders})', part)
+        conn.commit()
+        yield len(part)
+
+
+def incremental_vacuum(conn, pages=VACUUM_PAGES):
+    """回收最多 pages 个空闲页，返回剩余空闲页数"""
+    # execute() 对该 PRAGMA 只会执行一步 (一页)，executescript 会一直执行到结束
+    conn.executescript(f'PRAGMA incremental_vacuum({int(pages)});')
+    return conn.execute('PRAGMA freelist_count').fetchone()[0]
+
+
+class TrashPurger:
+    _lock = threading.Lock()
+
+    def __init__(self, db_path=DB_NAME):
+        self.db_path = db_path
+
+    def run(self, progress=None, is_cancelled=None):
+        """在独立连接上清空回收站，progress(done, total)；返回删除条数"""
+        if not TrashPurger._lock.acquire(blocking=False):
+            logging.info("[Trash] Purge already running, skipped")
+            return 0
+        started = time.perf_counter()
+        conn = None
+        done = 0
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            total = conn.execute('SELECT COUNT(*) FROM ideas WHERE is_deleted=1').fetchone()[0]
+            if progress: progress(0, total)
+            for n in purge_trash_chunks(conn):
+                done += n
+                if progress: progress(done, total)
+                if is_cancelled and is_cancelled(): break
+                time.sleep(PAUSE)
+            logging.info(f"[Trash] Purged {done} items in {time.perf_counter() - started:.2f}s")
+            return done
+        finally:
+            if conn: conn.close()
+            TrashPurger._lock.release()
+
+    def run_async(self, progress=None, on_finished=None):
+        def job():
+            try:
+                n = self.run(progress)
+            except Exception as e:
+                logging.error(f"[Trash] Purge failed: {e}", exc_info=True)
+                n = 0
+            if on_finished: on_finished(n)
+        t = threading.Thread(target=job, daemon=True, name='TrashPurger')
+        t.start()
+        return t
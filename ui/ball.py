@@ -21,9 +21,10 @@ class FloatingBall(QWidget):
     SKIN_MATCHA = 3  # 抹茶绿 (清新风) - 新增
     SKIN_OPEN = 4    # 摊开手稿 (沉浸风)
 
-    def __init__(self, main_window):
+    def __init__(self, on_text_dropped=None):
         super().__init__()
-        self.mw = main_window 
+        # 拖入文本时的回调 on_text_dropped(text)；主窗口按需构建，不在这里持有窗口引用
+        self.on_text_dropped = on_text_dropped
         self.setWindowFlags(Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint | Qt.Tool)
         self.setAttribute(Qt.WA_TranslucentBackground)
         self.setFixedSize(120, 120) # 尺寸加大适配各种款式
@@ -358,8 +359,8 @@ class FloatingBall(QWidget):
     def dropEvent(self, e):
         self.is_hovering = False
         text = e.mimeData().text()
-        if text.strip():
-            self.mw.quick_add_idea(text)
+        if text.strip() and self.on_text_dropped:
+            self.on_text_dropped(text)
             self.trigger_clipboard_feedback()
             e.acceptProposedAction()
 
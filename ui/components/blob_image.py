@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+# ui/components/blob_image.py
+"""
+数据库图片的流式解码
+
+BlobDevice 把 sqlite3.Blob (增量 blob I/O) 包装成只读 QIODevice，
+QImageReader 直接从数据库按块读取并按目标尺寸解码，不在 Python 中生成整块 bytes。
+"""
+from PyQt5.QtCore import QIODevice, QSize, Qt
+from PyQt5.QtGui import QImage, QImageReader, QCursor
+from PyQt5.QtWidgets import QDesktopWidget
+
+
+class BlobDevice(QIODevice):
+    """只读、可随机访问的 QIODevice；blob 需支持 read/seek/tell/close"""
+    def __init__(self, blob, parent=None):
+        super().__init__(parent)
+        self._blob = blob
+        blob.seek(0, 2)
+        self._size = blob.tell()
+        blob.seek(0)
+        # 不使用 Qt 内部缓冲，blob 的读取位置即设备位置
+        self.open(QIODevice.ReadOnly | QIODevice.Unbuffered)
+
+    def isSequential(self):
+        return False
+
+    def size(self):
+        return self._size
+
+    def seek(self, pos):
+        if pos < 0 or pos > self._size:
+            return False
+        self._blob.seek(pos)
+        return super().seek(pos)
+
+    def readData(self, maxlen):
+        return self._blob.read(maxlen)
+
+    def writeData(self, data):
+        return -1
+
+    def close(self):
+        super().close()
+        self._blob.close()
+
+
+def read_blob_image(blob, max_size=None):
+    """
+    从 blob 解码图片，max_size (QSize) 给出时按比例缩小到不超过该尺寸再解码。
+    blob 为 None 或解码失败时返回空 QImage；blob 会被关闭。
+    """
+    if blob is None:
+        return QImage()
+    device = BlobDevice(blob)
+    try:
+        reader = QImageReader(device)
+        reader.setAutoTransform(True)
+        if max_size is not None:
+            size = reader.size()
+            if size.isValid() and (size.width() > max_size.width() or size.height() > max_size.height()):
+                reader.setScaledSize(size.scaled(max_size, Qt.KeepAspectRatio))
+        return reader.read()
+    finally:
+        device.close()
+
+
+def screen_fit_size(ratio=1.0):
+    """鼠标所在屏幕可用区域按 ratio 缩放后的尺寸，作为预览解码的上限"""
+    geo = QDesktopWidget().availableGeometry(QCursor.pos())
+    return QSize(int(geo.width() * ratio), int(geo.height() * ratio))
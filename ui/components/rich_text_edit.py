@@ -3,9 +3,10 @@
 
 from PyQt5.QtWidgets import QTextEdit, QRubberBand
 from PyQt5.QtGui import QImage, QColor, QTextCharFormat, QTextCursor, QPainter, QTextImageFormat, QTextBlockFormat, QTextListFormat
-from PyQt5.QtCore import Qt, QByteArray, QBuffer, QIODevice, QPoint, QRect
-import markdown2
+from PyQt5.QtCore import Qt, QPoint, QRect
+from concurrent.futures import Future
 from .syntax_highlighter import MarkdownHighlighter
+from services.image_encoding import submit_encode
 
 class ImageResizer(QRubberBand):
     def __init__(self, parent=None, cursor=None, image_format=None):
@@ -111,7 +112,8 @@ class RichTextEdit(QTextEdit):
             # 进入预览模式
             self._source_text = self.toPlainText()
             try:
-                # 使用 markdown2 转 HTML
+                # 使用 markdown2 转 HTML (导入较慢，首次预览时再导入)
+                import markdown2
                 html_content = markdown2.markdown(
                     self._source_text, 
                     extras=["fenced-code-blocks", "tables", "strike", "task_list"]
@@ -235,11 +237,8 @@ class RichTextEdit(QTextEdit):
         if source.hasImage():
             image = source.imageData()
             if isinstance(image, QImage):
-                byte_array = QByteArray()
-                buffer = QBuffer(byte_array)
-                buffer.open(QIODevice.WriteOnly)
-                image.save(buffer, "PNG")
-                self.image_data = byte_array.data()
+                # 按编码策略在后台编码，保存时再取结果
+                self.image_data = submit_encode(image)
 
                 cursor = self.textCursor()
                 max_width = self.viewport().width() - 40
@@ -257,7 +256,10 @@ class RichTextEdit(QTextEdit):
                 return
         super().insertFromMimeData(source)
 
-    def get_image_data(self): return self.image_data
+    def get_image_data(self):
+        if isinstance(self.image_data, Future):
+            self.image_data = self.image_data.result()['data']
+        return self.image_data
 
     def set_image_data(self, data):
         self.image_data = data
@@ -265,15 +267,19 @@ class RichTextEdit(QTextEdit):
             image = QImage()
             image.loadFromData(data)
             if not image.isNull():
-                self.clear()
-                cursor = self.textCursor()
-                max_width = self.viewport().width() - 40
-                if image.width() > max_width:
-                    scale = max_width / image.width()
-                    scaled_image = image.scaled(int(max_width), int(image.height() * scale), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                    cursor.insertImage(scaled_image)
-                else:
-                    cursor.insertImage(image)
+                self.show_image(image)
+
+    def show_image(self, image):
+        """只显示已解码的图片，不改变 image_data (用于流式加载的已保存图片)"""
+        self.clear()
+        cursor = self.textCursor()
+        max_width = self.viewport().width() - 40
+        if image.width() > max_width:
+            scale = max_width / image.width()
+            scaled_image = image.scaled(int(max_width), int(image.height() * scale), Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            cursor.insertImage(scaled_image)
+        else:
+            cursor.insertImage(image)
 
     def toggle_list(self, list_style):
         cursor = self.textCursor()
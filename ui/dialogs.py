@@ -5,14 +5,16 @@ from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QGridLayout, QHBoxLayout,
                               QLabel, QLineEdit, QTextEdit, QComboBox, QPushButton,
                               QProgressBar, QFrame, QApplication, QMessageBox, QShortcut,
                              QSpacerItem, QSizePolicy, QSplitter, QWidget, QScrollBar,
-                             QGraphicsDropShadowEffect, QCheckBox)
+                             QGraphicsDropShadowEffect, QCheckBox, QFileDialog)
 from PyQt5.QtGui import QKeySequence, QColor, QCursor, QTextDocument, QTextCursor, QTextListFormat, QTextCharFormat, QPixmap, QImage
-from PyQt5.QtCore import Qt, QPoint, QRect, QEvent, pyqtSignal
+from PyQt5.QtCore import Qt, QPoint, QRect, QSize, QEvent, pyqtSignal, QThread
 from PyQt5.QtWidgets import QDesktopWidget
 from core.config import STYLES, COLORS
 from core.settings import save_setting, load_setting
 from .components.rich_text_edit import RichTextEdit
+from .components.blob_image import read_blob_image
 from ui.utils import create_svg_icon
+from services.export_service import ExportService, ExportCancelled, EXPORT_FORMATS
 
 class BaseDialog(QDialog):
     def __init__(self, parent=None, window_title="快速笔记"):
@@ -59,6 +61,11 @@ class EditDialog(BaseDialog):
         else:
             self.selected_color = COLORS['orange']
             self.is_using_saved_default = False
+        # 编辑已有笔记时记录载入的颜色，未改动且原本无手动颜色则继续跟随分类
+        self._loaded_color = None
+        self._color_override = None
+        # 已保存的图片未被替换时保存不回写 data_blob
+        self._keep_blob = False
         
         self.category_id = None 
         self.category_id_for_new = category_id_for_new 
@@ -436,19 +443,28 @@ class EditDialog(BaseDialog):
             if not self.content_inp.find(text, QTextDocument.FindBackward): self.content_inp.setTextCursor(curr)
 
     def _load_data(self):
-        d = self.db.get_idea(self.idea_id, include_blob=True)
+        d = self.db.get_idea(self.idea_id)
         if d:
             self.title_inp.setText(d[1])
             item_type = d[10] if len(d) > 10 else 'text'
-            if item_type != 'image': self.content_inp.setText(d[2])
+            if item_type != 'image':
+                # 超大文本的 content 只是摘录，编辑时加载全文
+                self.content_inp.setText(self.db.get_full_content(self.idea_id) if d['full_size'] else d[2])
             else: self.content_inp.clear()
             self._set_color(d[3])
+            self._loaded_color = d[3]
+            self._color_override = d['color_override']
             self.category_id = d[8]
             if self.category_id is not None:
                 idx = self.category_combo.findData(self.category_id)
                 if idx >= 0: self.category_combo.setCurrentIndex(idx)
-            data_blob = d[11] if len(d) > 11 else None
-            if item_type == 'image' and data_blob: self.content_inp.set_image_data(data_blob)
+            if item_type == 'image':
+                # 直接从数据库流式解码到编辑区宽度，不读取整块图片数据
+                max_width = max(1, self.content_inp.viewport().width() - 40)
+                image = read_blob_image(self.db.open_image_blob(self.idea_id), QSize(max_width, 1 << 16))
+                if not image.isNull():
+                    self.content_inp.show_image(image)
+                    self._keep_blob = True
             self.tags_inp.setText(','.join(self.db.get_tags(self.idea_id)))
 
     def _save_data(self):
@@ -463,11 +479,14 @@ class EditDialog(BaseDialog):
         content = self.content_inp.toPlainText()
         color = self.selected_color
         if self.chk_set_default.isChecked(): save_setting('user_default_color', color)
+        if self.idea_id and self._color_override is None and color == self._loaded_color:
+            color = None
         item_type = 'text'
         data_blob = self.content_inp.get_image_data()
-        if data_blob: item_type = 'image'
+        keep_blob = not data_blob and self._keep_blob
+        if data_blob or keep_blob: item_type = 'image'
         cat_id = self.category_combo.currentData()
-        if self.idea_id: self.db.update_idea(self.idea_id, title, content, color, tags, cat_id, item_type, data_blob)
+        if self.idea_id: self.db.update_idea(self.idea_id, title, content, color, tags, cat_id, item_type, data_blob, keep_blob)
         else: self.db.add_idea(title, content, color, tags, cat_id, item_type, data_blob)
         self.data_saved.emit()
         self.accept()
@@ -524,11 +543,41 @@ class StatsDialog(BaseDialog):
         return f
 
 # === 提取窗口 ===
+class ExportWorker(QThread):
+    """后台导出线程，使用独立数据库连接；用户取消时只发出 cancelled，不作为失败"""
+    progress = pyqtSignal(int, int)
+    succeeded = pyqtSignal(int, str)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, path, fmt, parent=None):
+        super().__init__(parent)
+        self.path, self.fmt = path, fmt
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        try:
+            n = ExportService().export(self.path, self.fmt, self.progress.emit, lambda: self._cancelled)
+            self.succeeded.emit(n, self.path)
+        except ExportCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
+
 class ExtractDialog(BaseDialog):
-    def __init__(self, db, parent=None):
+    PAGE_SIZE = 50
+
+    def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle('📋 提取内容')
         self.resize(700, 600)
+        self.exporter = ExportService()
+        self.worker = None
+        self._page_starts = [0]  # 每页起始的 after_id，用于翻页
+        self._page_rows = []
         layout = QVBoxLayout(self.content_container)
         layout.setContentsMargins(20, 20, 20, 20)
         
@@ -544,12 +593,88 @@ class ExtractDialog(BaseDialog):
         layout.addLayout(extract_header)
 
         self.txt = QTextEdit(); self.txt.setReadOnly(True); self.txt.setPlaceholderText("暂无数据..."); layout.addWidget(self.txt)
-        data = db.get_ideas('', 'all', None)
-        text = '\n' + '-'*60 + '\n'; text += '\n'.join([f"【{d[1]}】\n{d[2]}\n" + '-'*60 for d in data])
-        self.txt.setText(text)
+
+        # 分页预览，只加载当前页
+        nav = QHBoxLayout()
+        self.btn_prev = QPushButton('上一页'); self.btn_prev.clicked.connect(self._prev_page)
+        self.btn_next = QPushButton('下一页'); self.btn_next.clicked.connect(self._next_page)
+        self.lbl_page = QLabel(); self.lbl_page.setStyleSheet(f"color: {COLORS['text_sub']};")
+        btn_copy = QPushButton('复制本页'); btn_copy.clicked.connect(self._copy_page)
+        nav.addWidget(self.btn_prev); nav.addWidget(self.btn_next); nav.addWidget(self.lbl_page); nav.addStretch(); nav.addWidget(btn_copy)
+        layout.addLayout(nav)
         layout.addSpacing(10)
-        btn = QPushButton('  复制全部到剪贴板'); btn.setIcon(create_svg_icon("action_export.svg", "white")); btn.setFixedHeight(45); btn.setStyleSheet(STYLES['btn_primary'])
-        btn.clicked.connect(lambda: (QApplication.clipboard().setText(text), QMessageBox.information(self,'成功','内容已复制'))); layout.addWidget(btn)
+
+        self.progress = QProgressBar(); self.progress.setFixedHeight(18); self.progress.hide()
+        layout.addWidget(self.progress)
+
+        export_row = QHBoxLayout()
+        self.fmt_combo = QComboBox(); self.fmt_combo.setFixedHeight(45)
+        for key, (label, _) in EXPORT_FORMATS.items(): self.fmt_combo.addItem(label, key)
+        self.btn_export = QPushButton('  导出全部'); self.btn_export.setIcon(create_svg_icon("action_export.svg", "white")); self.btn_export.setFixedHeight(45); self.btn_export.setStyleSheet(STYLES['btn_primary'])
+        self.btn_export.clicked.connect(self._start_export)
+        self.btn_cancel = QPushButton('取消'); self.btn_cancel.setFixedHeight(45); self.btn_cancel.hide()
+        self.btn_cancel.clicked.connect(lambda: self.worker and self.worker.cancel())
+        export_row.addWidget(self.fmt_combo); export_row.addWidget(self.btn_export, 1); export_row.addWidget(self.btn_cancel)
+        layout.addLayout(export_row)
+
+        self.total = self.exporter.count()
+        self._load_page()
+
+    def _load_page(self):
+        self._page_rows = self.exporter.get_page(self._page_starts[-1], self.PAGE_SIZE)
+        text = '\n' + '-'*60 + '\n'; text += '\n'.join([f"【{d['title']}】\n{d['content'] or ''}\n" + '-'*60 for d in self._page_rows])
+        self.txt.setText(text if self._page_rows else '')
+        page = len(self._page_starts)
+        pages = max(1, (self.total + self.PAGE_SIZE - 1) // self.PAGE_SIZE)
+        self.lbl_page.setText(f"第 {page}/{pages} 页 · 共 {self.total} 条")
+        self.btn_prev.setEnabled(page > 1)
+        self.btn_next.setEnabled(len(self._page_rows) == self.PAGE_SIZE)
+
+    def _next_page(self):
+        if self._page_rows:
+            self._page_starts.append(self._page_rows[-1]['id'])
+            self._load_page()
+
+    def _prev_page(self):
+        if len(self._page_starts) > 1:
+            self._page_starts.pop()
+            self._load_page()
+
+    def _copy_page(self):
+        QApplication.clipboard().setText(self.txt.toPlainText())
+        QMessageBox.information(self, '成功', '本页内容已复制')
+
+    def _start_export(self):
+        fmt = self.fmt_combo.currentData()
+        label, ext = EXPORT_FORMATS[fmt]
+        path, _ = QFileDialog.getSaveFileName(self, '导出', f'ideas_export{ext}', f'{label} (*{ext})')
+        if not path: return
+        self.worker = ExportWorker(path, fmt, self)
+        self.worker.progress.connect(self._on_export_progress)
+        self.worker.succeeded.connect(self._on_export_succeeded)
+        self.worker.failed.connect(self._on_export_failed)
+        self.worker.finished.connect(self._on_export_finished)
+        self.btn_export.setEnabled(False); self.btn_cancel.show()
+        self.progress.setValue(0); self.progress.show()
+        self.worker.start()
+
+    def _on_export_progress(self, done, total):
+        self.progress.setMaximum(max(total, 1)); self.progress.setValue(done)
+
+    def _on_export_succeeded(self, n, path):
+        QMessageBox.information(self, '成功', f'已导出 {n} 条到\n{path}')
+
+    def _on_export_failed(self, msg):
+        QMessageBox.warning(self, '导出失败', msg)
+
+    def _on_export_finished(self):
+        self.btn_export.setEnabled(True); self.btn_cancel.hide(); self.progress.hide()
+        self.worker = None
+
+    def closeEvent(self, e):
+        if self.worker:
+            self.worker.cancel(); self.worker.wait()
+        super().closeEvent(e)
 
 # === 预览窗口 ===
 class PreviewDialog(QDialog):
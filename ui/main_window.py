@@ -11,6 +11,8 @@ from PyQt5.QtGui import QKeySequence, QCursor, QColor
 
 from core.config import STYLES, COLORS
 from core.settings import load_setting, save_setting
+from core.startup_trace import trace
+from core.ui_latency import ui_latency
 from ui.sidebar import Sidebar
 from ui.card_list_view import CardListView 
 from ui.dialogs import EditDialog
@@ -67,7 +69,8 @@ class MainWindow(QWidget):
         self.setAcceptDrops(True)
         
         self._setup_ui()
-        self._load_data()
+        # 数据推迟到首次显示时加载，后台预建窗口不查询数据库
+        self._data_loaded = False
 
     def _setup_ui(self):
         self.setWindowTitle('数据管理')
@@ -93,6 +96,7 @@ class MainWindow(QWidget):
         
         # === 1. 顶部标题栏 ===
         self.header = HeaderBar(self)
+        self.header.search_changed.connect(lambda: ui_latency.start('main.search'))
         self.header.search_changed.connect(lambda: self._set_page(1))
         self.header.search_changed.connect(self._rebuild_filter_panel)
         self.header.search_history_added.connect(self._add_search_to_history)
@@ -389,6 +393,8 @@ class MainWindow(QWidget):
         self.card_ordered_ids = [d['id'] for d in data_list]
         self._update_pagination_ui()
         self._update_ui_state()
+        ui_latency.finish_on_paint('main.filter', self.card_list_view)
+        ui_latency.finish_on_paint('main.search', self.card_list_view)
 
     def _on_folder_clicked(self, cat_id):
         """点击卡片区域的文件夹时，跳转到该分类"""
@@ -496,7 +502,7 @@ class MainWindow(QWidget):
     def _extract_single(self, idea_id):
         data = self.service.get_idea(idea_id)
         if not data: self._show_tooltip('数据不存在', 1500); return
-        content = data['content'] or ""
+        content = (self.service.get_full_content(idea_id) if data['full_size'] else data['content']) or ""
         QApplication.clipboard().setText(content)
         preview = content.replace('\n', ' ')[:40] + ('...' if len(content)>40 else '')
         self._show_tooltip(f'内容已提取到剪贴板\n\n{preview}', 2500)
@@ -510,7 +516,7 @@ class MainWindow(QWidget):
         if not ideas: return
         if len(ideas) == 1: self._extract_single(ideas[0]['id'])
         else:
-            text = '\n'.join([f"【{d['title']}】\n{d['content']}\n{'-'*60}" for d in ideas])
+            text = '\n'.join([f"【{d['title']}】\n{self.service.get_full_content(d['id']) if d['full_size'] else d['content']}\n{'-'*60}" for d in ideas])
             QApplication.clipboard().setText(text)
             self._show_tooltip(f'已提取 {len(ideas)} 条选中笔记到剪贴板!', 2000)
         
@@ -527,12 +533,16 @@ class MainWindow(QWidget):
         QTimer.singleShot(10, self.sidebar.refresh)
         QTimer.singleShot(10, self._update_ui_state)
         
+    def _on_trash_purge_progress(self, done, total):
+        if self.isVisible() and total: self._show_tooltip(f'正在清空回收站 {done}/{total}', 1500)
+
     def _show_tooltip(self, msg, dur=2000):
         QToolTip.showText(QCursor.pos(), msg, self)
         QTimer.singleShot(dur, QToolTip.hideText)
         
     def _set_filter(self, f_type, val):
         if self.curr_filter == (f_type, val): return
+        ui_latency.start('main.filter')
         self.curr_filter = (f_type, val)
         self.selected_ids.clear()
         self.last_clicked_id = None
@@ -848,6 +858,13 @@ class MainWindow(QWidget):
         save_setting("main_window_maximized", self.isMaximized())
         if hasattr(self, "sidebar"): save_setting("sidebar_width", self.sidebar.width())
 
+    def showEvent(self, event):
+        if not self._data_loaded:
+            self._data_loaded = True
+            with trace.phase('main.first_load'):
+                self._load_data()
+        super().showEvent(event)
+
     def refresh_logo(self):
         """刷新标题栏 Logo"""
         self.header.refresh_logo()
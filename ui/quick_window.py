@@ -20,8 +20,11 @@ from ui.dialogs import EditDialog
 from ui.components.search_line_edit import SearchLineEdit
 from core.config import COLORS
 from core.settings import load_setting, save_setting
+from core.startup_trace import trace
+from core.ui_latency import ui_latency
 from ui.utils import create_svg_icon, create_clear_button_icon
 from .quick_window_parts.widgets import DraggableListWidget
+from .components.blob_image import read_blob_image
 from .quick_window_parts.toolbar import Toolbar
 from .quick_window_parts.quick_sidebar import Sidebar
 
@@ -72,6 +75,7 @@ except ImportError:
             super().__init__()
             self.db = db_manager
         def process_clipboard(self, mime_data, cat_id=None): pass
+        def schedule(self, clipboard, cat_id=None): pass
 
 DARK_STYLESHEET = """
 QWidget#Container {
@@ -239,9 +243,18 @@ class QuickWindow(QWidget):
         self.toolbar.jump_to_page_requested.connect(self._jump_to_page_from_toolbar)
         self.toolbar.refresh_requested.connect(self.sidebar.refresh_ui)
 
-        self.sidebar.refresh_ui()
-        self._update_list()
-        self._update_partition_status_display()
+        # 列表和分区计数放到显示后的事件循环中加载，窗口先出现
+        QTimer.singleShot(0, self._load_list)
+        QTimer.singleShot(0, self._load_sidebar)
+
+    def _load_list(self):
+        with trace.phase('quick.first_list'):
+            self._update_list()
+
+    def _load_sidebar(self):
+        with trace.phase('quick.sidebar'):
+            self.sidebar.refresh_ui()
+            self._update_partition_status_display()
 
     def _get_resize_area(self, pos):
         check_widgets = [self.splitter, self.search_box, self.toolbar]
@@ -344,7 +357,7 @@ class QuickWindow(QWidget):
     def on_clipboard_changed(self):
         if self._processing_clipboard: return
         self._processing_clipboard = True
-        try: self.cm.process_clipboard(self.clipboard.mimeData(), None)
+        try: self.cm.schedule(self.clipboard, None)
         finally: self._processing_clipboard = False
 
     def _init_ui(self):
@@ -390,6 +403,7 @@ class QuickWindow(QWidget):
         self.splitter.setHandleWidth(4)
         
         self.list_widget = DraggableListWidget()
+        self.list_widget.content_loader = self._full_text
         self.list_widget.setFocusPolicy(Qt.StrongFocus)
         self.list_widget.setAlternatingRowColors(True)
         self.list_widget.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
@@ -466,7 +480,7 @@ class QuickWindow(QWidget):
             data = item.data(Qt.UserRole)
             if data:
                 item_type = data['item_type'] or 'text'
-                content = data['content']
+                content = self._full_text(data)
                 if item_type == 'text' and content:
                     texts.append(content)
         
@@ -574,9 +588,15 @@ class QuickWindow(QWidget):
             self.db.move_category(iid, cat_id)
 
     def _copy_item_content(self, data):
-        item_type = data['item_type'] or 'text'; content = data['content']
+        item_type = data['item_type'] or 'text'; content = self._full_text(data)
         if item_type == 'text' and content: QApplication.clipboard().setText(content)
 
+    def _full_text(self, data):
+        """超大文本的 content 只是摘录，粘贴/复制时按需读取全文"""
+        if data['full_size']:
+            return self.db.get_full_content(data['id'])
+        return data['content']
+
     def _get_first_selected_id(self):
         item = self.list_widget.currentItem()
         if not item: return None
@@ -700,6 +720,7 @@ class QuickWindow(QWidget):
             self.last_focus_hwnd = None 
 
     def _on_search_text_changed(self):
+        ui_latency.start('quick.search')
         self.current_page = 1; self.search_timer.start(300)
 
     def _prev_page(self):
@@ -731,7 +752,8 @@ class QuickWindow(QWidget):
         if self.current_page > self.total_pages: self.current_page = self.total_pages
         if self.current_page < 1: self.current_page = 1
         self.toolbar.update_pagination(self.current_page, self.total_pages)
-        items = self.db.get_ideas(search=search_text, f_type=f_type, f_val=f_val, page=self.current_page, page_size=self.page_size)
+        # 按 frecency (使用频率 + 新近度) 排序，常用的条目排在前面
+        items = self.db.get_ideas(search=search_text, f_type=f_type, f_val=f_val, page=self.current_page, page_size=self.page_size, order='frecency')
         self.list_widget.clear()
         
         for item_tuple in items:
@@ -802,8 +824,11 @@ class QuickWindow(QWidget):
             self.list_widget.addItem(list_item)
             
         if self.list_widget.count() > 0: self.list_widget.setCurrentRow(0)
+        ui_latency.finish_on_paint('quick.search', self.list_widget)
+        ui_latency.finish_on_paint('quick.filter', self.list_widget)
 
     def _on_sidebar_selection_changed(self, f_type, f_val):
+        ui_latency.start('quick.filter')
         self.current_filter_type = f_type; self.current_filter_value = f_val
         self.current_page = 1; self._update_list(); self._update_partition_status_display()
 
@@ -875,8 +900,9 @@ class QuickWindow(QWidget):
             clipboard = QApplication.clipboard(); clipboard.clear() 
             item_type = item_tuple['item_type'] or 'text'
             if item_type == 'image':
-                if item_tuple['data_blob']:
-                    image = QImage(); image.loadFromData(item_tuple['data_blob']); clipboard.setImage(image)
+                # 从数据库流式解码，不经过整块 bytes
+                image = read_blob_image(self.db.open_image_blob(item_tuple['id']))
+                if not image.isNull(): clipboard.setImage(image)
             elif item_type != 'text': 
                 content_str = item_tuple['content']
                 if content_str:
@@ -891,9 +917,11 @@ class QuickWindow(QWidget):
                         clipboard.setText(content_str)
                         if missing_files: QToolTip.showText(QCursor.pos(), f"⚠️ 原文件已丢失，已复制路径文本", self)
             else:
-                if item_tuple['content']: clipboard.setText(item_tuple['content'])
+                content = self._full_text(item_tuple)
+                if content: clipboard.setText(content)
             QApplication.processEvents()
             self._paste_ditto_style()
+            self.db.record_use(item_tuple['id'])
         except Exception as e: print(f"❌ 激活条目失败: {e}")
 
     def _paste_ditto_style(self):
@@ -10,6 +10,8 @@ class DraggableListWidget(QListWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setDragEnabled(True)
+        # 可选: data -> 全文，超大文本拖拽时取完整内容
+        self.content_loader = None
 
     def startDrag(self, supportedActions):
         items = self.selectedItems()
@@ -27,7 +29,7 @@ class DraggableListWidget(QListWidget):
             try:
                 ids.append(str(data['id']))
                 item_type = data['item_type'] if data['item_type'] else 'text'
-                content = data['content'] if data['content'] else ''
+                content = (self.content_loader(data) if self.content_loader else data['content']) or ''
                 
                 # 收集文本
                 if content:
@@ -3,11 +3,13 @@
 from PyQt5.QtWidgets import QWidget, QLabel, QVBoxLayout, QGraphicsDropShadowEffect, QPushButton
 from PyQt5.QtCore import Qt, pyqtSignal
 from PyQt5.QtGui import QColor
+from core.diagnostics import profile_session, memory_tracker
 
 class ToolboxWindow(QWidget):
     show_hotkey_settings_requested = pyqtSignal()
     show_time_paste_requested = pyqtSignal()
     show_password_generator_requested = pyqtSignal()
+    show_export_requested = pyqtSignal()
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -23,7 +25,7 @@ class ToolboxWindow(QWidget):
 
     def _setup_ui(self):
         self.setWindowTitle("工具箱")
-        self.resize(300, 400)
+        self.resize(300, 575)
 
         # 根布局
         root_layout = QVBoxLayout(self)
@@ -88,8 +90,54 @@ class ToolboxWindow(QWidget):
         password_generator_button.clicked.connect(self.show_password_generator_requested.emit)
         content_layout.addWidget(password_generator_button)
 
+        # 分页预览并后台导出全部笔记 (ExtractDialog)
+        export_button = QPushButton("导出笔记")
+        export_button.setStyleSheet(hotkey_button.styleSheet())
+        export_button.clicked.connect(self.show_export_requested.emit)
+        content_layout.addWidget(export_button)
+
+        # 诊断: 性能分析与内存快照，输出到 diagnostics 目录
+        self.profile_button = QPushButton("开始性能分析")
+        self.profile_button.setCheckable(True)
+        self.profile_button.setStyleSheet(hotkey_button.styleSheet())
+        self.profile_button.toggled.connect(self._toggle_profiling)
+        content_layout.addWidget(self.profile_button)
+
+        memory_button = QPushButton("内存快照")
+        memory_button.setToolTip("第一次开始跟踪内存分配，之后每次与上一次快照比较")
+        memory_button.setStyleSheet(hotkey_button.styleSheet())
+        memory_button.clicked.connect(self._take_memory_snapshot)
+        content_layout.addWidget(memory_button)
+
+        self.diagnostics_label = QLabel()
+        self.diagnostics_label.setWordWrap(True)
+        self.diagnostics_label.setStyleSheet("color: #999; font-size: 11px;")
+        content_layout.addWidget(self.diagnostics_label)
+
         content_layout.addStretch()
 
+    def _toggle_profiling(self, checked):
+        try:
+            if checked:
+                profile_session.start()
+                self.diagnostics_label.setText("正在分析，再次点击停止并保存")
+            else:
+                paths = profile_session.stop()
+                if paths:
+                    self.diagnostics_label.setText(f"已保存: {paths[0]}")
+        except Exception as e:
+            self.profile_button.blockSignals(True)
+            self.profile_button.setChecked(profile_session.active)
+            self.profile_button.blockSignals(False)
+            self.diagnostics_label.setText(f"性能分析失败: {e}")
+        self.profile_button.setText("停止并保存分析" if profile_session.active else "开始性能分析")
+
+    def _take_memory_snapshot(self):
+        try:
+            self.diagnostics_label.setText(f"已保存: {memory_tracker.snapshot()}")
+        except Exception as e:
+            self.diagnostics_label.setText(f"内存快照失败: {e}")
+
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
             self._drag_pos = event.globalPos() - self.frameGeometry().topLeft()